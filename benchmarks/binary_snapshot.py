@@ -0,0 +1,89 @@
+# Binary snapshots (storageMode = 'binary') vs flashcard_data.json.
+#
+#   python3 benchmarks/binary_snapshot.py [sizes...]
+#
+# Times saveData and loadData and compares file sizes for JSON (pretty-printed
+# like it used to be, and compact) and binary at each size. That both load
+# back the same collection, and that broken files are refused, is checked in
+# tests/test_binary_snapshot.py.
+
+import importlib.util, os, random, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flashcards import settings, Flashcard, Collection, loadData, saveData, cardToDict
+from flashcards.storage import writeSnapshot
+
+defaultSizes = [100_000, 1_000_000]
+cardsPerDeck = 2_000
+
+def hasNumpy():
+    return importlib.util.find_spec('numpy') != None
+
+def collectionData(numCards, numDecks=None, now=1.7e9):
+    rng = random.Random(112)
+    if numDecks == None:
+        numDecks = max(1, numCards // cardsPerDeck)
+    data = {"journalSegment": 0, "cards.lastCardId": 0,
+            "decks": [{"name": f"Deck {d}", "color": "lightBlue", "cards": []}
+                      for d in range(numDecks)]}
+    for i in range(numCards):
+        card = Flashcard(f"Question {i}?", rng.choice(["Yes", "No", f"Answer {i}"]))
+        for r in range(0 if rng.random() < 0.3 else rng.randint(1, 8)):
+            card.updateCard(rng.choice([1, 2, 3, 3, 3, 4]))
+        if card.lastReviewTime != None:
+            card.lastReviewTime = now - rng.random() * card.interval * 60 * 2
+        data["decks"][i % numDecks]["cards"].append(cardToDict(card))
+    data["cards.lastCardId"] = card.id
+    return data
+
+def decksAsJson(app):
+    return [{"name": deck.name, "color": deck.color,
+             "cards": [cardToDict(card) for card in deck.cards]} for deck in app.decks]
+
+def useFolder(mode, backend):
+    settings.dataDir = tempfile.mkdtemp()
+    settings.storageMode = mode
+    settings.deckBackend = backend
+
+def load():
+    collection = Collection()
+    loadData(collection)
+    return collection
+
+def timeCall(function, repeat=3):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        best = seconds if best == None else min(best, seconds)
+    return best
+
+def benchmark(numCards, backend):
+    data = collectionData(numCards)
+    useFolder('json', backend)
+    writeSnapshot(data, settings.getDataPath())
+    del data
+    collection = load()
+    print(f'\n{numCards:,} cards, {backend} decks')
+    print(f"{'':>14} {'save (s)':>10} {'load (s)':>10} {'size (MB)':>10}")
+
+    for name, mode, indent in [('json indent=2', 'json', 2), ('json', 'json', None),
+                               ('binary', 'binary', None)]:
+        settings.storageMode = mode
+        if indent != None: # the old pretty-printed file
+            save = lambda: writeSnapshot({"decks": decksAsJson(collection)}, indent=indent)
+        else:
+            save = lambda: saveData(collection)
+        saveTime = timeCall(save)
+        path = settings.getSiblingPath(settings.binaryFile) if mode == 'binary' else settings.getDataPath()
+        size = os.path.getsize(path)
+        loadTime = timeCall(load)
+        print(f'{name:>14} {saveTime:>10.2f} {loadTime:>10.2f} {size/1e6:>10.1f}')
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or defaultSizes
+    for numCards in sizes:
+        benchmark(numCards, 'objects')
+        if hasNumpy():
+            benchmark(numCards, 'numpy')
@@ -0,0 +1,61 @@
+# Timing for the scheduler clock (flashcards/clock.py).
+#
+#   python3 benchmarks/clock_check.py [cards]
+#
+# skipTime used to subtract the skipped hours from every card's
+# lastReviewTime and rebuild every deck's index. Times a one-day skip plus
+# the stats redraw after it, both ways, for both deck backends. That both
+# ways give the same stats and queues is checked in tests/test_clock.py.
+
+import os, random, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flashcards import settings, clock, Flashcard, makeDeck, skipTime
+
+numDecks = 20
+
+def makeDecks(numCards, now, seed=112):
+    rng = random.Random(seed)
+    decks = [makeDeck(f'Deck {d}') for d in range(numDecks)]
+    for i in range(numCards):
+        card = Flashcard(f'front {i}', 'back', i + 1)
+        kind = rng.random()
+        if kind < 0.6:
+            card.isLearning = kind < 0.1
+            card.learningStep = 1 if card.isLearning else 0
+            card.interval = 10 if card.isLearning else rng.choice([1440, 3600, 8640])
+            card.lastReviewTime = now - rng.uniform(0, 5) * 24*60*60
+        decks[i % numDecks].addCard(card)
+    return decks
+
+def skipByMutating(decks, hrs): # the old skipTime
+    for deck in decks:
+        for card in deck.cards:
+            if card.lastReviewTime != None:
+                card.lastReviewTime -= hrs*60*60
+        deck.rebuildIndex()
+
+def timeSkip(backend, numCards):
+    settings.deckBackend = backend
+    clock.useClock(clock.Clock())
+    decks = makeDecks(numCards, clock.now())
+    for deck in decks:
+        deck.getStats()
+    start = time.perf_counter()
+    skipTime(None, 24)
+    for deck in decks:
+        deck.getStats()
+    skipping = time.perf_counter() - start
+    clock.useClock(clock.Clock())
+    start = time.perf_counter()
+    skipByMutating(decks, 24)
+    for deck in decks:
+        deck.getStats()
+    mutating = time.perf_counter() - start
+    print(f'{numCards:,} cards, {backend} decks: skip a day + stats {skipping*1000:.1f}ms, '
+          f'moving every card {mutating*1000:.0f}ms (before saving the whole file)')
+
+if __name__ == '__main__':
+    numCards = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    for backend in ['objects', 'numpy']:
+        timeSkip(backend, numCards)
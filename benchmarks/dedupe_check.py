@@ -0,0 +1,92 @@
+# Timing for duplicate detection (flashcards/duplicates.py and
+# flashcards/minhash.py).
+#
+#   python3 benchmarks/dedupe_check.py [cards] [--workers N]
+#
+# Times building the exact index and the check on Add, and the near
+# duplicate search with one process and with the pool, on a collection of
+# the given size with 30% near duplicates (case, punctuation, a word changed
+# or added). That both find what comparing cards by hand finds is checked in
+# tests/test_duplicates.py.
+
+import os, random, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flashcards import Collection, makeDeck, Flashcard
+from flashcards.duplicates import buildDuplicateIndex
+from flashcards.minhash import findNearDuplicates
+
+numDecks = 20
+words = ('set list dict tuple loop while for def class return value key index slice '
+         'string integer float mutable immutable function method object hash table '
+         'recursion base case stack queue heap sort search binary linear time space '
+         'what does how why when which is are the a of in do').split()
+
+def makeText(rng, low, high):
+    return ' '.join(rng.choice(words) for i in range(rng.randint(low, high)))
+
+def makeVariant(text, rng):
+    # the same card typed again, a little differently
+    kind = rng.randrange(4)
+    if kind == 0:
+        return text.upper() + '?'
+    elif kind == 1:
+        return text.replace(' ', '  ') + '.'
+    parts = text.split(' ')
+    if kind == 2:
+        parts[rng.randrange(len(parts))] = rng.choice(words)
+    else:
+        parts.insert(rng.randrange(len(parts) + 1), rng.choice(words))
+    return ' '.join(parts)
+
+def makeCollection(numCards, duplicateShare=0.3, seed=112):
+    rng = random.Random(seed)
+    collection = Collection()
+    collection.decks = [makeDeck(f'Deck {d}') for d in range(numDecks)]
+    for i in range(numCards):
+        deck = collection.decks[i % numDecks]
+        if rng.random() < duplicateShare and len(deck.cards) > 0:
+            original = deck.cards[rng.randrange(len(deck.cards))]
+            front = makeVariant(original.front, rng)
+            back = original.back if rng.random() < 0.7 else makeVariant(original.back, rng)
+        else:
+            front = makeText(rng, 6, 12).capitalize() + '?'
+            back = makeText(rng, 2, 6)
+        deck.addCard(Flashcard(front, back))
+    return collection
+
+def timeAll(numCards, workers):
+    collection = makeCollection(numCards)
+    start = time.perf_counter()
+    index = buildDuplicateIndex(collection.decks)
+    built = time.perf_counter() - start
+    rng = random.Random(9)
+    allCards = [card for deck in collection.decks for card in deck.cards]
+    times = []
+    for i in range(2000):
+        query = makeVariant(rng.choice(allCards).front, rng) if i % 2 else makeText(rng, 6, 12)
+        start = time.perf_counter()
+        index.findDuplicates(query)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    print(f'\n{numCards:,} cards: exact index built in {built:.2f}s, check on Add '
+          f'p50 {times[len(times)//2]*1e6:.0f}us, max {times[-1]*1e6:.0f}us')
+
+    for workerCount in sorted({1, workers or os.cpu_count()}):
+        start = time.perf_counter()
+        byDeck = findNearDuplicates(collection.decks, workers=workerCount)
+        elapsed = time.perf_counter() - start
+        numClusters = sum(len(clusters) for clusters in byDeck.values())
+        inClusters = sum(len(cards) for clusters in byDeck.values() for cards in clusters)
+        print(f'near duplicates with {workerCount} process(es): {elapsed:.1f}s, '
+              f'{numClusters:,} clusters holding {inClusters:,} cards')
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    workers = None
+    if '--workers' in args:
+        at = args.index('--workers')
+        workers = int(args[at + 1])
+        del args[at:at + 2]
+    numCards = int(args[0]) if len(args) > 0 else 1_000_000
+    timeAll(numCards, workers)
@@ -0,0 +1,58 @@
+# Timing for flashcards/forecast.py.
+#
+#   python3 benchmarks/forecast_check.py [cards]
+#
+# Times a cold forecast (schedules read from the cards), a cached one, one
+# after a single deck changed, and a projected year, on a collection of the
+# given size. That the counts match counting by hand, for both deck backends,
+# is checked in tests/test_forecast.py.
+
+import os, random, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flashcards import settings, Flashcard, makeDeck
+from flashcards.forecast import forecastReviews, ForecastCache, secondsPerDay
+
+numDecks = 20
+
+def makeDecks(numCards, now, seed=112):
+    rng = random.Random(seed)
+    decks = [makeDeck(f'Deck {d}') for d in range(numDecks)]
+    for i in range(numCards):
+        card = Flashcard(f'front {i}', 'back')
+        kind = rng.random()
+        if kind < 0.6: # the rest stay new
+            card.isLearning = kind < 0.1
+            card.learningStep = 1 if card.isLearning else 0
+            card.interval = 10 if card.isLearning else rng.choice([1440, 3600, 8640, 20000, 60000])
+            card.easeFactor = rng.choice([1.3, 2.1, 2.5, 2.8])
+            card.lastReviewTime = now - rng.uniform(0, 30) * secondsPerDay
+        decks[i % numDecks].addCard(card)
+    return decks
+
+def timeForecast(backend, numCards, now):
+    settings.deckBackend = backend
+    decks = makeDecks(numCards, now)
+    cache = ForecastCache()
+    start = time.perf_counter()
+    cache.getForecast(decks, 30, now)
+    cold = time.perf_counter() - start
+    cache.last = (None, None) # keep the schedules, redo the counting
+    start = time.perf_counter()
+    cache.getForecast(decks, 30, now)
+    warm = time.perf_counter() - start
+    decks[0].addCard(Flashcard('one more', 'card'))
+    start = time.perf_counter()
+    cache.getForecast(decks, 30, now)
+    oneDeck = time.perf_counter() - start
+    start = time.perf_counter()
+    forecastReviews(decks, 365, now, ratingMix={1: 0.1, 2: 0.15, 3: 0.65, 4: 0.1}, cache=cache)
+    projected = time.perf_counter() - start
+    print(f'{numCards:,} cards, {backend} decks: cold {cold*1000:.0f}ms, cached schedules '
+          f'{warm*1000:.0f}ms, one deck changed {oneDeck*1000:.0f}ms, projected year {projected:.2f}s')
+
+if __name__ == '__main__':
+    numCards = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    now = time.time()
+    for backend in ['objects', 'numpy']:
+        timeForecast(backend, numCards, now)
@@ -0,0 +1,36 @@
+# How long `import flashcards` takes, best of a few runs.
+#
+#   python3 benchmarks/import_time.py
+#
+# The time budget and the modules it must not import (the GUI, NumPy,
+# sqlite3) are checked in tests/test_import_time.py.
+
+import os, subprocess, sys
+
+projectDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+runs = 5 # best of, to smooth out a cold disk cache
+
+def measureImport():
+    # returns (cumulative microseconds for flashcards, names of imported modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import flashcards'],
+                            cwd=projectDir, capture_output=True, text=True, check=True)
+    total = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        selfTime, cumulative, name = line[len('import time:'):].split('|')
+        imported.add(name.strip())
+        if name.strip() == 'flashcards':
+            total = int(cumulative)
+    return total, imported
+
+def main():
+    best = None
+    for i in range(runs):
+        total, imported = measureImport()
+        best = total if best == None else min(best, total)
+    print(f'import flashcards: {best/1000:.1f}ms, {len(imported)} modules imported')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Memory used per card, old dict-based Flashcard vs the current __slots__ one.
+#
+#   python3 benchmarks/memory_report.py [sizes...]
+#
+# Cards are built from freshly decoded JSON the same way loadData does it,
+# and only what the cards keep alive (including their strings) is counted.
+
+import json, os, random, sys, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flashcards.storage import cardFromDict, sharedNumbers
+
+defaultSizes = [10_000, 100_000, 1_000_000]
+commonBacks = ['Yes', 'No', 'def', 'True', 'False', 'O(1)', 'O(n)', 'list', 'dict']
+
+class DictFlashcard:
+    # what Flashcard looked like before __slots__ (ordinary __dict__)
+    def __init__(self, front, back):
+        self.front = front
+        self.back = back
+        self.isLearning = True
+        self.learningStep = 0
+        self.easeFactor = 2.5
+        self.interval = 0
+        self.lastReviewTime = None
+
+def dictCardFromDict(cardData): # the old loadData, no interning
+    card = DictFlashcard(cardData["front"], cardData["back"])
+    card.isLearning = cardData.get("isLearning", True)
+    card.learningStep = cardData.get("learningStep", 0)
+    card.easeFactor = cardData.get("easeFactor", 2.5)
+    card.interval = cardData.get("interval", 0)
+    card.lastReviewTime = cardData.get("lastReviewTime", None)
+    return card
+
+def makeCardText(n):
+    # JSON for a mix of new / learning / review cards
+    rng = random.Random(112)
+    cards = []
+    for i in range(n):
+        cardData = {"front": f"Question number {i}?",
+                    "back": rng.choice(commonBacks) if rng.random() < 0.7 else f"answer {i}",
+                    "isLearning": True, "learningStep": 0, "easeFactor": 2.5,
+                    "interval": 0, "lastReviewTime": None}
+        kind = rng.random()
+        if kind > 0.3:
+            cardData["lastReviewTime"] = 1.7e9 + rng.random()*1e6
+            cardData["interval"] = rng.choice([1, 6, 10])
+            cardData["learningStep"] = rng.choice([0, 1])
+        if kind > 0.5:
+            cardData["isLearning"] = False
+            cardData["interval"] = rng.choice([1440.0, 3600.0, 5760.0, 9000.0])
+            cardData["easeFactor"] = rng.choice([2.5, 2.35, 2.65, 2.2])
+        cards.append(cardData)
+    return json.dumps(cards)
+
+def measure(makeCard, text, n):
+    sharedNumbers.clear()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    cardDatas = json.loads(text)
+    cards = [makeCard(cardData) for cardData in cardDatas]
+    del cardDatas # like loadData, only the cards survive
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del cards
+    return (after - before) / n
+
+def main(sizes):
+    print(f"{'cards':>10} {'dict (B/card)':>15} {'slots (B/card)':>15} {'saved':>8}")
+    for n in sizes:
+        text = makeCardText(n)
+        old = measure(dictCardFromDict, text, n)
+        new = measure(cardFromDict, text, n)
+        print(f"{n:>10} {old:>15.1f} {new:>15.1f} {1 - new/old:>8.0%}")
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or defaultSizes
+    main(sizes)
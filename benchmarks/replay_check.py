@@ -0,0 +1,61 @@
+# Timing for replayReviews.
+#
+#   python3 benchmarks/replay_check.py [cards] [ratingsPerCard]
+#
+# Rates cards with random ratings through the reference Flashcard.updateCard,
+# logging every rating with ReviewLog, then rebuilds all states from the log
+# with the vectorized replayReviews and times both. That they agree exactly
+# (also with other SM-2 constants) is checked in tests/test_replay.py.
+
+import os, random, shutil, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flashcards import Flashcard, ReviewLog, getReviewState
+from flashcards.replay import readReviewLog, replayReviews
+
+def main(numCards, ratingsPerCard):
+    rng = random.Random(112)
+    logDir = tempfile.mkdtemp()
+    logPath = os.path.join(logDir, 'reviews.bin')
+    log = ReviewLog(logPath)
+    
+    cards = []
+    for i in range(numCards):
+        card = Flashcard(f'front {i}', 'back')
+        if rng.random() < 0.2: # some cards already had history before logging
+            card.isLearning = False
+            card.easeFactor = rng.choice([1.3, 2.05, 2.5, 3.1])
+            card.interval = rng.uniform(1440, 100000)
+            card.lastReviewTime = 1.7e9
+        cards.append(card)
+    
+    start = time.perf_counter()
+    now = 1.7e9
+    for r in range(ratingsPerCard):
+        for card in cards:
+            if rng.random() < 0.1: # not every card gets rated every round
+                continue
+            now += rng.random()
+            rating = rng.choice([1, 2, 3, 3, 3, 4])
+            before = getReviewState(card)
+            card.updateCard(rating)
+            card.lastReviewTime = now # updateCard uses the real clock
+            log.record(card, rating, before)
+    log.flush()
+    referenceTime = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    reviews = readReviewLog(logPath)
+    states = replayReviews(reviews)
+    replayTime = time.perf_counter() - start
+    
+    print(f'{len(reviews)} ratings for {numCards} cards')
+    print(f'updateCard one by one: {referenceTime:.2f}s')
+    print(f'replayReviews:         {replayTime:.2f}s '
+          f'({len(reviews)/replayTime/1e6:.1f}M ratings/s)')
+    shutil.rmtree(logDir)
+
+if __name__ == '__main__':
+    numCards = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    ratingsPerCard = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    main(numCards, ratingsPerCard)
@@ -0,0 +1,179 @@
+# How the scheduler, storage and screen handlers scale with collection size.
+#
+#   python3 benchmarks/scaling.py [--out results.json] [sizes...]
+#   python3 benchmarks/scaling.py --compare old.json new.json
+#
+# For each size a synthetic collection is made (many decks, cards pushed
+# through Flashcard.updateCard so there's a real new/learning/review mix),
+# written to a temp folder and then timed: loadData, saveData, getStats and
+# getDueCards over every deck, opening a deck from the menu (handleMenuClick
+# builds the study queue), rateCard, and redrawAll with the draw calls
+# replaced by no-ops. Results go to a json file (seconds per call) so runs
+# from different commits can be compared with --compare.
+
+import atexit, json, os, platform, random, shutil, subprocess, sys, tempfile, time, types
+
+projectDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, projectDir)
+from flashcards import settings, Flashcard, Collection, loadData, saveData, cardToDict
+from flashcards.storage import writeSnapshot
+
+defaultSizes = [1_000, 10_000, 100_000, 1_000_000]
+cardsPerDeck = 2_000
+ratedCards = 200 # rateCard calls timed per size
+slowerThan = 1.2 # --compare flags anything this much slower
+
+### collections ###
+
+def makeCollectionData(numCards, now):
+    rng = random.Random(112)
+    numDecks = max(1, numCards // cardsPerDeck)
+    data = {"decks": [{"name": f"Deck {d}", "color": "lightBlue", "cards": []}
+                      for d in range(numDecks)]}
+    for i in range(numCards):
+        card = Flashcard(f"Question {i}?", f"Answer {i}")
+        # ~30% never studied, the rest rated a few times like a real user
+        numRatings = 0 if rng.random() < 0.3 else rng.randint(1, 8)
+        for r in range(numRatings):
+            card.updateCard(rng.choice([1, 2, 3, 3, 3, 4]))
+        if card.lastReviewTime != None:
+            # last studied a while ago; some are due by now, some aren't
+            card.lastReviewTime = now - rng.random() * card.interval * 60 * 2
+        data["decks"][i % numDecks]["cards"].append(cardToDict(card))
+    return data
+
+def fakeGraphics():
+    # main.py does `from cmu_graphics import *`; only time our own code
+    graphics = types.ModuleType('cmu_graphics')
+    def noDraw(*args, **kwargs):
+        pass
+    graphics.rgb = lambda r, g, b: (r, g, b)
+    graphics.drawRect = graphics.drawLabel = graphics.drawLine = noDraw
+    graphics.drawCircle = graphics.runApp = noDraw
+    return graphics
+
+class BenchApp:
+    pass
+
+### timing ###
+
+def timeCall(function, repeat=5):
+    # best of a few runs, seconds per call
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best == None else min(best, elapsed)
+    return best
+
+def benchSize(numCards, main):
+    results = {"cards": numCards}
+    settings.dataDir = tempfile.mkdtemp()
+    data = makeCollectionData(numCards, time.time())
+    results["decks"] = len(data["decks"])
+    writeSnapshot(data)
+    del data
+    repeat = 5 if numCards <= 100_000 else 2
+
+    def load():
+        collection = Collection()
+        loadData(collection)
+        return collection
+    results["loadData"] = timeCall(load, repeat)
+
+    collection = load()
+    results["saveData"] = timeCall(lambda: saveData(collection), repeat)
+    results["getStats"] = timeCall(lambda: [deck.getStats() for deck in collection.decks])
+    results["getDueCards"] = timeCall(lambda: [deck.getDueCards() for deck in collection.decks])
+    del collection
+
+    # the app itself, as far as the handlers go
+    app = BenchApp()
+    main.onAppStart(app)
+    while app.loading and app.loadError == None: # decks load in the background
+        time.sleep(0.01)
+    settings.saveDelay = settings.saveMaxDelay = 1e9 # no saves mid-timing
+    results["redrawAll.menu"] = timeCall(lambda: main.redrawAll(app))
+
+    def openFirstDeck():
+        app.currScreen = 'menu'
+        main.handleMenuClick(app, 100, 150) # first deck row
+    results["handleMenuClick"] = timeCall(openFirstDeck)
+    results["redrawAll.study"] = timeCall(lambda: main.redrawAll(app))
+    app.showAnswer = True
+    results["redrawAll.answer"] = timeCall(lambda: main.redrawAll(app))
+
+    rng = random.Random(112)
+    calls = 0
+    start = time.perf_counter()
+    while app.currCard != None and calls < ratedCards:
+        main.rateCard(app, rng.choice([1, 2, 3, 3, 3, 4]))
+        calls += 1
+    results["rateCard"] = (time.perf_counter() - start) / max(calls, 1)
+
+    # nothing needs saving, the folder is thrown away
+    atexit.unregister(main.saveOnExit)
+    app.journal.wait()
+    shutil.rmtree(settings.dataDir)
+    return results
+
+def runBenchmarks(sizes, outPath):
+    sys.modules['cmu_graphics'] = fakeGraphics()
+    import main
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=projectDir,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    report = {"commit": commit, "python": platform.python_version(),
+              "storageMode": settings.storageMode, "deckBackend": settings.deckBackend,
+              "results": []}
+    for numCards in sizes:
+        results = benchSize(numCards, main)
+        report["results"].append(results)
+        print(f"{numCards:>9} cards: " + ", ".join(
+            f"{key} {value*1000:.2f}ms" for key, value in results.items()
+            if key not in ("cards", "decks")))
+
+    with open(outPath, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {outPath}")
+
+### comparing runs ###
+
+def compareReports(oldPath, newPath):
+    with open(oldPath) as f:
+        old = json.load(f)
+    with open(newPath) as f:
+        new = json.load(f)
+    oldResults = {results["cards"]: results for results in old["results"]}
+
+    print(f"{old['commit']} -> {new['commit']}")
+    regressions = 0
+    for results in new["results"]:
+        before = oldResults.get(results["cards"])
+        if before == None:
+            continue
+        for key, value in results.items():
+            if key in ("cards", "decks") or key not in before or before[key] == 0:
+                continue
+            ratio = value / before[key]
+            flag = '  SLOWER' if ratio > slowerThan else ''
+            regressions += (flag != '')
+            print(f"{results['cards']:>9} {key:<18} {before[key]*1000:>10.2f}ms "
+                  f"{value*1000:>10.2f}ms {ratio:>6.2f}x{flag}")
+    return regressions
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['--compare']:
+        sys.exit(1 if compareReports(args[1], args[2]) > 0 else 0)
+
+    outPath = 'scaling_results.json'
+    if args[:1] == ['--out']:
+        outPath = args[1]
+        args = args[2:]
+    sizes = [int(arg) for arg in args] or defaultSizes
+    runBenchmarks(sizes, outPath)
@@ -0,0 +1,100 @@
+# Timing for the search index (flashcards/search.py).
+#
+#   python3 benchmarks/search_check.py [cards]
+#
+# On a collection of the given size, times building the index, saving and
+# reading it back, the helpers' updates, and lookups as someone types. That
+# search matches going through every card by hand, also after edits, and
+# that a stale saved index isn't used is checked in tests/test_search.py.
+
+import os, random, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flashcards import settings, Collection, makeDeck, Flashcard
+from flashcards import addNewCard, editCardText, deleteCard
+from flashcards.search import buildIndex, loadIndex
+
+numDecks = 20
+
+def makeWords(count, rng):
+    # made-up words from syllables, so prefixes are shared like in real text
+    syllables = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'po', 'de', 'fa', 'gu', 'he',
+                 'ja', 'vo', 'zi', 'bre', 'str', 'ion', 'al', 'en', 'or', 'ux']
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(syllables) for i in range(rng.randint(1, 4))))
+    return sorted(words)
+
+def makeText(words, rng, low, high):
+    # zipf-ish: a few words on lots of cards, most on very few
+    return ' '.join(words[min(len(words)-1, int(rng.paretovariate(1.1))) - 1]
+                    if rng.random() < 0.5 else rng.choice(words)
+                    for i in range(rng.randint(low, high)))
+
+def makeCollection(numCards, words, seed=112):
+    rng = random.Random(seed)
+    collection = Collection()
+    collection.decks = [makeDeck(f'Deck {d}') for d in range(numDecks)]
+    for i in range(numCards):
+        card = Flashcard(makeText(words, rng, 3, 8).capitalize() + '?', makeText(words, rng, 1, 4))
+        collection.decks[i % numDecks].addCard(card)
+    return collection
+
+def timeSearch(numCards):
+    settings.deckBackend = 'objects'
+    rng = random.Random(7)
+    words = makeWords(20_000, rng)
+    collection = makeCollection(numCards, words)
+    start = time.perf_counter()
+    collection.searchIndex = index = buildIndex(collection.decks)
+    built = time.perf_counter() - start
+    print(f'\n{numCards:,} cards, {len(index.vocab):,} different words: '
+          f'building the index {built:.2f}s')
+
+    path = os.path.join(tempfile.mkdtemp(), 'search.idx')
+    start = time.perf_counter()
+    index.save(path, ['json'])
+    saved = time.perf_counter() - start
+    start = time.perf_counter()
+    loaded = loadIndex(path, collection.decks, ['json'])
+    read = time.perf_counter() - start
+    assert loaded != None and len(loaded) == len(index)
+    print(f'saving it {saved:.2f}s ({os.path.getsize(path) / 2**20:.0f} MB), '
+          f'reading it back {read:.2f}s')
+
+    # the helpers, each with its index update
+    cardsToChange = [(deck, card) for deck in collection.decks
+                     for card in rng.sample(deck.cards, 100)]
+    start = time.perf_counter()
+    for deck, card in cardsToChange[:1000]:
+        editCardText(collection, deck, card, makeText(words, rng, 3, 8), card.back)
+    edits = time.perf_counter() - start
+    start = time.perf_counter()
+    for deck, card in cardsToChange[1000:2000]:
+        deleteCard(collection, deck, card)
+    deletes = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(1000):
+        addNewCard(collection, collection.decks[i % numDecks],
+                   makeText(words, rng, 3, 8), makeText(words, rng, 1, 4))
+    adds = time.perf_counter() - start
+    print(f'per card: edit {edits*1000:.0f}us, delete {deletes*1000:.0f}us, '
+          f'add {adds*1000:.0f}us (1000 of each through the helpers)')
+
+    # type some words one letter at a time, the way the search screen asks
+    typed = []
+    for i in range(200):
+        query = ' '.join(rng.choice(words) for w in range(rng.randint(1, 2)))
+        typed += [query[:n] for n in range(1, len(query) + 1)]
+    times = []
+    for query in typed:
+        start = time.perf_counter()
+        index.search(query, limit=10)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    print(f'{len(times):,} lookups while typing: p50 {times[len(times)//2]*1000:.2f}ms, '
+          f'p99 {times[int(len(times)*0.99)]*1000:.2f}ms, max {times[-1]*1000:.2f}ms')
+
+if __name__ == '__main__':
+    numCards = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    timeSearch(numCards)
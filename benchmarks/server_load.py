@@ -0,0 +1,140 @@
+# Load generator for flashcards/server.py.
+#
+#   python3 benchmarks/server_load.py [--users 2000] [--cards 20] [--rounds 30]
+#                                     [--max-users 5000]
+#
+# Starts the server (python3 -m flashcards.server) in its own process and
+# has every simulated user, all at once, each on its own keep-alive
+# connection: make a deck, add cards, then study (fetch the next card, rate
+# it, now and then look at the deck list or fix a card's text). With more
+# users than --max-users the server keeps dropping and reloading
+# collections. Prints throughput and p50/p95/p99/max latency per endpoint.
+# Then stops the server and checks that every rating and card made it to
+# the users' files through the write-behind saves.
+
+import argparse, asyncio, json, os, random, subprocess, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flashcards.reviewlog import reviewRecord
+
+projectDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ratingWeights = {1: 0.1, 2: 0.15, 3: 0.65, 4: 0.1}
+
+class Client:
+    # one keep-alive connection, one request at a time
+    def __init__(self, port, latencies):
+        self.port = port
+        self.latencies = latencies # endpoint -> list of seconds
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+
+    async def request(self, endpoint, method, path, data=None):
+        body = b'' if data == None else json.dumps(data).encode('utf-8')
+        start = time.perf_counter()
+        self.writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\n'
+                          f'Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body)
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        length = 0
+        for line in lines[1:]:
+            name, colon, value = line.partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        result = json.loads(await self.reader.readexactly(length))
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+        status = int(lines[0].split(' ')[1])
+        if status != 200:
+            raise RuntimeError(f'{method} {path}: {status} {result}')
+        return result
+
+async def simulateUser(userId, port, options, latencies, rng, counts):
+    client = Client(port, latencies)
+    await client.connect()
+    base = f'/users/{userId}/decks'
+    deck = (await client.request('create deck', 'POST', base, {"name": "Practice"}))["deck"]
+    for i in range(options.cards):
+        await client.request('add card', 'POST', f'{base}/{deck}/cards',
+                             {"front": f'question {i}', "back": f'answer {i}'})
+    ratings = 0
+    for i in range(options.rounds):
+        step = rng.random()
+        if step < 0.05:
+            await client.request('list decks', 'GET', base)
+            continue
+        result = await client.request('next card', 'GET', f'{base}/{deck}/next')
+        card = result["card"]
+        if card == None:
+            continue
+        if step < 0.08:
+            await client.request('edit card', 'PUT', f'{base}/{deck}/cards/{card["id"]}',
+                                 {"front": card["front"] + '?', "back": card["back"]})
+        rating = rng.choices(list(ratingWeights), list(ratingWeights.values()))[0]
+        await client.request('rate', 'POST', f'{base}/{deck}/rate', {"card": card["id"], "rating": rating})
+        ratings += 1
+    counts[userId] = ratings
+    client.writer.close()
+
+def percentile(sortedValues, fraction):
+    return sortedValues[min(len(sortedValues) - 1, int(len(sortedValues) * fraction))]
+
+def printLatencies(latencies, elapsed):
+    total = sum(len(values) for values in latencies.values())
+    print(f'{total:,} requests in {elapsed:.1f}s = {total / elapsed:,.0f} requests/s\n')
+    print(f"{'endpoint':>12} {'count':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    everything = sorted(value for values in latencies.values() for value in values)
+    for endpoint, values in list(latencies.items()) + [('all', everything)]:
+        values = sorted(values)
+        print(f'{endpoint:>12} {len(values):>8,} ' +
+              ' '.join(f'{percentile(values, p) * 1000:>8.1f}' for p in [0.5, 0.95, 0.99, 1.0]))
+
+def checkFiles(dataDir, counts, options):
+    # every rating is a review log record and every card is in the snapshot
+    for userId, ratings in counts.items():
+        logSize = os.path.getsize(os.path.join(dataDir, userId + '.reviews.bin')) if ratings > 0 else 0
+        assert logSize == ratings * reviewRecord.size, (userId, logSize // reviewRecord.size, ratings)
+        with open(os.path.join(dataDir, userId + '.json')) as f:
+            data = json.load(f)
+        assert len(data["decks"]) == 1 and len(data["decks"][0]["cards"]) == options.cards, userId
+        reviewed = sum(cardData["lastReviewTime"] != None for cardData in data["decks"][0]["cards"])
+        assert reviewed <= ratings and (reviewed == 0) == (ratings == 0), userId
+    print(f'\nall {len(counts):,} users saved: every rating in the review logs, every card in the files')
+
+async def runLoad(port, options):
+    latencies = {}
+    counts = {}
+    rng = random.Random(112)
+    start = time.perf_counter()
+    await asyncio.gather(*[simulateUser(f'user{i}', port, options, latencies,
+                                        random.Random(rng.random()), counts)
+                           for i in range(options.users)])
+    return latencies, counts, time.perf_counter() - start
+
+def main(args):
+    parser = argparse.ArgumentParser(description='load test the review server')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--cards', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--max-users', type=int, default=5000)
+    options = parser.parse_args(args)
+
+    dataDir = tempfile.mkdtemp()
+    server = subprocess.Popen([sys.executable, '-m', 'flashcards.server', '--port', '0',
+                               '--data', dataDir, '--max-users', str(options.max_users)],
+                              cwd=projectDir, stdout=subprocess.PIPE, text=True)
+    try:
+        line = server.stdout.readline() # serving on http://127.0.0.1:<port> ...
+        port = int(line.split(':')[2].split(' ')[0])
+        print(f'{options.users:,} users at once, {options.cards} cards and {options.rounds} '
+              f'study steps each, server keeps {options.max_users:,} in memory')
+        latencies, counts, elapsed = asyncio.run(runLoad(port, options))
+        printLatencies(latencies, elapsed)
+    finally:
+        server.terminate() # the server saves everyone on SIGTERM
+        server.wait(timeout=120)
+    checkFiles(dataDir, counts, options)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,59 @@
+# Timing for StudySession.
+#
+#   python3 benchmarks/session_check.py [cards] [ratings]
+#
+# Times building a session and first()/append() on a big one, on a fake
+# clock where every answer takes a few seconds. That it picks the same cards
+# as a brute-force scan is checked in tests/test_session.py.
+
+import os, random, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flashcards import Flashcard, Deck, StudySession
+
+def makeCards(numCards, rng, now):
+    cards = []
+    for i in range(numCards):
+        card = Flashcard(f'front {i}', 'back')
+        kind = rng.random()
+        if kind < 0.3: # reviews, some due, some due during the session
+            card.isLearning = False
+            card.interval = 1440
+            card.lastReviewTime = now - 1440*60 + rng.uniform(-3600, 3600)
+        elif kind < 0.5: # in the middle of learning
+            card.learningStep = 1
+            card.interval = 10
+            card.lastReviewTime = now - rng.uniform(0, 1200)
+        cards.append(card)
+    return cards
+
+def timeSession(numCards, numRatings):
+    rng = random.Random(112)
+    now = 1.7e9
+    deck = Deck('timing')
+    for card in makeCards(numCards, rng, now):
+        deck.addCard(card)
+    start = time.perf_counter()
+    cards = deck.getDueCards(now) + deck.getLearningCards() + deck.getNewCards()
+    session = StudySession(cards, now=now, getUpcoming=deck.getUpcomingCards) # like buildStudyQueue
+    buildTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(numRatings):
+        card = session.first(now)
+        if card == None:
+            now += 60
+            continue
+        card.updateCard(rng.choice([1, 3, 3, 4]))
+        card.lastReviewTime = now
+        deck.updateIndex(card)
+        session.append(card, now)
+        now += 5
+    rateTime = time.perf_counter() - start
+    print(f'{numCards} cards: session built in {buildTime*1000:.1f}ms, '
+          f'{numRatings/rateTime:,.0f} first()+append() per second (includes updateCard)')
+
+if __name__ == '__main__':
+    numCards = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    numRatings = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    timeSession(numCards, numRatings)
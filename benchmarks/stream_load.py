@@ -0,0 +1,117 @@
+# Streaming load (storage.streamDecks) vs decoding the whole file first.
+#
+#   python3 benchmarks/stream_load.py [cards]
+#
+# First checks that the streaming parser gives the same decks as json.load,
+# with tiny chunk sizes so every value gets split across chunks at some
+# point, on indented (old) and compact files, odd strings and empty decks.
+# Then writes a big collection and reports load time and peak memory
+# (tracemalloc) of the old json.load-then-build path vs streamDecks, and how
+# soon the first deck shows up in app.decks.
+
+import json, os, sys, tempfile, threading, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flashcards import settings, Collection, cardToDict, jsonstream
+from flashcards.storage import cardFromDict, makeDeck, streamDecks, writeSnapshot, Journal
+
+def collectionData(numCards, numDecks, now=1.7e9):
+    data = {"journalSegment": 0, "cards.lastCardId": numCards,
+            "decks": [{"name": f"Deck {d}", "color": "lightBlue", "cards": []}
+                      for d in range(numDecks)]}
+    for i in range(numCards):
+        data["decks"][i % numDecks]["cards"].append({
+            "id": i + 1, "front": f"Question {i}?", "back": "Yes" if i % 3 else f"answer {i}",
+            "isLearning": i % 2 == 0, "learningStep": i % 2, "easeFactor": 2.5,
+            "interval": float(i % 7 * 1440), "lastReviewTime": None if i % 4 == 0 else now - i})
+    return data
+
+def decksOf(app):
+    return [(deck.name, deck.color, [cardToDict(card) for card in deck.cards])
+            for deck in app.decks]
+
+def streamed(path):
+    app = Collection()
+    app.journal = Journal()
+    streamDecks(app, path)
+    return app
+
+def checkSameAsJsonLoad(folder):
+    data = collectionData(50, 4)
+    data["decks"][0]["cards"][0]["front"] = 'tricky "quotes" \\ é中 \U0001f600 \n new line'
+    data["decks"].append({"name": "empty", "color": "pink", "cards": []})
+    data["decks"].append({"cards": [], "color": "green", "name": "cards first"})
+    data["decks"][1]["cards"][0]["lastReviewTime"] = 1712345678.123456789
+    path = os.path.join(folder, 'check.json')
+    for indent in [None, 2]:
+        writeSnapshot(data, path, indent)
+        expectedApp = Collection()
+        for deckData in json.load(open(path))["decks"]:
+            deck = makeDeck(deckData["name"], deckData["color"])
+            for cardData in deckData["cards"]:
+                deck.addCard(cardFromDict(cardData))
+            expectedApp.decks.append(deck)
+        expected = decksOf(expectedApp)
+        for size in [1, 2, 3, 7, 64, 1 << 20]:
+            jsonstream.chunkSize = size
+            assert decksOf(streamed(path)) == expected, (indent, size)
+    jsonstream.chunkSize = 1 << 20
+    print('streamed decks match json.load (compact and indented, chunks of 1 byte to 1MB)')
+
+def oldLoad(path): # what loadData did before: whole tree, then objects
+    app = Collection()
+    with open(path) as f:
+        data = json.load(f)
+    for deckData in data["decks"]:
+        deck = makeDeck(deckData["name"], deckData["color"])
+        for cardData in deckData["cards"]:
+            deck.addCard(cardFromDict(cardData))
+        app.decks.append(deck)
+    del data
+    return app
+
+def measure(load, path):
+    # timed on its own, tracemalloc slows allocation heavy code a lot
+    start = time.perf_counter()
+    load(path)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    app = load(path)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return app, seconds, current, peak
+
+def timeFirstDeck(path):
+    app = Collection()
+    start = time.perf_counter()
+    app.journal = Journal()
+    thread = threading.Thread(target=streamDecks, args=(app, path))
+    thread.start()
+    while app.decks == [] and thread.is_alive():
+        time.sleep(0.0005)
+    firstDeck = time.perf_counter() - start
+    thread.join()
+    return firstDeck, time.perf_counter() - start
+
+def main(numCards):
+    folder = tempfile.mkdtemp()
+    settings.dataDir = folder
+    checkSameAsJsonLoad(folder)
+
+    path = os.path.join(folder, 'big.json')
+    writeSnapshot(collectionData(numCards, max(1, numCards // 2000)), path)
+    megabytes = os.path.getsize(path) / 1e6
+    print(f'\n{numCards:,} cards, {megabytes:.0f}MB file')
+    print(f"{'':>12} {'load (s)':>10} {'kept (MB)':>10} {'peak (MB)':>10}")
+    results = {}
+    for name, load in [('json.load', oldLoad), ('streamDecks', streamed)]:
+        app, seconds, current, peak = measure(load, path)
+        results[name] = decksOf(app) if numCards <= 100_000 else None
+        del app
+        print(f'{name:>12} {seconds:>10.2f} {current/1e6:>10.0f} {peak/1e6:>10.0f}')
+    assert results['json.load'] == results['streamDecks']
+    firstDeck, total = timeFirstDeck(path)
+    print(f'first deck in app.decks after {firstDeck*1000:.0f}ms of {total*1000:.0f}ms')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,18 @@
+# the flashcard scheduler and storage, without any GUI.
+#
+#   from flashcards import openCollection, saveData
+#   collection = openCollection()
+#
+# numpy (cardtable.py, replay.py) and sqlite3 (sqlstore.py) are only
+# imported when those modules are used, to keep `import flashcards` cheap
+from . import settings, profiling, clock
+from .cards import Flashcard, Deck
+from .storage import (Collection, openCollection, loadData, saveData,
+                      cardToDict, cardFromDict, makeDeck, recordChange)
+from .reviewlog import ReviewLog, getReviewState
+from .saveworker import SaveWorker, requestSave, flushSaves
+from .collection import (addDeck, deleteDeck, addNewCard, editCardText,
+                         deleteCard, skipTime, createSampleDeck)
+from .session import StudySession
+from .study import (buildStudyQueue, rateCard, previewIntervalsIfRated,
+                    makeNiceLooking)
@@ -0,0 +1,171 @@
+# binary snapshots for settings.storageMode = 'binary': same data as
+# flashcard_data.json, but scheduling fields are fixed-width records that are
+# read straight out of a memory-mapped file instead of parsed as text.
+#
+# layout (little-endian, every section starts on a multiple of 8 bytes):
+#   header   magic, format version, length of the deck list, number of
+#            cards, cards.lastCardId, length of the text (headerFormat)
+#   decks    json list of {"name", "color", "cards": how many}, padded
+#            with spaces; the cards follow in the same deck order
+#   records  one recordFormat per card: id, easeFactor, interval,
+#            lastReviewTime (nan = never reviewed), isLearning, learningStep
+#   offsets  2*cards + 1 uint64s into the text, like TextStore's index:
+#            front i = text[off[2i]:off[2i+1]], back = text[off[2i+1]:off[2i+2]]
+#   text     utf-8 fronts and backs back to back
+import json, math, mmap, os, struct, sys
+from array import array
+from itertools import accumulate
+from . import settings, cards
+from .cards import Flashcard, useCardId
+from .reviewlog import ReviewLog
+from .storage import Journal, makeDeck, shareNumber, getDataLock
+
+magic = b'FLASHBIN'
+formatVersion = 1
+headerFormat = struct.Struct('<8sIIQQQ')
+recordFormat = struct.Struct('<qdddBb6x')
+
+# the same record as a numpy dtype, for CardTable decks (deckBackend = 'numpy')
+recordFields = [('id', '<i8'), ('easeFactor', '<f8'), ('interval', '<f8'),
+                ('lastReviewTime', '<f8'), ('isLearning', 'u1'), ('learningStep', 'i1'),
+                ('padding', 'V6')]
+
+def padTo8(length):
+    return (length + 7) // 8 * 8
+
+### writing ###
+
+def writeBinaryData(app, path=None):
+    if path == None:
+        path = settings.getSiblingPath(settings.binaryFile)
+    # this runs on the SaveWorker thread (see saveData): each deck's records
+    # and text come from one copy made under the data lock
+    deckList = []
+    records = []
+    texts = [] # front, back, front, back, ...
+    with getDataLock(app):
+        for deck in app.decks:
+            deckCards = deck.listCards()
+            deckList.append({"name": deck.name, "color": deck.color, "cards": len(deckCards)})
+            if settings.deckBackend == 'numpy':
+                records.append(deck.getRecords(recordFields).tobytes())
+            for card in deckCards:
+                if settings.deckBackend != 'numpy':
+                    lastReviewTime = card.lastReviewTime
+                    records.append(recordFormat.pack(
+                        card.id, card.easeFactor, card.interval,
+                        math.nan if lastReviewTime == None else lastReviewTime,
+                        card.isLearning, card.learningStep))
+                texts.append(card.front)
+                texts.append(card.back)
+    texts = [text.encode('utf-8') for text in texts]
+
+    numCards = len(texts) // 2
+    offsets = array('Q', [0])
+    offsets.extend(accumulate(map(len, texts)))
+    if sys.byteorder == 'big':
+        offsets.byteswap()
+    deckBytes = json.dumps(deckList).encode('utf-8')
+    deckBytes += b' ' * (padTo8(len(deckBytes)) - len(deckBytes))
+    textBytes = b''.join(texts)
+    recordBytes = b''.join(records)
+    if len(recordBytes) != numCards * recordFormat.size:
+        # records and text would belong to different cards
+        raise ValueError(f'binary snapshot has {len(recordBytes) // recordFormat.size} '
+                         f'records for {numCards} cards')
+    header = headerFormat.pack(magic, formatVersion, len(deckBytes), numCards,
+                               cards.lastCardId, len(textBytes))
+
+    # swapped in like writeSnapshot, so a crash never leaves half a file
+    tempPath = path + '.tmp'
+    with open(tempPath, 'wb') as f:
+        f.write(header)
+        f.write(deckBytes)
+        f.write(recordBytes)
+        f.write(offsets.tobytes())
+        f.write(textBytes)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tempPath, path)
+
+### reading ###
+
+def loadBinaryData(app, path=None):
+    if path == None:
+        path = settings.getSiblingPath(settings.binaryFile)
+    app.journal = Journal() # unused, nothing touches flashcard_data.json here
+    app.reviewLog = ReviewLog(settings.getReviewLogPath())
+    with open(path, 'rb') as f:
+        fileMap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        readSnapshot(app, fileMap)
+    finally:
+        fileMap.close()
+
+def readSnapshot(app, fileMap):
+    if len(fileMap) < headerFormat.size:
+        raise ValueError('binary snapshot is too short to have a header')
+    fileMagic, version, deckLength, numCards, lastCardId, textLength = headerFormat.unpack_from(fileMap, 0)
+    if fileMagic != magic:
+        raise ValueError("not a flashcard binary snapshot")
+    if version > formatVersion:
+        raise ValueError(f'binary snapshot is format version {version}, '
+                         f'this version of the app reads up to {formatVersion}')
+
+    recordStart = headerFormat.size + deckLength
+    offsetStart = recordStart + numCards * recordFormat.size
+    textStart = offsetStart + (2*numCards + 1) * 8
+    if len(fileMap) != textStart + textLength:
+        raise ValueError('binary snapshot is truncated or has extra data')
+
+    deckList = json.loads(fileMap[headerFormat.size:recordStart])
+    useCardId(lastCardId)
+    fronts, backs = readTexts(fileMap, offsetStart, textStart, textLength)
+
+    if settings.deckBackend == 'numpy':
+        import numpy as np # only with CardTable decks, which need it anyway
+    first = 0
+    for deckData in deckList:
+        deck = makeDeck(deckData["name"], deckData["color"])
+        last = first + deckData["cards"]
+        start = recordStart + first * recordFormat.size
+        end = recordStart + last * recordFormat.size
+        if settings.deckBackend == 'numpy':
+            records = np.frombuffer(fileMap, dtype=recordFields, count=last - first, offset=start)
+            deck.addRecords(records, fronts[first:last], backs[first:last])
+            del records # a view into fileMap, has to go before it's closed
+        else:
+            with memoryview(fileMap)[start:end] as view:
+                addCards(deck, view, fronts, backs, first)
+        app.decks.append(deck)
+        first = last
+
+def readTexts(fileMap, offsetStart, textStart, textLength):
+    offsets = array('Q')
+    offsets.frombytes(fileMap[offsetStart:textStart])
+    if sys.byteorder == 'big':
+        offsets.byteswap()
+    starts, middles, ends = offsets[0:-1:2], offsets[1::2], offsets[2::2]
+    text = fileMap[textStart:textStart + textLength]
+    if text.isascii():
+        # byte offsets are character offsets, so decode once and slice
+        text = text.decode('ascii')
+        fronts = [text[start:middle] for start, middle in zip(starts, middles)]
+        backs = [sys.intern(text[middle:end]) for middle, end in zip(middles, ends)]
+    else:
+        fronts = [str(text[start:middle], 'utf-8') for start, middle in zip(starts, middles)]
+        backs = [sys.intern(str(text[middle:end], 'utf-8')) for middle, end in zip(middles, ends)]
+    return fronts, backs
+
+def addCards(deck, view, fronts, backs, first):
+    # one C-level unpack per record, no per-field parsing
+    i = first
+    for cardId, easeFactor, interval, lastReviewTime, isLearning, learningStep in recordFormat.iter_unpack(view):
+        card = Flashcard(fronts[i], backs[i], cardId)
+        card.isLearning = bool(isLearning)
+        card.learningStep = learningStep
+        card.easeFactor = shareNumber(easeFactor)
+        card.interval = shareNumber(interval)
+        card.lastReviewTime = None if lastReviewTime != lastReviewTime else lastReviewTime # nan
+        deck.addCard(card)
+        i += 1
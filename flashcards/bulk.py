@@ -0,0 +1,207 @@
+# importing/exporting lots of cards at once from CSV, TSV or JSONL files.
+#
+#   python3 -m flashcards.bulk import cards.csv ["Deck name"]
+#   python3 -m flashcards.bulk export everything.jsonl
+#
+# files are read and written a row at a time, so only one batch of cards is
+# held on top of the collection itself. Each batch goes into the journal /
+# sqlite as one change and is saved once, instead of a save per card.
+#
+# columns: front, back, and optionally deck and the scheduling fields from
+# cardToDict (isLearning, learningStep, easeFactor, interval, lastReviewTime).
+# CSV/TSV files without a header row are read as front, back.
+import csv, io, json, os, sys
+from . import settings
+from .cards import Flashcard
+from .storage import (cardToDict, cardFromDict, makeDeck, recordChange, saveData,
+                      openCollection, getDataLock)
+
+batchSize = 10_000
+exportColumns = ["deck", "front", "back", "isLearning", "learningStep",
+                 "easeFactor", "interval", "lastReviewTime"]
+
+def getFileFormat(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.csv', '.tsv', '.jsonl'):
+        return extension[1:]
+    raise ValueError(f"don't know how to read {path} (use .csv, .tsv or .jsonl)")
+
+### reading ###
+
+def readCsvRows(textFile, delimiter):
+    reader = csv.reader(textFile, delimiter=delimiter)
+    header = None
+    for row in reader:
+        if row == []:
+            continue
+        if header == None:
+            header = [column.strip() for column in row]
+            if "front" not in header: # no header row, just front/back
+                header = ["front", "back"]
+                yield dict(zip(header, row))
+            continue
+        yield dict(zip(header, row))
+
+def readJsonlRows(textFile):
+    for line in textFile:
+        if line.strip() != '':
+            yield json.loads(line)
+
+def parseBool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+def cardFromRow(row):
+    # rows from CSV are all strings, JSONL already has the right types
+    if len(row) <= 2 or (len(row) == 3 and "deck" in row): # just text, the common case
+        return Flashcard(str(row["front"]), sys.intern(str(row.get("back", ""))))
+    cardData = {"front": str(row["front"]), "back": str(row.get("back", ""))}
+    if row.get("isLearning", "") != "":
+        cardData["isLearning"] = parseBool(row["isLearning"])
+    for field, convert in [("learningStep", int), ("easeFactor", float), ("interval", float),
+                           ("lastReviewTime", float)]:
+        value = row.get(field, "")
+        if value != "" and value != None:
+            cardData[field] = convert(value)
+    return cardFromDict(cardData) # shares floats/backs like loading does
+
+def commitBatch(app):
+    # one save per batch; with the app's SaveWorker, through it so two
+    # threads never write the same file
+    saver = getattr(app, 'saver', None)
+    if saver == None:
+        saveData(app)
+    else:
+        saver.requestSave()
+        saver.flush()
+
+def importCards(app, path, deck=None, progress=None):
+    # cards go into deck, or into the deck named by each row's "deck" column
+    # (made if it doesn't exist). progress(rows, bytesRead, totalBytes) is
+    # called after every batch. returns how many cards were added
+    fileFormat = getFileFormat(path)
+    decksByName = {existing.name: existing for existing in app.decks}
+    totalBytes = os.path.getsize(path)
+
+    # the json snapshot (and 'split' metadata) is rewritten whole on every
+    # save, so those only save once at the end; journal/sqlite commit per batch
+    savePerBatch = settings.storageMode in ('journal', 'sqlite')
+    app.journal.holdCompaction = True # compact once at the end, not per batch
+    try:
+        numRows = readIntoDecks(app, path, fileFormat, deck, decksByName,
+                                savePerBatch, progress, totalBytes)
+    finally:
+        app.journal.holdCompaction = False
+    commitBatch(app) # json/split: the one save
+    app.journal.compactIfDue()
+    if progress != None:
+        progress(numRows, totalBytes, totalBytes)
+    return numRows
+
+def readIntoDecks(app, path, fileFormat, deck, decksByName, savePerBatch, progress, totalBytes):
+    defaultDeckName = os.path.splitext(os.path.basename(path))[0] # rows without a deck
+    with open(path, 'rb') as rawFile:
+        textFile = io.TextIOWrapper(rawFile, encoding='utf-8-sig', newline='')
+        if fileFormat == 'jsonl':
+            rows = readJsonlRows(textFile)
+        else:
+            rows = readCsvRows(textFile, ',' if fileFormat == 'csv' else '\t')
+
+        batch = {} # deck -> cards added to it in this batch
+        numRows = 0
+        for row in rows:
+            targetDeck = deck
+            newCard = cardFromRow(row)
+            with getDataLock(app): # like the helpers in collection.py
+                if targetDeck == None:
+                    deckName = row.get("deck") or defaultDeckName
+                    targetDeck = decksByName.get(deckName)
+                    if targetDeck == None:
+                        targetDeck = makeDeck(deckName)
+                        app.decks.append(targetDeck)
+                        recordChange(app, 'addDeck', targetDeck, name=deckName, color=targetDeck.color)
+                        decksByName[deckName] = targetDeck
+                card = targetDeck.addCard(newCard)
+            batch.setdefault(targetDeck, []).append(card)
+            numRows += 1
+
+            if numRows % batchSize == 0:
+                finishBatch(app, batch, savePerBatch)
+                batch = {}
+                if progress != None:
+                    progress(numRows, rawFile.tell(), totalBytes)
+
+        finishBatch(app, batch, savePerBatch)
+    return numRows
+
+def finishBatch(app, batch, savePerBatch):
+    with getDataLock(app):
+        for deck, newCards in batch.items():
+            cardDatas = []
+            if settings.storageMode in ('journal', 'sqlite'): # nobody else reads these
+                cardDatas = [cardToDict(card) for card in newCards]
+            recordChange(app, 'addCards', deck, cards=cardDatas)
+    if savePerBatch and batch != {}:
+        commitBatch(app)
+
+### writing ###
+
+def exportCards(decks, path, progress=None):
+    # every card of every deck with its scheduling state; progress(cards)
+    # is called every batchSize cards. returns how many were written
+    fileFormat = getFileFormat(path)
+    numCards = 0
+    tempPath = path + '.tmp' # same swap-in as writeSnapshot
+    with open(tempPath, 'w', encoding='utf-8', newline='') as f:
+        writer = None
+        if fileFormat != 'jsonl':
+            writer = csv.writer(f, delimiter=',' if fileFormat == 'csv' else '\t')
+            writer.writerow(exportColumns)
+
+        for deck in list(decks):
+            for card in deck.listCards():
+                cardData = cardToDict(card)
+                cardData["deck"] = deck.name
+                if writer == None:
+                    f.write(json.dumps({column: cardData[column] for column in exportColumns}) + '\n')
+                else:
+                    writer.writerow(['' if cardData[column] == None else cardData[column]
+                                     for column in exportColumns])
+                numCards += 1
+                if progress != None and numCards % batchSize == 0:
+                    progress(numCards)
+    os.replace(tempPath, path)
+    return numCards
+
+### command line ###
+
+def printProgress(rows, bytesRead, totalBytes):
+    print(f'\r{rows:,} cards ({bytesRead/max(totalBytes, 1):.0%})', end='', flush=True)
+
+def main(args):
+    if len(args) < 2 or args[0] not in ('import', 'export'):
+        print('usage: python3 -m flashcards.bulk import FILE [DECK] | export FILE')
+        return 1
+
+    collection = openCollection()
+    if args[0] == 'import':
+        deck = None
+        if len(args) > 2:
+            matching = [existing for existing in collection.decks if existing.name == args[2]]
+            if matching != []:
+                deck = matching[0]
+            else:
+                deck = makeDeck(args[2])
+                collection.decks.append(deck)
+                recordChange(collection, 'addDeck', deck, name=deck.name, color=deck.color)
+        added = importCards(collection, args[1], deck, printProgress)
+        print(f'\nimported {added:,} cards')
+    else:
+        written = exportCards(collection.decks, args[1])
+        print(f'exported {written:,} cards')
+    collection.journal.wait()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,425 @@
+# Flashcard (one card + the SM-2 scheduling) and Deck
+import heapq
+from . import settings, textstore, profiling, clock
+
+# card ids are never reused, so review history can always find its card
+lastCardId = 0
+
+# SM-2 constants used by updateCard (Anki's defaults); simulate.py tries
+# other values for them
+schedulerParams = {
+    "startEase": 2.5,       # ease of a new card
+    "minEase": 1.3,         # never drops below 130% (Anki faq)
+    "maxEase": 4,
+    "againPenalty": 0.2,    # ease lost on again
+    "hardPenalty": 0.15,    # ease lost on hard
+    "easyEaseBonus": 0.15,  # ease gained on easy
+    "hardMultiplier": 1.2,  # hard grows the interval by this instead of ease
+    "easyBonus": 1.3,       # easy grows it by ease * this
+}
+
+def useCardId(cardId=None): # new id if None, otherwise remember cardId is taken
+    global lastCardId
+    if cardId == None:
+        lastCardId += 1
+        return lastCardId
+    lastCardId = max(lastCardId, cardId)
+    return cardId
+
+class Flashcard:
+    # no per-card __dict__; it was most of the memory for big collections
+    __slots__ = ('id', 'frontText', 'backText', 'textIndex', 'isLearning',
+                 'learningStep', 'easeFactor', 'interval', 'lastReviewTime', 'deck')
+    
+    def __init__(self, front, back, cardId=None):
+        self.id = useCardId(cardId)
+        # text is either in memory (frontText/backText) or, in 'split' mode,
+        # only in the TextStore at textIndex until someone reads it
+        self.frontText = front
+        self.backText = back
+        self.textIndex = None
+        
+        # Learning phase variables
+        self.isLearning = True
+        self.learningStep = 0
+            # step 0 = 1min
+            # step 1 = 10min
+            # step 2 = 1day
+        
+        # Review phase variables
+        self.easeFactor = schedulerParams["startEase"] # new interval = old interval * factor
+        self.interval = 0
+        self.lastReviewTime = None
+        
+        self.deck = None # deck holding this card, so it can re-file it when rated
+    
+    ### SPACED REPITITION ALGORITHM HERE ###
+    def updateCard(self, rating):
+        params = schedulerParams
+        # new card logic
+        if self.isLearning:
+            
+            # again
+            if rating == 1:
+                self.learningStep = 0 # reset learning step
+                self.interval = 1
+                
+            # hard
+            elif rating == 2:
+                if self.learningStep == 0: 
+                    # do not increment step on hard card unless its at step 0
+                    self.interval = 6
+                    self.learningStep = 1
+                else:
+                    self.interval = 10
+                    # do not increment step
+            
+            # good
+            elif rating == 3:
+                self.learningStep += 1 # increment step if good
+                
+                if self.learningStep < 2:
+                    self.interval = 10 # always 10mins on step1
+                else: # step 2 or higher; done learning -> review
+                    self.isLearning = False
+                    self.interval = 1 * 24 * 60
+            
+            # easy
+            elif rating == 4:
+                # move to review immediately
+                self.isLearning = False
+                self.interval = 4 * 24 * 60
+            
+        
+        # review card logic 
+        else:
+            # do not decrease ease below minEase
+            
+            # again
+            if rating == 1:
+                self.easeFactor = max(params["minEase"], self.easeFactor - params["againPenalty"]) # drop easeFactor
+                
+                # relearn
+                self.isLearning = True
+                self.learningStep = 0
+                self.interval = 1
+            
+            # hard (remembered but difficult)
+            elif rating == 2:
+                self.easeFactor = max(params["minEase"], self.easeFactor - params["hardPenalty"]) # drop easeFactor
+                self.interval *= params["hardMultiplier"] # increase interval but barely
+            
+            # good
+            elif rating == 3:
+                # easefactor unchanged
+                self.interval *= self.easeFactor
+                # normal exponential growth if remembered well
+            
+            # easy
+            elif rating == 4:
+                self.easeFactor = min(self.easeFactor + params["easyEaseBonus"], params["maxEase"]) # capped at 4x
+                self.interval *= self.easeFactor * params["easyBonus"] # +30% easy bonus v.s. Good
+        
+        # time (the real one, any skip is added back in getDueTime)
+        self.lastReviewTime = clock.realNow()
+        self.interval = round(self.interval, 1)
+        
+        if self.deck != None:
+            self.deck.updateIndex(self)
+    
+    @property
+    def front(self):
+        if self.frontText == None:
+            return textstore.textStore.getText(self.textIndex, 0)
+        return self.frontText
+    
+    @front.setter
+    def front(self, value):
+        self.frontText = value
+    
+    @property
+    def back(self):
+        if self.backText == None:
+            return textstore.textStore.getText(self.textIndex, 1)
+        return self.backText
+    
+    @back.setter
+    def back(self, value):
+        self.backText = value
+    
+    def hasTextInMemory(self): # i.e. new or edited since the last save
+        return self.frontText != None or self.backText != None
+    
+    def setTextIndex(self, index): # text is safely in the TextStore now
+        self.textIndex = index
+        self.frontText = self.backText = None
+    
+    def getDueTime(self): # when the card is due (seconds), None if never reviewed
+        if self.lastReviewTime == None:
+            return None
+        return (self.lastReviewTime + self.interval*60 +
+                clock.getOffsetAt(self.lastReviewTime))
+    
+    def isDue(self, now=None): # checks if you need to review this card
+        if self.lastReviewTime == None:
+            return True
+        else:
+            if now == None:
+                now = clock.now()
+            # getDueTime itself, so this agrees with the due heap exactly
+            if now >= self.getDueTime(): return True
+            else: return False
+
+class Deck:
+    __slots__ = ('cardsById', 'cardList', 'name', 'color', 'dueHeap', 'dueCards', 'heapKeys',
+                 'nextHeapKey', 'advancedTo', 'heapClock', 'newCards', 'learningCards',
+                 'reviewCards', 'version')
+    
+    def __init__(self, name, color='lightBlue'):
+        # cards by id (in the order they were added), so finding or removing
+        # one doesn't search a list; cardList is the list version for
+        # everything that loops over the deck, None when it needs rebuilding
+        self.cardsById = {}
+        self.cardList = []
+        self.name = name
+        self.color = color
+        self.version = 0 # goes up on every change, so screens know to redo stats
+        
+        # due index for review cards:
+        #   dueHeap holds (dueTime, key, card) for cards that aren't due yet
+        #   dueCards holds cards that came off the heap (due until rated again)
+        #   heapKeys maps card -> key of its current heap entry; entries with
+        #   an older key are stale and get skipped when they reach the top
+        self.dueHeap = []
+        self.dueCards = {} # used as an ordered set
+        self.heapKeys = {}
+        self.nextHeapKey = 0
+        self.advancedTo = 0 # clock time advanceDue last moved the heap up to
+        self.heapClock = clock.currentClock # due times depend on its skips
+        
+        # cards grouped by state, so stats are just len() of these
+        self.newCards = {} # never reviewed
+        self.learningCards = {} # reviewed but still in the learning steps
+        self.reviewCards = {} # graduated
+    
+    @property
+    def cards(self):
+        # rebuilt once after deletes instead of list.remove on every delete.
+        # that rebuild changes the deck, so only the app's own thread uses
+        # this; saves on other threads use listCards
+        if self.cardList == None:
+            self.cardList = list(self.cardsById.values())
+        return self.cardList
+    
+    def listCards(self): # a new list every time, nothing on the deck changes
+        return list(self.cardsById.values())
+    
+    def emptyDeck(self):
+        for card in self.cardsById.values():
+            card.deck = None
+        self.cardsById = {}
+        self.cardList = []
+        self.rebuildIndex()
+    
+    def hasCard(self, card):
+        return self.cardsById.get(card.id) is card
+    
+    def getCard(self, cardId): # None if there's no such card in this deck
+        return self.cardsById.get(cardId)
+    
+    def getCardIds(self):
+        return self.cardsById.keys()
+    
+    def addCard(self, card): # returns the card as stored in the deck
+        self.cardsById[card.id] = card
+        if self.cardList != None:
+            self.cardList.append(card)
+        card.deck = self
+        self.version += 1
+        self.indexCard(card) # brand new to this deck, nothing to unindex
+        return card
+    
+    def delCard(self, card):
+        if self.hasCard(card):
+            del self.cardsById[card.id]
+            self.cardList = None
+            card.deck = None
+            self.unindexCard(card)
+            self.version += 1
+    
+    def editCard(self, card, newFront=None, newBack=None):
+        # text only; the card's due time (and so the index) doesn't change
+        if self.hasCard(card):
+            card.front = newFront
+            card.back = newBack
+            self.version += 1
+    
+    ### due index & state groups ###
+    
+    def unindexCard(self, card):
+        self.heapKeys.pop(card, None) # heap entry is now stale
+        self.dueCards.pop(card, None)
+        self.newCards.pop(card, None)
+        self.learningCards.pop(card, None)
+        self.reviewCards.pop(card, None)
+    
+    def groupCard(self, card):
+        if card.lastReviewTime == None:
+            self.newCards[card] = None
+        if card.isLearning and card.lastReviewTime != None:
+            self.learningCards[card] = None
+        if not card.isLearning:
+            self.reviewCards[card] = None
+    
+    def updateIndex(self, card): # call whenever a card's schedule changes
+        self.version += 1
+        self.unindexCard(card)
+        self.indexCard(card)
+    
+    def indexCard(self, card): # card isn't in any group/heap yet
+        self.groupCard(card)
+        if card.lastReviewTime != None and not card.isLearning:
+            self.nextHeapKey += 1
+            self.heapKeys[card] = self.nextHeapKey
+            heapq.heappush(self.dueHeap, (card.getDueTime(), self.nextHeapKey, card))
+            
+            # stale entries pile up as cards get rated; clean up now and then
+            if len(self.dueHeap) > 2*len(self.heapKeys) + 64:
+                self.dueHeap = [entry for entry in self.dueHeap
+                                if self.heapKeys.get(entry[2]) == entry[1]]
+                heapq.heapify(self.dueHeap)
+    
+    def rebuildIndex(self): # e.g. after changing lastReviewTime by hand
+        self.version += 1
+        self.heapClock = clock.currentClock
+        self.dueHeap = []
+        self.dueCards = {}
+        self.heapKeys = {}
+        self.newCards = {}
+        self.learningCards = {}
+        self.reviewCards = {}
+        for card in self.cards:
+            self.groupCard(card)
+            if card.lastReviewTime != None and not card.isLearning:
+                self.nextHeapKey += 1
+                self.heapKeys[card] = self.nextHeapKey
+                self.dueHeap.append((card.getDueTime(), self.nextHeapKey, card))
+        heapq.heapify(self.dueHeap)
+    
+    def advanceDue(self, now): # returns how many heap entries it looked at
+        # the clock can be set back (clock.useClock/freeze), and cards that
+        # came off the heap might not be due any more then. another clock
+        # also has other skips, so other due times
+        if now < self.advancedTo or self.heapClock is not clock.currentClock:
+            self.rebuildIndex()
+        self.advancedTo = now
+        
+        # move everything that became due by now off the heap
+        popped = 0
+        while self.dueHeap != [] and self.dueHeap[0][0] <= now:
+            dueTime, key, card = heapq.heappop(self.dueHeap)
+            popped += 1
+            if self.heapKeys.get(card) == key:
+                del self.heapKeys[card]
+                self.dueCards[card] = None
+        return popped
+    
+    def getNextDueTime(self, now=None):
+        # earliest time a card not due yet becomes due (None if there's none),
+        # i.e. until when getStats()['Due'] stays the same. can be too early
+        # because of stale heap entries, never too late
+        self.advanceDue(clock.now() if now == None else now)
+        if self.dueHeap == []:
+            return None
+        return self.dueHeap[0][0]
+    
+    def getUpcomingCards(self, after, until, now=None):
+        # review cards due after `after` and by `until`, and the earliest due
+        # time past until (None if there's none; can be too early because of
+        # stale heap entries, never too late). the heap is advanced to now
+        # first, and a heap entry is never due before its parent, so the walk
+        # stops at the first entry past until on every branch: it looks at
+        # about as many entries as it finds (plus the cards that came off the
+        # heap after `after`, if any did)
+        self.advanceDue(clock.now() if now == None else now)
+        upcoming = []
+        looked = 0
+        if self.advancedTo > after: # some came off the heap since `after`
+            upcoming = [card for card in self.dueCards if after < card.getDueTime() <= until]
+            looked = len(self.dueCards)
+        laterTime = None
+        toVisit = [0] if self.dueHeap != [] else []
+        while toVisit != []:
+            i = toVisit.pop()
+            dueTime, key, card = self.dueHeap[i]
+            looked += 1
+            if dueTime > until: # everything under it is later still
+                if laterTime == None or dueTime < laterTime:
+                    laterTime = dueTime
+                continue
+            if dueTime > after and self.heapKeys.get(card) == key:
+                upcoming.append(card)
+            toVisit.extend(child for child in (2*i + 1, 2*i + 2) if child < len(self.dueHeap))
+        if profiling.enabled:
+            profiling.countScan('Deck.getUpcomingCards', looked)
+        upcoming.sort(key=lambda card: card.getDueTime())
+        return upcoming, laterTime
+
+    def getDueCards(self, now=None):
+        popped = self.advanceDue(clock.now() if now == None else now)
+        if profiling.enabled:
+            profiling.countScan('Deck.getDueCards', popped + len(self.dueCards))
+        return list(self.dueCards)
+    
+    def getNewCards(self):
+        if profiling.enabled:
+            profiling.countScan('Deck.getNewCards', len(self.newCards))
+        return list(self.newCards)
+        
+    def getLearningCards(self):
+        if profiling.enabled:
+            profiling.countScan('Deck.getLearningCards', len(self.learningCards))
+        return list(self.learningCards)
+    
+    def getReviewCards(self):
+        if profiling.enabled:
+            profiling.countScan('Deck.getReviewCards', len(self.reviewCards))
+        return list(self.reviewCards)
+    
+    def getStats(self, now=None):
+        # only pops cards that became due since last time, so this is
+        # constant time between clock ticks. now: one clock read for the
+        # whole computation (default: clock.now())
+        if now == None:
+            now = clock.now()
+        popped = self.advanceDue(now)
+        if profiling.enabled:
+            profiling.countScan('Deck.getStats', popped)
+        
+        stats = { 'Total': len(self.cardsById),
+                  'Due': len(self.dueCards),
+                  'Learn': len(self.learningCards),
+                  'New': len(self.newCards), 
+                  'Review': len(self.reviewCards) }
+        
+        if settings.debugMode:
+            self.checkStats(stats, now)
+        return stats
+    
+    def checkStats(self, stats, now): # slow recount, for settings.debugMode
+        if profiling.enabled:
+            profiling.countScan('Deck.checkStats', len(self.cards))
+        recount = {'Total': len(self.cards), 'Due': 0, 'Learn': 0, 'New': 0, 'Review': 0}
+        for card in self.cards:
+            if card.isDue(now) and card.lastReviewTime != None and not card.isLearning:
+                recount['Due'] += 1
+            if card.isLearning and card.lastReviewTime != None:
+                recount['Learn'] += 1
+            if card.lastReviewTime == None:
+                recount['New'] += 1
+            if not card.isLearning:
+                recount['Review'] += 1
+        
+        # both counts use the same clock read, so Due has to match too
+        for key in ['Total', 'Due', 'Learn', 'New', 'Review']:
+            assert stats[key] == recount[key], f'{self.name}: {key} is {stats[key]}, recount says {recount[key]}'
@@ -0,0 +1,298 @@
+# numpy backend for decks (settings.deckBackend = 'numpy')
+import math, weakref
+import numpy as np
+from . import textstore, profiling, clock
+from .cards import Flashcard, schedulerParams
+
+def tableColumn(name, toPython):
+    # property that reads/writes one cell of a CardTable column
+    def getValue(card):
+        return toPython(getattr(card.table, name)[card.row])
+    def setValue(card, value):
+        getattr(card.table, name)[card.row] = value
+    return property(getValue, setValue)
+
+def reviewTimeFromTable(value): # never reviewed is stored as nan
+    if math.isnan(value):
+        return None
+    return float(value)
+
+class TableCard:
+    # one row of a CardTable with a Flashcard's attributes and methods, so
+    # updateCard and the screens work on it unchanged. it holds nothing but
+    # where the row is; CardTable.getRowCard makes one when a row's card is
+    # asked for and keeps it only while something else does
+    __slots__ = ('table', 'row', '__weakref__')
+    
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+    
+    @property
+    def deck(self):
+        return self.table
+    
+    id = tableColumn('ids', int)
+    isLearning = tableColumn('isLearning', bool)
+    learningStep = tableColumn('learningStep', int)
+    easeFactor = tableColumn('easeFactor', float)
+    interval = tableColumn('interval', float)
+    
+    @property
+    def lastReviewTime(self):
+        return reviewTimeFromTable(self.table.lastReviewTime[self.row])
+    
+    @lastReviewTime.setter
+    def lastReviewTime(self, value):
+        self.table.lastReviewTime[self.row] = np.nan if value == None else value
+    
+    @property
+    def front(self):
+        text = self.table.fronts[self.row]
+        if text == None: # still in the TextStore ('split' mode)
+            return textstore.textStore.getText(self.textIndex, 0)
+        return text
+    
+    @front.setter
+    def front(self, value):
+        self.table.fronts[self.row] = value
+    
+    @property
+    def back(self):
+        text = self.table.backs[self.row]
+        if text == None:
+            return textstore.textStore.getText(self.textIndex, 1)
+        return text
+    
+    @back.setter
+    def back(self, value):
+        self.table.backs[self.row] = value
+    
+    @property
+    def frontText(self): # in-memory text only, like Flashcard.frontText
+        return self.table.fronts[self.row]
+    
+    @property
+    def backText(self):
+        return self.table.backs[self.row]
+    
+    @property
+    def textIndex(self):
+        return self.table.textIndexes[self.row]
+    
+    def hasTextInMemory(self):
+        return self.frontText != None or self.backText != None
+    
+    def setTextIndex(self, index):
+        self.table.textIndexes[self.row] = index
+        self.table.fronts[self.row] = self.table.backs[self.row] = None
+    
+    updateCard = Flashcard.updateCard
+    getDueTime = Flashcard.getDueTime
+    isDue = Flashcard.isDue
+
+class CardTable:
+    # same interface as Deck, but the scheduling state is kept in parallel
+    # numpy arrays (one row per card) so every query is one vectorized
+    # expression instead of a loop over Flashcard objects
+    def __init__(self, name, color='lightBlue'):
+        self.name = name
+        self.color = color
+        self.version = 0 # goes up on every change, like Deck.version
+        self.emptyDeck()
+    
+    def emptyDeck(self):
+        self.version += 1
+        capacity = 64
+        self.size = 0 # rows in use, including deleted ones
+        self.alive = np.zeros(capacity, dtype=bool) # False once deleted
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.isLearning = np.ones(capacity, dtype=bool)
+        self.learningStep = np.zeros(capacity, dtype=np.int8)
+        self.easeFactor = np.full(capacity, schedulerParams["startEase"])
+        self.interval = np.zeros(capacity)
+        self.lastReviewTime = np.full(capacity, np.nan)
+        
+        # text isn't needed for scheduling, so it stays in plain lists
+        # (None = not loaded, read it from the TextStore at textIndexes[row])
+        self.fronts = []
+        self.backs = []
+        self.textIndexes = []
+        self.rowCards = weakref.WeakValueDictionary() # row -> its TableCard, while in use
+        self.rowsById = {} # card id -> row, alive rows only
+    
+    def grow(self):
+        # double every column; deleted rows are only dropped on the next load
+        extra = len(self.alive)
+        self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+        self.ids = np.concatenate([self.ids, np.zeros(extra, dtype=np.int64)])
+        self.isLearning = np.concatenate([self.isLearning, np.ones(extra, dtype=bool)])
+        self.learningStep = np.concatenate([self.learningStep, np.zeros(extra, dtype=np.int8)])
+        self.easeFactor = np.concatenate([self.easeFactor,
+                                          np.full(extra, schedulerParams["startEase"])])
+        self.interval = np.concatenate([self.interval, np.zeros(extra)])
+        self.lastReviewTime = np.concatenate([self.lastReviewTime, np.full(extra, np.nan)])
+    
+    @property
+    def cards(self): # like Deck.cards, but a new list every time
+        return self.listCards()
+    
+    def listCards(self): # see Deck.listCards
+        return self.cardsWhere(self.alive[:self.size])
+    
+    def getRowCard(self, row):
+        # the same TableCard for a row as long as anything holds on to it,
+        # so cards can still be compared with `is`
+        card = self.rowCards.get(row)
+        if card == None:
+            card = TableCard(self, row)
+            self.rowCards[row] = card
+        return card
+    
+    def addCard(self, card): # copies card into a new row; returns the row's card
+        if self.size == len(self.alive):
+            self.grow()
+        
+        row = self.size
+        self.size += 1
+        self.version += 1
+        self.alive[row] = True
+        self.ids[row] = card.id
+        self.isLearning[row] = card.isLearning
+        self.learningStep[row] = card.learningStep
+        self.easeFactor[row] = card.easeFactor
+        self.interval[row] = card.interval
+        self.lastReviewTime[row] = np.nan if card.lastReviewTime == None else card.lastReviewTime
+        self.fronts.append(card.frontText)
+        self.backs.append(card.backText)
+        self.textIndexes.append(card.textIndex)
+        self.rowsById[card.id] = row
+        return self.getRowCard(row)
+    
+    def addRecords(self, records, fronts, backs):
+        # many cards at once from a structured array (binstore.recordFields),
+        # one column copy each instead of a row at a time like addCard
+        n = len(records)
+        while self.size + n > len(self.alive):
+            self.grow()
+        rows = slice(self.size, self.size + n)
+        self.alive[rows] = True
+        self.ids[rows] = records['id']
+        self.isLearning[rows] = records['isLearning'] != 0
+        self.learningStep[rows] = records['learningStep']
+        self.easeFactor[rows] = records['easeFactor']
+        self.interval[rows] = records['interval']
+        self.lastReviewTime[rows] = records['lastReviewTime'] # nan = never reviewed
+        self.fronts.extend(fronts)
+        self.backs.extend(backs)
+        self.textIndexes.extend([None] * n)
+        self.rowsById.update(zip(records['id'].tolist(), range(self.size, self.size + n)))
+        self.size += n
+        self.version += 1
+
+    def getRecords(self, fields): # alive rows as a structured array, for binstore
+        rows = np.flatnonzero(self.alive[:self.size])
+        records = np.zeros(len(rows), dtype=fields)
+        records['id'] = self.ids[rows]
+        records['isLearning'] = self.isLearning[rows]
+        records['learningStep'] = self.learningStep[rows]
+        records['easeFactor'] = self.easeFactor[rows]
+        records['interval'] = self.interval[rows]
+        records['lastReviewTime'] = self.lastReviewTime[rows]
+        return records
+
+    def hasCard(self, card):
+        return card.deck is self and bool(self.alive[card.row])
+    
+    def getCard(self, cardId): # None if there's no such card in this deck
+        row = self.rowsById.get(cardId)
+        return None if row == None else self.getRowCard(row)
+    
+    def getCardIds(self):
+        return self.rowsById.keys()
+    
+    def delCard(self, card):
+        if self.hasCard(card):
+            self.alive[card.row] = False
+            del self.rowsById[card.id]
+            self.fronts[card.row] = self.backs[card.row] = ''
+            self.version += 1
+    
+    def editCard(self, card, newFront=None, newBack=None):
+        if self.hasCard(card):
+            card.front = newFront
+            card.back = newBack
+            self.version += 1
+    
+    def updateIndex(self, card):
+        # queries read the arrays directly, nothing to keep up to date
+        self.version += 1
+    
+    def rebuildIndex(self):
+        self.version += 1
+    
+    ### vectorized queries ###
+    
+    def getMasks(self, now):
+        n = self.size
+        if profiling.enabled: # every query is a pass over all rows
+            profiling.countScan('CardTable.getMasks', n)
+        alive = self.alive[:n]
+        isLearning = self.isLearning[:n]
+        lastReviewTime = self.lastReviewTime[:n]
+        reviewed = ~np.isnan(lastReviewTime)
+        
+        # nan (never reviewed) compares False, same as isDue's None check
+        dueTimes = lastReviewTime + self.interval[:n]*60 + clock.getOffsetsAt(lastReviewTime)
+        due = (now >= dueTimes) & ~isLearning & alive
+        new = alive & ~reviewed
+        learning = alive & isLearning & reviewed
+        review = alive & ~isLearning
+        return due, new, learning, review
+    
+    def cardsWhere(self, mask):
+        return [self.getRowCard(row) for row in np.flatnonzero(mask).tolist()]
+    
+    def getNextDueTime(self, now=None): # see Deck.getNextDueTime
+        if now == None:
+            now = clock.now()
+        n = self.size
+        lastReviewTime = self.lastReviewTime[:n]
+        dueTimes = lastReviewTime + self.interval[:n]*60 + clock.getOffsetsAt(lastReviewTime)
+        waiting = self.alive[:n] & ~self.isLearning[:n] & (dueTimes > now)
+        if not waiting.any():
+            return None
+        return float(dueTimes[waiting].min())
+    
+    def getUpcomingCards(self, after, until, now=None): # see Deck.getUpcomingCards
+        # (no index to advance, so now isn't needed)
+        n = self.size
+        lastReviewTime = self.lastReviewTime[:n]
+        dueTimes = lastReviewTime + self.interval[:n]*60 + clock.getOffsetsAt(lastReviewTime)
+        reviews = self.alive[:n] & ~self.isLearning[:n]
+        upcoming = reviews & (dueTimes > after) & (dueTimes <= until)
+        later = reviews & (dueTimes > until)
+        rows = np.flatnonzero(upcoming)
+        rows = rows[np.argsort(dueTimes[rows], kind='stable')]
+        laterTime = float(dueTimes[later].min()) if later.any() else None
+        return [self.getRowCard(row) for row in rows.tolist()], laterTime
+
+    def getDueCards(self, now=None):
+        return self.cardsWhere(self.getMasks(clock.now() if now == None else now)[0])
+    
+    def getNewCards(self):
+        return self.cardsWhere(self.getMasks(clock.now())[1])
+    
+    def getLearningCards(self):
+        return self.cardsWhere(self.getMasks(clock.now())[2])
+    
+    def getReviewCards(self):
+        return self.cardsWhere(self.getMasks(clock.now())[3])
+    
+    def getStats(self, now=None):
+        due, new, learning, review = self.getMasks(clock.now() if now == None else now)
+        return { 'Total': int(np.count_nonzero(self.alive[:self.size])),
+                 'Due': int(np.count_nonzero(due)),
+                 'Learn': int(np.count_nonzero(learning)),
+                 'New': int(np.count_nonzero(new)),
+                 'Review': int(np.count_nonzero(review)) }
@@ -0,0 +1,109 @@
+# the scheduler's clock. everything that asks "what time is it" to decide
+# what's due (stats, study queues, the forecast) goes through clock.now()
+# instead of time.time(), so the time can be moved forward or frozen without
+# touching a single card:
+#
+#   from flashcards import clock
+#   clock.skip(24*60*60)          # everything acts a day later ('t' on the menu)
+#   clock.freeze(1700000000)      # time stops here, e.g. for checks
+#   clock.useClock(clock.Clock()) # back to the real time
+#
+# nothing about it is saved; the next start is back on the real clock. so
+# cards are stamped with clock.realNow() when rated, and the skip offset
+# that was in effect then is only added when their due time is worked out
+# (getOffsetAt): a card rated after a skip comes back the same real time
+# later as any other, and its saved stamp doesn't carry the skip into the
+# next start. saving (SaveWorker's delays) and profiling stay on the real
+# clock
+import time, bisect, math
+
+class Clock:
+    def __init__(self, offset=0, frozenTime=None):
+        self.frozenTime = frozenTime # real time it stopped at, None = running
+        self.offset = 0 # seconds added to the real time right now
+        self.skipped = 0 # seconds skipped in total, see getOffset
+        # real times the offset changed at, and what it was from then on
+        self.skipTimes = []
+        self.skipOffsets = []
+        if offset != 0: # cards stamped before this clock count as skipped too
+            self.skip(offset)
+
+    def realNow(self): # what cards are stamped with
+        if self.frozenTime != None:
+            return self.frozenTime
+        now = time.time()
+        if self.skipTimes != [] and now < self.skipTimes[-1]:
+            return self.skipTimes[-1] # same clock tick as the last skip, but after it
+        return now
+
+    def now(self):
+        return self.realNow() + self.offset
+
+    def skip(self, seconds):
+        self.skipped += seconds
+        # just after every stamp so far, so cards rated in the same clock
+        # tick before the skip don't get its offset
+        self.offset += seconds
+        skipTime = math.nextafter(self.realNow(), math.inf)
+        self.skipTimes.append(skipTime)
+        self.skipOffsets.append(self.offset)
+        if self.frozenTime != None:
+            # a stopped clock moves on by that one tick, so cards rated from
+            # now on are stamped after the skip and get its offset too
+            self.frozenTime = skipTime
+
+    def getOffsetAt(self, realTime): # offset in effect when realTime was stamped
+        i = bisect.bisect_right(self.skipTimes, realTime)
+        return 0 if i == 0 else self.skipOffsets[i-1]
+
+    def getOffsetsAt(self, realTimes):
+        # getOffsetAt for a numpy array of stamps (nan stays nan when added)
+        if self.skipTimes == []:
+            return 0
+        import numpy as np # only callers with numpy arrays get here
+        offsets = np.array([0] + self.skipOffsets, dtype=float)
+        return offsets[np.searchsorted(np.array(self.skipTimes), realTimes, side='right')]
+
+    def freeze(self, at=None): # at: scheduler time to stop at (default: now)
+        if at == None:
+            at = self.now()
+        self.frozenTime = at - self.offset
+
+    def unfreeze(self):
+        # keeps going from the real time with the offset, skips made while
+        # frozen included
+        self.frozenTime = None
+
+currentClock = Clock() # the clock the scheduler reads; swap it with useClock
+
+def useClock(newClock):
+    global currentClock
+    currentClock = newClock
+    return newClock
+
+def now():
+    return currentClock.now()
+
+def realNow():
+    return currentClock.realNow()
+
+def skip(seconds):
+    currentClock.skip(seconds)
+
+def freeze(at=None):
+    currentClock.freeze(at)
+
+def unfreeze():
+    currentClock.unfreeze()
+
+def getOffset(): # seconds skipped so far
+    return currentClock.skipped
+
+def getOffsetAt(realTime):
+    return currentClock.getOffsetAt(realTime)
+
+def getOffsetsAt(realTimes):
+    return currentClock.getOffsetsAt(realTimes)
+
+def getAllOffsets(): # every offset getOffsetAt can give
+    return [0] + currentClock.skipOffsets
@@ -0,0 +1,82 @@
+# changing decks/cards; everything goes through these so the journal (or
+# sqlite) sees each change, and so do the app's search and duplicate indexes
+# if it has them (app.searchIndex, app.duplicateIndex; search.py, duplicates.py).
+# each change happens under the app's data lock, so a save running on
+# another thread never copies a deck halfway through one
+from . import clock
+from .cards import Flashcard
+from .storage import cardToDict, makeDeck, recordChange, getDataLock
+from .saveworker import requestSave
+
+def getIndexes(app):
+    indexes = []
+    for name in ('searchIndex', 'duplicateIndex'):
+        index = getattr(app, name, None)
+        if index != None:
+            indexes.append(index)
+    return indexes
+
+def addDeck(app, name, color='lightBlue'):
+    with getDataLock(app):
+        newDeck = makeDeck(name, color)
+        app.decks.append(newDeck)
+        recordChange(app, 'addDeck', newDeck, name=name, color=color)
+    return newDeck
+
+def deleteDeck(app, deck):
+    with getDataLock(app):
+        recordChange(app, 'delDeck', deck)
+        for index in getIndexes(app):
+            index.removeDeck(deck)
+        app.decks.remove(deck)
+
+def addNewCard(app, deck, front, back):
+    with getDataLock(app):
+        newCard = deck.addCard(Flashcard(front, back))
+        recordChange(app, 'addCard', deck, newCard, cardData=cardToDict(newCard))
+        for index in getIndexes(app):
+            index.addCard(deck, newCard)
+    return newCard
+
+def editCardText(app, deck, card, front, back):
+    with getDataLock(app):
+        indexes = getIndexes(app) if deck.hasCard(card) else []
+        for index in indexes:
+            index.removeCard(card) # under its old text
+        deck.editCard(card, front, back)
+        for index in indexes:
+            index.addCard(deck, card)
+        recordChange(app, 'editCard', deck, card, front=front, back=back)
+
+def deleteCard(app, deck, card):
+    with getDataLock(app):
+        if deck.hasCard(card):
+            recordChange(app, 'delCard', deck, card)
+            for index in getIndexes(app):
+                index.removeCard(card) # before its text is gone
+            deck.delCard(card)
+
+def skipTime(app, hrs):
+    # moves the scheduler's clock, not the cards: nothing to save, and the
+    # decks pick the new time up on their next query
+    clock.skip(hrs*60*60) # conv to seconds
+
+def createSampleDeck(app):
+    sample = makeDeck('Example: Python Basics', 'purple')
+    sample.addCard(Flashcard('What word defines a function?', 'def'))
+    sample.addCard(Flashcard('What does len(L) return?', 'length of L'))
+    sample.addCard(Flashcard('Types of loops', 'for and while'))
+    sample.addCard(Flashcard('Can all recursive functions be rewritten iteratively?', 'Yes'))
+    sample.addCard(Flashcard('What is the big-O runtime for len()?', 'O(1)'))
+    sample.addCard(Flashcard('Immutable types', 'int, float, str, tuple'))
+    sample.addCard(Flashcard('Mutable types', 'list, dict, set'))
+    sample.addCard(Flashcard('+ vs += for lists', 'nonmutating vs mutating'))
+    sample.addCard(Flashcard('How do sets search in O(1)?', 'using hashtables'))
+    sample.addCard(Flashcard('What does __init__ do in a class?', 'sets base attributes'))
+    with getDataLock(app):
+        app.decks.append(sample)
+        for index in getIndexes(app):
+            index.addDeck(sample)
+        recordChange(app, 'addDeck', sample, name=sample.name, color=sample.color,
+                     cards=[cardToDict(card) for card in sample.cards])
+    requestSave(app)
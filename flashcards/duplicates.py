@@ -0,0 +1,90 @@
+# exact duplicate checks: does any card in the collection already have this
+# front? fronts are compared normalized (unicode forms, case and runs of
+# spaces don't count, neither does punctuation at either end), so
+# "What is a set?" and "what is a  SET" are the same card.
+#
+#   index = buildDuplicateIndex(app.decks)
+#   index.findDuplicates('what is a set')  # [card, ...]
+#
+# the index is a dict from hash(normalized front) to the card(s) with it,
+# so a check is one dict lookup plus comparing the few cards it finds. the
+# collection helpers keep app.duplicateIndex up to date like the search
+# index; isNewDuplicate is the check the Add button makes. near duplicates (same card worded a bit differently) are found in
+# bulk by minhash.py instead
+import string, unicodedata
+
+def normalizeText(text):
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return ' '.join(text.split()).strip(string.punctuation + ' ')
+
+class DuplicateIndex:
+    def __init__(self):
+        self.byHash = {} # hash(normalized front) -> card, or list of cards
+
+    def addCard(self, deck, card): # same calls as SearchIndex; card.deck is deck
+        key = hash(normalizeText(card.front))
+        entry = self.byHash.get(key)
+        if entry == None:
+            self.byHash[key] = card
+        elif isinstance(entry, list):
+            entry.append(card)
+        else: # a second card with this front (or the same hash)
+            self.byHash[key] = [entry, card]
+
+    def removeCard(self, card):
+        # uses the card's front, so call it before the front changes or
+        # the card is deleted
+        key = hash(normalizeText(card.front))
+        entry = self.byHash.get(key)
+        if entry is card:
+            del self.byHash[key]
+        elif isinstance(entry, list) and card in entry:
+            entry.remove(card)
+            if len(entry) == 1:
+                self.byHash[key] = entry[0]
+
+    def addDeck(self, deck):
+        for card in deck.cards:
+            self.addCard(deck, card)
+
+    def removeDeck(self, deck):
+        for card in deck.cards:
+            self.removeCard(card)
+
+    def findDuplicates(self, front, exceptCard=None):
+        # cards whose front is the same as front once normalized; exceptCard
+        # is left out (the card being edited)
+        normalized = normalizeText(front)
+        entry = self.byHash.get(hash(normalized))
+        if entry == None:
+            return []
+        cards = entry if isinstance(entry, list) else [entry]
+        return [card for card in cards if card is not exceptCard and
+                normalizeText(card.front) == normalized] # not just the same hash
+
+def buildDuplicateIndex(decks):
+    index = DuplicateIndex()
+    for deck in decks:
+        index.addDeck(deck)
+    return index
+
+def getDuplicateIndex(app):
+    # built on the first Add, then kept up to date by the collection helpers
+    if getattr(app, 'duplicateIndex', None) == None:
+        app.duplicateIndex = buildDuplicateIndex(app.decks)
+    return app.duplicateIndex
+
+def isNewDuplicate(app, front, editingCard=None):
+    # the first Add of a front another card already has only warns (the
+    # screen shows app.duplicateMatches); pressing it again with the same
+    # front goes through. editingCard: the card being edited, None for a new one
+    front = front.strip()
+    if editingCard != None and front == editingCard.front.strip():
+        return False # front not changed, whatever else has it already did
+    matches = getDuplicateIndex(app).findDuplicates(front, editingCard)
+    if matches == [] or getattr(app, 'duplicateWarning', None) == front:
+        app.duplicateWarning = None
+        return False
+    app.duplicateWarning = front
+    app.duplicateMatches = matches
+    return True
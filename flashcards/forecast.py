@@ -0,0 +1,132 @@
+# how many reviews are coming up on each of the next days, per deck.
+#
+#   from flashcards.forecast import forecastReviews
+#   forecast = forecastReviews(collection.decks, days=30)
+#   forecast["total"][0]     # reviews today (overdue ones included)
+#   forecast["perDeck"][i]   # the same per day for collection.decks[i]
+#
+# every scheduled card's next due time goes into one numpy array (with the
+# index of its deck next to it) and one bincount gives the whole per-day /
+# per-deck table. Only cards that were reviewed at least once are counted;
+# new cards have no due time. Days start at local midnight, day 0 is today.
+#
+# with ratingMix (e.g. {1: 0.1, 2: 0.15, 3: 0.65, 4: 0.1}) the reviews after
+# that are projected too: every card due inside the window gets a rating
+# drawn from the mix, is rescheduled with the updateCard rules (replay.py's
+# vectorized version) and counted again wherever it lands, until it falls
+# past the last day. Needs numpy, like replay.py
+import time
+from operator import attrgetter
+import numpy as np
+from .replay import updateCards
+from .cardtable import CardTable
+from . import clock
+
+secondsPerDay = 24 * 60 * 60
+maxProjectedRounds = 200 # learning steps and lapses can bring a card back many times
+
+def getDueTimes(lastReviewTime, interval): # Flashcard.getDueTime for arrays
+    return lastReviewTime + interval * 60 + clock.getOffsetsAt(lastReviewTime)
+
+def getScheduleArrays(deck):
+    # isLearning, learningStep, easeFactor, interval, dueTime of every card
+    # in deck that has a due time
+    if isinstance(deck, CardTable): # the columns are already arrays
+        n = deck.size
+        rows = np.flatnonzero(deck.alive[:n] & ~np.isnan(deck.lastReviewTime[:n]))
+        return {"isLearning": deck.isLearning[rows],
+                "learningStep": deck.learningStep[rows].astype(np.int64),
+                "easeFactor": deck.easeFactor[rows],
+                "interval": deck.interval[rows],
+                "dueTime": getDueTimes(deck.lastReviewTime[rows], deck.interval[rows])}
+    # Deck: learningCards/reviewCards are exactly the reviewed cards, so
+    # new ones are never looked at; one C-level pass per field
+    cards = list(deck.learningCards) + list(deck.reviewCards)
+    def column(field, dtype):
+        return np.fromiter(map(attrgetter(field), cards), dtype=dtype, count=len(cards))
+    interval = column('interval', float)
+    return {"isLearning": column('isLearning', bool),
+            "learningStep": column('learningStep', np.int64),
+            "easeFactor": column('easeFactor', float),
+            "interval": interval,
+            "dueTime": getDueTimes(column('lastReviewTime', float), interval)}
+
+class ForecastCache:
+    # schedule arrays per deck, kept until the deck changes (Deck.version);
+    # a card's due time doesn't move just because time passes
+    def __init__(self):
+        self.schedules = {} # deck -> (deck.version, clock it was made with, arrays)
+        self.last = (None, None) # (key, forecast) of the last getForecast
+
+    def getSchedule(self, deck):
+        entry = self.schedules.get(deck)
+        if (entry == None or entry[0] != deck.version or
+            entry[1] is not clock.currentClock): # its skips are in the due times
+            entry = (deck.version, clock.currentClock, getScheduleArrays(deck))
+            self.schedules[deck] = entry
+        return entry[2]
+
+    def getForecast(self, decks, days=30, now=None):
+        # forecastReviews, redone only once a deck changes or a day passes
+        if now == None:
+            now = clock.now()
+        key = ([(deck, deck.version) for deck in decks], getStartOfDay(now), days)
+        if self.last[0] != key:
+            self.forgetDeletedDecks(decks)
+            self.last = (key, forecastReviews(decks, days, now, cache=self))
+        return self.last[1]
+
+    def forgetDeletedDecks(self, decks):
+        if len(self.schedules) > len(decks):
+            self.schedules = {deck: self.schedules[deck] for deck in decks
+                              if deck in self.schedules}
+
+def getStartOfDay(now):
+    year, month, day = time.localtime(now)[:3]
+    return time.mktime((year, month, day, 0, 0, 0, 0, 0, -1))
+
+def forecastReviews(decks, days=30, now=None, ratingMix=None, params=None,
+                    cache=None, seed=112):
+    # params: SM-2 constants for the projection, see cards.schedulerParams
+    if now == None:
+        now = clock.now()
+    decks = list(decks)
+    start = getStartOfDay(now)
+    if decks == []:
+        return {"start": start, "days": days, "perDeck": np.zeros((0, days), dtype=np.int64),
+                "total": np.zeros(days, dtype=np.int64)}
+    end = start + days * secondsPerDay
+
+    schedules = [(cache.getSchedule(deck) if cache != None else getScheduleArrays(deck))
+                 for deck in decks]
+    sizes = [len(schedule["dueTime"]) for schedule in schedules]
+    deckIndex = np.repeat(np.arange(len(decks)), sizes)
+    columns = {name: np.concatenate([schedule[name] for schedule in schedules])
+               for name in ["isLearning", "learningStep", "easeFactor", "interval", "dueTime"]}
+
+    counts = np.zeros(len(decks) * days, dtype=np.int64)
+    dueTime = columns["dueTime"]
+    upcoming = np.flatnonzero(dueTime < end)
+    rng = np.random.default_rng(seed)
+    for i in range(maxProjectedRounds if ratingMix != None else 1):
+        if len(upcoming) == 0:
+            break
+        # overdue cards count for today
+        day = np.maximum((dueTime[upcoming] - start) // secondsPerDay, 0).astype(np.int64)
+        counts += np.bincount(deckIndex[upcoming] * days + day, minlength=len(counts))
+        if ratingMix == None:
+            break
+
+        # rate everything counted just now and see where it lands next
+        ratings = rng.choice(list(ratingMix), size=len(upcoming),
+                             p=np.array(list(ratingMix.values())) / sum(ratingMix.values()))
+        reviewTime = np.maximum(dueTime[upcoming], now)
+        (columns["isLearning"][upcoming], columns["learningStep"][upcoming],
+         columns["easeFactor"][upcoming], columns["interval"][upcoming]) = updateCards(
+            columns["isLearning"][upcoming], columns["learningStep"][upcoming],
+            columns["easeFactor"][upcoming], columns["interval"][upcoming], ratings, params)
+        dueTime[upcoming] = reviewTime + columns["interval"][upcoming] * 60
+        upcoming = upcoming[dueTime[upcoming] < end]
+
+    perDeck = counts.reshape(len(decks), days)
+    return {"start": start, "days": days, "perDeck": perDeck, "total": perDeck.sum(axis=0)}
@@ -0,0 +1,142 @@
+# reading a big flashcard_data.json a piece at a time instead of json.load,
+# so decks and cards get built while the file is read and only one card's
+# dict exists at a time (json.load would build the whole tree first).
+#
+# the outer structure ({"decks": [{"name": ..., "cards": [...]}, ...]}) is
+# walked by hand; every card (and any other value) is parsed by the json
+# module's own decoder straight out of the buffer
+import json, re
+
+chunkSize = 1 << 20
+whitespace = ' \t\n\r'
+skipWhitespace = re.compile(r'[ \t\n\r]*')
+
+class JsonStream:
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ''
+        self.pos = 0
+        self.atEnd = False
+        self.decoder = json.JSONDecoder()
+
+    def readMore(self):
+        # drop what's been parsed already, then add the next chunk
+        if self.pos > 0:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(chunkSize)
+        if chunk == '':
+            self.atEnd = True
+        self.buffer += chunk
+
+    def peek(self): # next non-whitespace character, '' at the end of the file
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in whitespace:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.atEnd:
+                return ''
+            self.readMore()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f'expected {char!r} in the data file, got {self.peek()!r}')
+        self.pos += 1
+
+    def readValue(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number right at the end of the buffer might continue
+                # in the next chunk, so only trust it if there's more after
+                if end < len(self.buffer) or self.atEnd:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.atEnd:
+                    raise
+            self.readMore()
+
+    def readArrayValues(self):
+        # the values of an array, one at a time. same as readItems +
+        # readValue, just with less Python per value (cards are most of
+        # the file)
+        self.expect('[')
+        scan = self.decoder.scan_once # the C scanner raw_decode uses
+        skip = skipWhitespace.match
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            buffer = self.buffer
+            pos = skip(buffer, self.pos).end()
+            try:
+                value, end = scan(buffer, pos)
+            except (StopIteration, json.JSONDecodeError):
+                end = len(buffer) # cut off by the end of the chunk (or broken)
+            nextPos = skip(buffer, end).end()
+            if nextPos >= len(buffer): # no ',' or ']' in this chunk yet
+                if self.atEnd:
+                    self.pos = pos
+                    self.readValue() # raises the real error
+                    self.expect(']')
+                self.pos = pos
+                self.readMore()
+                continue
+            self.pos = nextPos + 1
+            yield value
+            if buffer[nextPos] == ']':
+                return
+            if buffer[nextPos] != ',':
+                self.pos = nextPos
+                self.expect(',')
+
+    def readItems(self, open, close):
+        # the commas and end of an object/array; yields once per item,
+        # with the stream at the start of the item (after "key": for objects)
+        self.expect(open)
+        if self.peek() == close:
+            self.pos += 1
+            return
+        while True:
+            if open == '{':
+                key = self.readValue()
+                self.expect(':')
+                yield key
+            else:
+                yield None
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self.expect(close)
+                return
+
+def iterSnapshot(f):
+    # events, in file order:
+    #   ('field', key, value)  top level values other than "decks"
+    #   ('deckStart', fields)  a deck begins (fields read before its cards)
+    #   ('card', cardData)
+    #   ('deckEnd', fields)    a deck is done (all of its other fields)
+    stream = JsonStream(f)
+    for key in stream.readItems('{', '}'):
+        if key != "decks":
+            yield ('field', key, stream.readValue())
+            continue
+        for i in stream.readItems('[', ']'):
+            fields = {}
+            started = False
+            for deckKey in stream.readItems('{', '}'):
+                if deckKey != "cards":
+                    fields[deckKey] = stream.readValue()
+                    continue
+                yield ('deckStart', fields)
+                started = True
+                for cardData in stream.readArrayValues():
+                    yield ('card', cardData)
+            if not started:
+                yield ('deckStart', fields)
+            yield ('deckEnd', fields)
+    if stream.peek() != '':
+        raise ValueError('unexpected data after the end of the data file')
@@ -0,0 +1,111 @@
+# opt-in timing for the hot paths: run with FLASHCARDS_PROFILE=1 and a
+# report of every timed operation (p50/p95/p99) and how many cards each deck
+# query looked at is printed on exit. Off by default, and then @timed hands
+# back the function untouched so there's no cost at all.
+#
+#   @profiling.timed('saveData')
+#   def saveData(app): ...
+import atexit, functools, math, os, threading, time
+
+enabled = os.environ.get('FLASHCARDS_PROFILE', '') not in ('', '0')
+
+bucketsPerDoubling = 4 # histogram resolution, ~19% wide buckets
+
+class Histogram:
+    # latencies in log-spaced buckets, so memory stays the same no matter
+    # how long the app runs (onMouseMove fires a lot)
+    def __init__(self):
+        self.buckets = {} # bucket -> count
+        self.count = 0
+        self.total = 0
+        self.maxValue = 0
+
+    def add(self, ms):
+        bucket = math.ceil(math.log2(max(ms, 0.001)) * bucketsPerDoubling)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += ms
+        self.maxValue = max(self.maxValue, ms)
+
+    def percentile(self, p): # upper edge of the bucket holding the p-th percentile
+        if self.count == 0:
+            return 0
+        needed = self.count * p / 100
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= needed:
+                return min(2 ** (bucket / bucketsPerDoubling), self.maxValue)
+        return self.maxValue
+
+histograms = {} # operation -> Histogram of ms
+scans = {} # deck query -> [calls, cards looked at]
+currentFrame = {} # operation -> ms since the last redrawAll finished
+lastFrame = {} # the same for the frame before, for the debug overlay
+lock = threading.Lock() # saveData runs on the SaveWorker thread
+
+def record(name, ms):
+    with lock:
+        if name not in histograms:
+            histograms[name] = Histogram()
+        histograms[name].add(ms)
+        currentFrame[name] = currentFrame.get(name, 0) + ms
+
+def countScan(query, numCards):
+    # callers check profiling.enabled first, this is on every deck query
+    with lock:
+        if query not in scans:
+            scans[query] = [0, 0]
+        scans[query][0] += 1
+        scans[query][1] += numCards
+
+def endFrame():
+    global currentFrame, lastFrame
+    with lock:
+        lastFrame = currentFrame
+        currentFrame = {}
+
+def timed(name, frame=False):
+    # frame=True for redrawAll: finishing it closes the current frame
+    def decorator(function):
+        if not enabled:
+            return function
+
+        @functools.wraps(function) # keeps the signature cmu_graphics looks at
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, (time.perf_counter() - start) * 1000)
+                if frame:
+                    endFrame()
+        return wrapper
+    return decorator
+
+def getFrameBreakdown(): # [(operation, ms)] of the last frame, slowest first
+    with lock:
+        return sorted(lastFrame.items(), key=lambda item: -item[1])
+
+def makeReport():
+    lines = [f"{'operation':<26} {'calls':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+    with lock:
+        for name in sorted(histograms):
+            histogram = histograms[name]
+            lines.append(f'{name:<26} {histogram.count:>8} {histogram.percentile(50):>9.3f} '
+                         f'{histogram.percentile(95):>9.3f} {histogram.percentile(99):>9.3f} '
+                         f'{histogram.maxValue:>9.3f}')
+        if scans != {}:
+            lines.append('')
+            lines.append(f"{'deck query':<26} {'calls':>8} {'cards':>12} {'per call':>9}")
+            for query in sorted(scans):
+                calls, numCards = scans[query]
+                lines.append(f'{query:<26} {calls:>8} {numCards:>12} {numCards/calls:>9.1f}')
+    return '\n'.join(lines)
+
+def printReport():
+    if histograms != {} or scans != {}:
+        print(makeReport())
+
+if enabled:
+    atexit.register(printReport)
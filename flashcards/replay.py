@@ -0,0 +1,130 @@
+# rebuilding card states from the review log with numpy
+import os
+import numpy as np
+from . import settings
+from .cards import schedulerParams
+from .cardtable import reviewTimeFromTable
+from .reviewlog import reviewFields
+
+def readReviewLog(path=None):
+    # the whole log as a numpy structured array (one row per rating)
+    if path == None:
+        path = settings.getReviewLogPath()
+    dtype = np.dtype(reviewFields)
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=dtype)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    whole = len(raw) - len(raw) % dtype.itemsize # drop a half written record
+    return np.frombuffer(raw[:whole], dtype=dtype)
+
+def roundIntervals(intervals):
+    # vectorized round(interval, 1). rint works on the binary value of
+    # interval*10 while round() looks at the exact decimal, so they can only
+    # disagree right at a tie, or once interval*10 stops being exact (huge
+    # intervals); use round() for those few
+    scaled = intervals * 10
+    rounded = np.rint(scaled) / 10
+    with np.errstate(invalid='ignore'):
+        unsure = ((np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6) |
+                  ~(np.abs(intervals) < 2**49))
+    for i in np.flatnonzero(unsure):
+        rounded[i] = round(float(intervals[i]), 1)
+    return rounded
+
+def updateCards(isLearning, learningStep, easeFactor, interval, rating, params=None):
+    # Flashcard.updateCard for many cards at once; returns new arrays.
+    # params: SM-2 constants like cards.schedulerParams (the default)
+    if params == None:
+        params = schedulerParams
+    newLearning = isLearning.copy()
+    newStep = learningStep.copy()
+    newEase = easeFactor.copy()
+    newInterval = interval.copy()
+    learn = isLearning
+    review = ~isLearning
+    
+    # learning: again / hard / good / easy
+    m = learn & (rating == 1)
+    newStep[m] = 0
+    newInterval[m] = 1
+    m = learn & (rating == 2) & (learningStep == 0)
+    newInterval[m] = 6
+    newStep[m] = 1
+    m = learn & (rating == 2) & (learningStep != 0)
+    newInterval[m] = 10
+    m = learn & (rating == 3)
+    step = learningStep[m] + 1
+    newStep[m] = step
+    newLearning[m] = step < 2
+    newInterval[m] = np.where(step < 2, 10, 1 * 24 * 60)
+    m = learn & (rating == 4)
+    newLearning[m] = False
+    newInterval[m] = 4 * 24 * 60
+    
+    # review: again / hard / good / easy
+    m = review & (rating == 1)
+    newEase[m] = np.maximum(params["minEase"], easeFactor[m] - params["againPenalty"])
+    newLearning[m] = True
+    newStep[m] = 0
+    newInterval[m] = 1
+    m = review & (rating == 2)
+    newEase[m] = np.maximum(params["minEase"], easeFactor[m] - params["hardPenalty"])
+    newInterval[m] = interval[m] * params["hardMultiplier"]
+    m = review & (rating == 3)
+    newInterval[m] = interval[m] * easeFactor[m]
+    m = review & (rating == 4)
+    ease = np.minimum(easeFactor[m] + params["easyEaseBonus"], params["maxEase"])
+    newEase[m] = ease
+    newInterval[m] = interval[m] * (ease * params["easyBonus"])
+    
+    return newLearning, newStep, newEase, roundIntervals(newInterval)
+
+def replayReviews(reviews):
+    # recompute every logged card's current state from its ratings alone.
+    # reviews are grouped per card and replayed in passes: pass r applies
+    # the r-th rating of every card that has one, as a single vectorized step.
+    # returns {cardId: (isLearning, learningStep, easeFactor, interval, lastReviewTime)}
+    if len(reviews) == 0:
+        return {}
+    
+    order = np.lexsort((reviews['time'], reviews['cardId']))
+    reviews = reviews[order]
+    cardIds, firstRow, counts = np.unique(reviews['cardId'], return_index=True,
+                                          return_counts=True)
+    
+    # start from the state each card had before its first logged rating
+    isLearning = reviews['preLearning'][firstRow].copy()
+    learningStep = reviews['preStep'][firstRow].astype(np.int64)
+    easeFactor = reviews['preEase'][firstRow].copy()
+    interval = reviews['preInterval'][firstRow].copy()
+    reviewTime = reviews['preReviewTime'][firstRow].copy()
+    
+    # cards with the most ratings first, so the cards still going in pass r
+    # are always a prefix
+    byCount = np.argsort(-counts, kind='stable')
+    sortedCounts = counts[byCount]
+    for r in range(int(sortedCounts[0])):
+        cards = byCount[:np.searchsorted(-sortedCounts, -r, side='left')]
+        rows = firstRow[cards] + r
+        (isLearning[cards], learningStep[cards], easeFactor[cards],
+         interval[cards]) = updateCards(isLearning[cards], learningStep[cards],
+                                        easeFactor[cards], interval[cards],
+                                        reviews['rating'][rows])
+        reviewTime[cards] = reviews['time'][rows]
+    
+    states = {}
+    for i in range(len(cardIds)):
+        states[int(cardIds[i])] = (bool(isLearning[i]), int(learningStep[i]),
+                                   float(easeFactor[i]), float(interval[i]),
+                                   reviewTimeFromTable(reviewTime[i]))
+    return states
+
+def applyReplayedStates(app, states):
+    # overwrite cards' scheduling with replayReviews output
+    for deck in app.decks:
+        for card in deck.cards:
+            if card.id in states:
+                (card.isLearning, card.learningStep, card.easeFactor,
+                 card.interval, card.lastReviewTime) = states[card.id]
+        deck.rebuildIndex()
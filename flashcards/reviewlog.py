@@ -0,0 +1,45 @@
+# history of every rating, see ReviewLog (replay.py reads it back)
+import math, struct, threading
+
+# one fixed size record per rating: card id, time, rating, then the card's
+# (isLearning, learningStep, easeFactor, interval, lastReviewTime) before
+# the rating and (isLearning, learningStep, easeFactor, interval) after it.
+# the post-rating lastReviewTime is the record's time.
+# never reviewed (lastReviewTime None) is stored as nan
+reviewRecord = struct.Struct('<qdb?bddd?bdd')
+reviewFields = [('cardId', '<i8'), ('time', '<f8'), ('rating', 'i1'),
+                ('preLearning', '?'), ('preStep', 'i1'), ('preEase', '<f8'),
+                ('preInterval', '<f8'), ('preReviewTime', '<f8'),
+                ('postLearning', '?'), ('postStep', 'i1'), ('postEase', '<f8'),
+                ('postInterval', '<f8')]
+
+def getReviewState(card):
+    return (card.isLearning, card.learningStep, card.easeFactor,
+            card.interval, card.lastReviewTime)
+
+class ReviewLog:
+    def __init__(self, path):
+        self.path = path
+        self.pending = bytearray() # packed records not written yet
+        self.lock = threading.Lock() # pending is shared with the SaveWorker
+    
+    def record(self, card, rating, before):
+        # before = getReviewState(card) from just before card.updateCard(rating)
+        preLearning, preStep, preEase, preInterval, preReviewTime = before
+        if preReviewTime == None:
+            preReviewTime = math.nan
+        record = reviewRecord.pack(card.id, card.lastReviewTime, rating,
+                                   preLearning, preStep, preEase, preInterval,
+                                   preReviewTime, card.isLearning,
+                                   card.learningStep, card.easeFactor,
+                                   card.interval)
+        with self.lock:
+            self.pending += record
+    
+    def flush(self):
+        with self.lock:
+            records = self.pending
+            self.pending = bytearray()
+        if len(records) > 0:
+            with open(self.path, 'ab') as f:
+                f.write(records)
@@ -0,0 +1,84 @@
+# batching saves onto a background thread. the write copies the decks
+# under the app's data lock (storage.getDataLock), the same one the helpers
+# hold while changing them, and writes the copy without holding it
+import time, threading
+from . import settings
+from .storage import saveData
+
+def requestSave(app):
+    # call after a change; bursts of them become one write a little later.
+    # without a SaveWorker (scripts, tools) just save right away
+    saver = getattr(app, 'saver', None)
+    if saver == None:
+        saveData(app)
+    else:
+        saver.requestSave()
+
+def flushSaves(app):
+    # write anything still pending right now (used on exit)
+    if getattr(app, 'saver', None) != None:
+        app.saver.flush()
+    app.journal.wait()
+
+class SaveWorker:
+    def __init__(self, app):
+        self.app = app
+        self.dirty = False # a save was requested but hasn't started yet
+        self.writing = False # saveData is running right now
+        self.firstRequest = None # when the oldest unsaved request came in
+        self.lastRequest = None
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+    
+    def requestSave(self):
+        with self.condition:
+            now = time.time()
+            if not self.dirty:
+                self.dirty = True
+                self.firstRequest = now
+            self.lastRequest = now
+            self.condition.notify_all()
+    
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.dirty or self.writing:
+                    self.condition.wait()
+                
+                # keep waiting while requests keep coming in (e.g. typing)
+                while self.dirty:
+                    now = time.time()
+                    writeAt = min(self.lastRequest + settings.saveDelay,
+                                  self.firstRequest + settings.saveMaxDelay)
+                    if now >= writeAt:
+                        break
+                    self.condition.wait(writeAt - now)
+                
+                if not self.dirty or self.writing: # flush() got to it first
+                    continue
+                self.dirty = False
+                self.writing = True
+            
+            self.write()
+    
+    def write(self):
+        try:
+            saveData(self.app)
+        except OSError as e:
+            print(f"Could not save: {e}")
+        finally:
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+    
+    def flush(self):
+        with self.condition:
+            # let a write that already started finish first
+            while self.writing:
+                self.condition.wait()
+            if not self.dirty:
+                return
+            self.dirty = False
+            self.writing = True
+        self.write()
@@ -0,0 +1,288 @@
+# full-text search over every card's front and back, across all decks.
+#
+#   index = buildIndex(app.decks)
+#   matches, complete = index.search('pyth func') # [(deck, card), ...]
+#
+# an inverted index: each word -> sorted card ids that have it, plus every
+# word in one sorted list so a prefix ("pyth") is a bisect away from the
+# words starting with it. every word in a query is a prefix and a card has
+# to have all of them, so it works for find-as-you-type.
+#
+# the collection helpers (collection.py) keep app.searchIndex up to date on
+# every add/edit/delete instead of rebuilding it. it's saved next to the data
+# file on exit (flashcard_search.idx) with the size and mtime of the data
+# files; if those still match on the next start it's read back instead of
+# going through every card's text again
+#
+# file layout (little-endian):
+#   header   magic, format version, length of the stamp, number of words,
+#            number of ids, length of the words (headerFormat)
+#   stamp    json from getDataStamp(), padded with spaces to a multiple of 8
+#   ids      int64 card ids, word by word in word order
+#   counts   uint32 per word: how many of the ids are its
+#   words    utf-8, in order, separated by newlines
+import json, os, re, struct, sys
+from array import array
+from bisect import bisect_left, insort
+from . import settings
+
+magic = b'FLASHIDX'
+formatVersion = 1
+headerFormat = struct.Struct('<8sIIQQQ')
+
+wordPattern = re.compile(r'\w+')
+lastChar = chr(0x10ffff) # sorts after anything a word can continue with
+
+# other query words with up to this many cards are checked by card id,
+# more than that by looking at the text of each card the rarest word finds
+maxSetSize = 20000
+# a query whose rarest word still leaves lots of cards to check against the
+# text (e.g. "a b") stops after this many and says it's incomplete
+maxChecks = 5000
+
+def tokenize(text):
+    return wordPattern.findall(text.lower())
+
+def getCardTokens(card):
+    return set(tokenize(card.front + '\n' + card.back))
+
+def hasAllPrefixes(text, patterns): # text already lowercase
+    for pattern in patterns:
+        if pattern.search(text) == None:
+            return False
+    return True
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = {} # word -> array('q') of card ids, sorted
+        self.vocab = [] # every word in postings, sorted
+        self.cardDecks = {} # card id -> deck it's in
+
+    def __len__(self):
+        return len(self.cardDecks)
+
+    ### keeping it up to date ###
+
+    def addCard(self, deck, card):
+        self.cardDecks[card.id] = deck
+        for token in getCardTokens(card):
+            ids = self.postings.get(token)
+            if ids == None:
+                self.postings[token] = array('q', [card.id])
+                insort(self.vocab, token)
+            elif ids[-1] < card.id: # new cards get the biggest ids so far
+                ids.append(card.id)
+            else:
+                i = bisect_left(ids, card.id)
+                if i == len(ids) or ids[i] != card.id:
+                    ids.insert(i, card.id)
+
+    def removeCard(self, card):
+        # uses the card's text, so call it before the text changes or the
+        # card is deleted
+        if self.cardDecks.pop(card.id, None) == None:
+            return
+        for token in getCardTokens(card):
+            ids = self.postings.get(token)
+            if ids == None:
+                continue
+            i = bisect_left(ids, card.id)
+            if i < len(ids) and ids[i] == card.id:
+                del ids[i]
+            if len(ids) == 0:
+                del self.postings[token]
+                del self.vocab[bisect_left(self.vocab, token)]
+
+    def addDeck(self, deck):
+        for card in deck.cards:
+            self.addCard(deck, card)
+
+    def removeDeck(self, deck):
+        for card in deck.cards:
+            self.removeCard(card)
+
+    ### lookups ###
+
+    def getPrefixRange(self, term): # vocab[lo:hi] are the words starting with term
+        return (bisect_left(self.vocab, term), bisect_left(self.vocab, term + lastChar))
+
+    def countIds(self, wordRange, cap=None): # stops counting once past cap
+        total = 0
+        for i in range(wordRange[0], wordRange[1]):
+            total += len(self.postings[self.vocab[i]])
+            if cap != None and total >= cap:
+                break
+        return total
+
+    def getIds(self, wordRange): # set of every card id in the range
+        ids = set()
+        for i in range(wordRange[0], wordRange[1]):
+            ids.update(self.postings[self.vocab[i]])
+        return ids
+
+    def search(self, query, limit=50):
+        # returns ([(deck, card), ...], complete); complete is False when
+        # there could be more matches than the ones returned
+        terms = sorted(set(tokenize(query)))
+        if len(terms) == 0:
+            return [], True
+        ranges = [self.getPrefixRange(term) for term in terms]
+
+        # go through the cards of the rarest term, check the rest on their text
+        best = 0
+        if len(terms) > 1:
+            bestCount = None
+            for i in range(len(terms)):
+                count = self.countIds(ranges[i], bestCount)
+                if bestCount == None or count < bestCount:
+                    best, bestCount = i, count
+        # the other terms are checked against their own card ids when there
+        # aren't too many, otherwise on the card's text (a word starting
+        # with term = term right after a non-word character)
+        idSets = []
+        patterns = []
+        for i in range(len(terms)):
+            if i == best:
+                continue
+            if self.countIds(ranges[i], maxSetSize) < maxSetSize:
+                idSets.append(self.getIds(ranges[i]))
+            else:
+                patterns.append(re.compile(r'\b' + re.escape(terms[i])))
+
+        # the word that is exactly the term comes first in its range, so
+        # whole-word matches are listed before longer words
+        matches = []
+        seen = set() # a card can have several words with the same prefix
+        checks = 0
+        lo, hi = ranges[best]
+        for i in range(lo, hi):
+            for cardId in self.postings[self.vocab[i]]:
+                if cardId in seen:
+                    continue
+                seen.add(cardId)
+                if not all(cardId in ids for ids in idSets):
+                    continue
+                deck = self.cardDecks[cardId]
+                card = deck.getCard(cardId)
+                if len(patterns) > 0:
+                    checks += 1
+                    if checks > maxChecks:
+                        return matches, False
+                    if not hasAllPrefixes((card.front + '\n' + card.back).lower(), patterns):
+                        continue
+                if len(matches) == limit:
+                    return matches, False
+                matches.append((deck, card))
+        return matches, True
+
+    ### saving ###
+
+    def save(self, path, stamp):
+        counts = array('I', [len(self.postings[token]) for token in self.vocab])
+        ids = array('q')
+        for token in self.vocab:
+            ids.extend(self.postings[token])
+        if sys.byteorder == 'big':
+            counts.byteswap()
+            ids.byteswap()
+        stampBytes = json.dumps(stamp).encode('utf-8')
+        stampBytes += b' ' * ((len(stampBytes) + 7) // 8 * 8 - len(stampBytes))
+        wordBytes = '\n'.join(self.vocab).encode('utf-8')
+        header = headerFormat.pack(magic, formatVersion, len(stampBytes), len(self.vocab),
+                                   len(ids), len(wordBytes))
+
+        # swapped in like the snapshots, so a crash never leaves half a file
+        tempPath = path + '.tmp'
+        with open(tempPath, 'wb') as f:
+            f.write(header)
+            f.write(stampBytes)
+            f.write(ids.tobytes())
+            f.write(counts.tobytes())
+            f.write(wordBytes)
+        os.replace(tempPath, path)
+
+def buildIndex(decks):
+    index = SearchIndex()
+    lists = {} # word -> list of ids, made into arrays at the end
+    for deck in decks:
+        for card in deck.cards:
+            index.cardDecks[card.id] = deck
+            for token in getCardTokens(card):
+                ids = lists.get(token)
+                if ids == None:
+                    lists[token] = [card.id]
+                else:
+                    ids.append(card.id)
+    for token, ids in lists.items():
+        ids.sort() # decks don't have to be in id order
+        index.postings[token] = array('q', ids)
+    index.vocab = sorted(index.postings)
+    return index
+
+def loadIndex(path, decks, stamp):
+    # None if there's no saved index or it's not for these files anymore
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < headerFormat.size:
+        return None
+    fileMagic, version, stampLength, numWords, numIds, wordLength = headerFormat.unpack_from(data, 0)
+    idStart = headerFormat.size + stampLength
+    countStart = idStart + numIds * 8
+    wordStart = countStart + numWords * 4
+    if (fileMagic != magic or version != formatVersion or
+        len(data) != wordStart + wordLength):
+        return None
+    if json.loads(data[headerFormat.size:idStart]) != stamp:
+        return None
+
+    ids = array('q')
+    ids.frombytes(data[idStart:countStart])
+    counts = array('I')
+    counts.frombytes(data[countStart:wordStart])
+    if sys.byteorder == 'big':
+        ids.byteswap()
+        counts.byteswap()
+    index = SearchIndex()
+    index.vocab = data[wordStart:].decode('utf-8').split('\n') if numWords > 0 else []
+    start = 0
+    for token, count in zip(index.vocab, counts):
+        index.postings[token] = ids[start:start+count]
+        start += count
+    # which deck each card is in isn't saved, the decks already know
+    for deck in decks:
+        for cardId in deck.getCardIds():
+            index.cardDecks[cardId] = deck
+    return index
+
+def getDataStamp():
+    # size and mtime of every file the collection could have been loaded
+    # from; anything saved since the index was makes these different
+    fileNames = [settings.dataFile, settings.databaseFile, settings.databaseFile + '-wal',
+                 settings.metaFile, settings.textFile, settings.textIndexFile,
+                 settings.binaryFile]
+    paths = [settings.getSiblingPath(fileName) for fileName in fileNames]
+    if os.path.isdir(os.path.dirname(settings.getDataPath())):
+        paths += [settings.getJournalPath(segment) for segment in settings.listJournalSegments()]
+    stamp = [settings.storageMode]
+    for path in paths:
+        if os.path.exists(path):
+            info = os.stat(path)
+            stamp.append([os.path.basename(path), info.st_size, info.st_mtime_ns])
+    return stamp
+
+def getIndexPath():
+    return settings.getSiblingPath(settings.searchIndexFile)
+
+def openIndex(decks):
+    # the saved index if it's still good, otherwise a new one
+    stamp = getDataStamp()
+    index = loadIndex(getIndexPath(), decks, stamp)
+    if index == None:
+        index = buildIndex(decks)
+    return index
+
+def saveIndex(index):
+    index.save(getIndexPath(), getDataStamp())
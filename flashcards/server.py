@@ -0,0 +1,414 @@
+# JSON API over HTTP, so many learners can share one scheduler process
+# instead of each running the app:
+#
+#   python3 -m flashcards.server [--host 127.0.0.1] [--port 8112]
+#                                [--data users] [--max-users 1000]
+#
+#   GET  /users/<user>/decks                      every deck with its stats
+#   POST /users/<user>/decks                      {"name", "color"} -> new deck
+#   GET  /users/<user>/decks/<deck>/next          card to study now, or null
+#                                                 and when the next one is up
+#   POST /users/<user>/decks/<deck>/rate          {"card": id, "rating": 1-4}
+#   POST /users/<user>/decks/<deck>/cards         {"front", "back"} -> new card
+#   PUT  /users/<user>/decks/<deck>/cards/<card>  {"front", "back"}
+#
+# decks are numbered by their position, like the journal does. everything
+# runs on one asyncio event loop, so only one request at a time ever touches
+# a user's decks, and the work is done by the same helpers as the app
+# (buildStudyQueue, rateCard, addNewCard, ...). up to maxUsers collections
+# stay in memory, least recently used ones are dropped first. saving is
+# write-behind: a change only marks the user dirty, and dirty users are
+# written on a thread every writeDelay seconds, when they're dropped, and on
+# shutdown. each user is one json snapshot plus a review log in the data
+# folder, like storageMode = 'json'
+import argparse, asyncio, json, os, re, signal, sys
+from collections import OrderedDict
+from . import settings, clock
+from .storage import Collection, Journal, addDecksFromData, writeFullSnapshot, cardToDict
+from .reviewlog import ReviewLog
+from .collection import addDeck, addNewCard, editCardText
+from .saveworker import requestSave
+from .study import buildStudyQueue, rateCard, previewIntervalsIfRated
+
+maxBodyBytes = 1024 * 1024
+userIdPattern = re.compile(r'[A-Za-z0-9_-]{1,64}') # user ids become file names
+
+httpReasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 409: 'Conflict',
+               413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class UserCollection(Collection):
+    # one learner's decks, with a study session per deck kept between
+    # requests (like app.cardsDue, but for every deck they've opened)
+    def __init__(self, userId, dataDir, onDirty):
+        super().__init__()
+        self.userId = userId
+        self.path = os.path.join(dataDir, userId + '.json')
+        self.journal = Journal() # unused, writeFullSnapshot reads its segment
+        self.reviewLog = ReviewLog(os.path.join(dataDir, userId + '.reviews.bin'))
+        self.sessions = {} # deck -> StudySession
+        self.saver = self # requestSave(user) from study.py etc. lands in requestSave below
+        self.onDirty = onDirty
+        self.dirty = False # changed since the last save started
+        self.saving = asyncio.Lock() # held while the user is being written
+
+    def requestSave(self):
+        if not self.dirty:
+            self.dirty = True
+            self.onDirty(self)
+
+    def getSession(self, deck):
+        session = self.sessions.get(deck)
+        if session == None:
+            session = buildStudyQueue(self, deck)
+            self.sessions[deck] = session
+        return session
+
+def readUserFile(path): # runs on a thread
+    if not os.path.exists(path):
+        return {"decks": []}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def writeUser(user): # runs on a thread, while the loop keeps changing decks
+    user.reviewLog.flush()
+    writeFullSnapshot(user, user.path)
+
+### requests ###
+
+def getDeck(user, deckText):
+    if not deckText.isdigit() or int(deckText) >= len(user.decks):
+        raise HttpError(404, f'no deck {deckText}')
+    return user.decks[int(deckText)]
+
+def getText(data, key):
+    value = data.get(key)
+    if not isinstance(value, str) or value.strip() == '':
+        raise HttpError(400, f'"{key}" has to be a non-empty string')
+    return value.strip()
+
+def cardInfo(card):
+    info = cardToDict(card)
+    info["dueTime"] = card.getDueTime()
+    info["intervals"] = previewIntervalsIfRated(card)
+    return info
+
+def listDecks(user, now):
+    return {"decks": [{"deck": i, "name": deck.name, "color": deck.color,
+                       "stats": deck.getStats(now)}
+                      for i, deck in enumerate(user.decks)]}
+
+def createDeck(user, data):
+    color = data.get("color", 'lightBlue')
+    if not isinstance(color, str):
+        raise HttpError(400, '"color" has to be a string')
+    addDeck(user, getText(data, "name"), color)
+    requestSave(user)
+    return {"deck": len(user.decks) - 1}
+
+def nextCard(user, deck, now):
+    session = user.getSession(deck)
+    card = session.first(now)
+    if card == None:
+        return {"card": None, "nextShowTime": session.getNextShowTime(), "left": len(session)}
+    return {"card": cardInfo(card), "left": len(session)}
+
+def rate(user, deck, data, now):
+    cardId, rating = data.get("card"), data.get("rating")
+    # json true/false come out as bools, which are ints to isinstance (and
+    # true == 1), so they have to be turned away on their own
+    isWhole = lambda value: isinstance(value, int) and not isinstance(value, bool)
+    if not isWhole(cardId) or not isWhole(rating) or rating not in [1, 2, 3, 4]:
+        raise HttpError(400, '"card" has to be a card id and "rating" 1-4')
+    card = deck.getCard(cardId)
+    if card == None:
+        raise HttpError(404, f'no card {cardId} in this deck')
+    # only the card /next would show right now; the session also holds
+    # cards that aren't due yet
+    session = user.getSession(deck)
+    if session.first(now) is not card:
+        raise HttpError(409, f"card {cardId} isn't the one up for study, see next")
+
+    # rateCard works on the app's current card, so point that at this one
+    user.currDeck, user.currCard, user.cardsDue = deck, card, session
+    rateCard(user, rating)
+    following = user.currCard
+    return {"card": cardInfo(card), "next": None if following == None else cardInfo(following)}
+
+def addCard(user, deck, data):
+    card = addNewCard(user, deck, getText(data, "front"), getText(data, "back"))
+    if deck in user.sessions:
+        user.sessions[deck].append(card)
+    requestSave(user)
+    return {"card": cardInfo(card)}
+
+def editCard(user, deck, cardText, data):
+    card = deck.getCard(int(cardText)) if cardText.isdigit() else None
+    if card == None:
+        raise HttpError(404, f'no card {cardText} in this deck')
+    editCardText(user, deck, card, getText(data, "front"), getText(data, "back"))
+    requestSave(user)
+    return {"card": cardInfo(card)}
+
+def route(user, method, path, data):
+    # path: what comes after /users/<user>/decks, split on /
+    now = clock.now() # one clock read for the whole request
+    if path == [] and method == 'GET':
+        return listDecks(user, now)
+    if path == [] and method == 'POST':
+        return createDeck(user, data)
+    if path != []:
+        deck = getDeck(user, path[0])
+        rest = path[1:]
+        if rest == ['next'] and method == 'GET':
+            return nextCard(user, deck, now)
+        if rest == ['rate'] and method == 'POST':
+            return rate(user, deck, data, now)
+        if rest == ['cards'] and method == 'POST':
+            return addCard(user, deck, data)
+        if len(rest) == 2 and rest[0] == 'cards' and method == 'PUT':
+            return editCard(user, deck, rest[1], data)
+    raise HttpError(404, f'no endpoint {method} {"/".join(path)}')
+
+def makeResponse(status, result, keepAlive):
+    body = json.dumps(result).encode('utf-8')
+    head = (f'HTTP/1.1 {status} {httpReasons[status]}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keepAlive else "close"}\r\n\r\n')
+    return head.encode('latin-1') + body
+
+### server ###
+
+class ReviewServer:
+    def __init__(self, dataDir, maxUsers=1000, writeDelay=1.0):
+        self.dataDir = dataDir
+        self.maxUsers = maxUsers
+        self.writeDelay = writeDelay
+        self.users = OrderedDict() # user id -> UserCollection, least recently used first
+        self.loading = {} # user id -> task loading it
+        self.inUse = {} # user id -> requests using it or waiting for it; never dropped
+        self.evicting = {} # user id -> task saving it after it was dropped
+        self.dirtyUsers = {} # used as an ordered set
+        self.server = None
+        self.connections = set() # stream writers of open connections
+        self.writer = None
+        self.stopping = None
+        os.makedirs(dataDir, exist_ok=True)
+
+    async def start(self, host='127.0.0.1', port=8112):
+        self.server = await asyncio.start_server(self.handleConnection, host, port,
+                                                 limit=maxBodyBytes)
+        self.stopping = asyncio.Event()
+        self.writer = asyncio.ensure_future(self.writeBehind())
+        return self.server.sockets[0].getsockname()[1] # the port, if 0 was asked for
+
+    async def stop(self):
+        # stop taking requests, let the ones under way finish, then save
+        # everyone who has changes
+        self.server.close()
+        for writer in list(self.connections): # idle keep-alive ones too
+            writer.close()
+        while self.inUse != {} or self.loading != {}:
+            await asyncio.sleep(0.01)
+        self.stopping.set()
+        await self.writer # not cancelled, so a save is never cut off halfway
+        await asyncio.gather(*self.evicting.values())
+
+    ### users ###
+
+    async def getUser(self, userId):
+        # the user stays in memory until releaseUser, otherwise with more
+        # users than maxUsers it could be dropped again between loading and
+        # the request getting to it
+        self.inUse[userId] = self.inUse.get(userId, 0) + 1
+        user = self.users.get(userId)
+        if user != None:
+            self.users.move_to_end(userId)
+            return user
+        task = self.loading.get(userId)
+        if task == None:
+            task = asyncio.ensure_future(self.loadUser(userId))
+            self.loading[userId] = task
+        try:
+            await asyncio.shield(task) # one request giving up doesn't stop the load
+        except BaseException:
+            self.releaseUser(userId)
+            raise
+        return self.users[userId]
+
+    def releaseUser(self, userId):
+        self.inUse[userId] -= 1
+        if self.inUse[userId] == 0:
+            del self.inUse[userId]
+        self.dropOldUsers()
+
+    async def loadUser(self, userId):
+        try:
+            if userId in self.evicting: # its last changes have to be on disk first
+                await self.evicting[userId]
+            user = UserCollection(userId, self.dataDir, self.markDirty)
+            data = await asyncio.get_running_loop().run_in_executor(None, readUserFile, user.path)
+            # cards are made here on the loop, card ids come from one shared counter
+            if addDecksFromData(user, data):
+                user.requestSave() # write the new ids down
+            self.users[userId] = user
+            self.dropOldUsers()
+        finally:
+            del self.loading[userId]
+
+    def dropOldUsers(self):
+        # least recently used first; users in use stay even if that means
+        # going over maxUsers for a bit
+        extra = len(self.users) - self.maxUsers
+        if extra <= 0:
+            return
+        unused = []
+        for userId in self.users:
+            if userId not in self.inUse:
+                unused.append(userId)
+                if len(unused) == extra:
+                    break
+        for userId in unused:
+            self.evict(userId, self.users.pop(userId))
+
+    def evict(self, userId, user):
+        if user.dirty or user.saving.locked():
+            self.evicting[userId] = asyncio.ensure_future(self.saveEvicted(userId, user))
+
+    async def saveEvicted(self, userId, user):
+        try:
+            await self.saveUser(user)
+        finally:
+            if self.evicting.get(userId) is asyncio.current_task():
+                del self.evicting[userId]
+
+    ### write-behind ###
+
+    def markDirty(self, user):
+        self.dirtyUsers[user] = None
+
+    async def writeBehind(self):
+        while not self.stopping.is_set():
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.writeDelay)
+            except asyncio.TimeoutError:
+                pass
+            await self.saveDirtyUsers()
+        await self.saveDirtyUsers() # changed while the last round was saving
+
+    async def saveDirtyUsers(self):
+        users = list(self.dirtyUsers)
+        self.dirtyUsers = {}
+        await asyncio.gather(*[self.saveUser(user) for user in users])
+
+    async def saveUser(self, user):
+        # one save per user at a time; changes made while it runs mark the
+        # user dirty again and go in the next one
+        async with user.saving:
+            if not user.dirty:
+                return
+            user.dirty = False
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, writeUser, user)
+            except OSError as e:
+                print(f'Could not save {user.userId}: {e}')
+                user.requestSave() # try again next time
+
+    ### http ###
+
+    async def handleConnection(self, reader, writer):
+        # HTTP/1.1 with keep-alive, just enough for JSON requests
+        self.connections.add(writer)
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                requestLine = lines[0].split(' ')
+                headers = {}
+                for line in lines[1:]:
+                    name, colon, value = line.partition(':')
+                    if colon != '':
+                        headers[name.strip().lower()] = value.strip()
+                length = headers.get('content-length', '0')
+                if len(requestLine) != 3 or not length.isdigit():
+                    writer.write(makeResponse(400, {"error": "bad request"}, False))
+                    break
+                if int(length) > maxBodyBytes:
+                    writer.write(makeResponse(413, {"error": "body too big"}, False))
+                    break
+                body = await reader.readexactly(int(length))
+
+                method, target, version = requestLine
+                status, result = await self.handleRequest(method, target, body)
+                keepAlive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(makeResponse(status, result, keepAlive))
+                await writer.drain()
+                if not keepAlive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+    async def handleRequest(self, method, target, body):
+        try:
+            parts = target.split('?')[0].strip('/').split('/')
+            if len(parts) < 3 or parts[0] != 'users' or parts[2] != 'decks':
+                raise HttpError(404, 'everything is under /users/<user>/decks')
+            if userIdPattern.fullmatch(parts[1]) == None:
+                raise HttpError(400, 'user ids are letters, digits, - and _')
+            data = {}
+            if body != b'':
+                try:
+                    data = json.loads(body)
+                except ValueError:
+                    raise HttpError(400, 'body is not json')
+                if not isinstance(data, dict):
+                    raise HttpError(400, 'body has to be a json object')
+            user = await self.getUser(parts[1])
+            try:
+                return 200, route(user, method, parts[3:], data)
+            finally:
+                self.releaseUser(parts[1])
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e: # one broken request shouldn't take the server down
+            print(f'{method} {target} failed: {e!r}')
+            return 500, {"error": "internal error"}
+
+async def serve(options):
+    server = ReviewServer(options.data, options.max_users, options.write_delay)
+    port = await server.start(options.host, options.port)
+    print(f'serving on http://{options.host}:{port} (data in {options.data})', flush=True)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in [signal.SIGINT, signal.SIGTERM]:
+        loop.add_signal_handler(signum, stopping.set)
+    await stopping.wait()
+    await server.stop()
+    print('saved everything, bye')
+
+def main(args):
+    parser = argparse.ArgumentParser(description='serve flashcard collections over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8112)
+    parser.add_argument('--data', default=os.path.join(settings.dataDir, 'users'),
+                        help='folder for the users\' files')
+    parser.add_argument('--max-users', type=int, default=1000, help='collections kept in memory')
+    parser.add_argument('--write-delay', type=float, default=1.0, help='seconds between saves')
+    options = parser.parse_args(args)
+    settings.storageMode = 'json' # recordChange has nothing to do; users are whole snapshots
+    asyncio.run(serve(options))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
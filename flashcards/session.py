@@ -0,0 +1,130 @@
+# one study session on a deck: which card to show next, and when.
+#
+# cards sit in one of two heaps:
+#   waiting: (showTime, seq, card) for cards whose time hasn't come yet
+#            (learning steps still running, reviews not due yet)
+#   ready:   (group, showTime, seq, card) for cards that can be shown now;
+#            learning cards whose step ran out come first, then due
+#            reviews (most overdue first), then new cards in deck order
+# a card can be pushed again (e.g. after rating it), entries with an old seq
+# are stale and skipped when they come up, the same trick as Deck.dueHeap
+import heapq
+from . import clock
+
+learningGroup, reviewGroup, newGroup = 0, 1, 2
+
+# with nothing ready, show what comes up within this many seconds early
+# instead of making you wait for a 1-10 min learning step (Anki does the same)
+learnAheadSecs = 20 * 60
+
+class StudySession:
+    def __init__(self, cards=(), upcoming=(), now=None, getUpcoming=None):
+        # cards: what to study, in order; upcoming: reviews that aren't due
+        # yet but should join the session when they are. getUpcoming(after,
+        # until, now) gives the deck's reviews due in between and when the
+        # next one after that is due (Deck.getUpcomingCards); with it the session
+        # only takes reviews as they come within learnAheadSecs, so building
+        # it doesn't depend on how many reviews the deck has
+        if now == None:
+            now = clock.now()
+        self.ready = []
+        self.waiting = []
+        self.seqs = {} # card id -> seq of the card's live entry
+        self.nextSeq = 0
+        self.getUpcoming = getUpcoming
+        self.fetchedTo = now # reviews due by then are in the session
+        self.laterTime = None if getUpcoming == None else now # next review not fetched yet
+        for card in cards:
+            self.push(card, now)
+        for card in upcoming:
+            self.nextSeq += 1
+            self.seqs[card.id] = self.nextSeq
+            self.waiting.append((card.getDueTime(), self.nextSeq, card))
+        heapq.heapify(self.waiting)
+        self.fetchUpcoming(now)
+
+    def __len__(self): # cards still in the session, ready or not
+        return len(self.seqs)
+
+    def __contains__(self, card):
+        return card.id in self.seqs
+
+    def push(self, card, now):
+        self.nextSeq += 1
+        self.seqs[card.id] = self.nextSeq
+        showTime = card.getDueTime()
+        if showTime == None: # new
+            heapq.heappush(self.ready, (newGroup, 0, self.nextSeq, card))
+        elif showTime <= now:
+            group = learningGroup if card.isLearning else reviewGroup
+            heapq.heappush(self.ready, (group, showTime, self.nextSeq, card))
+        else:
+            heapq.heappush(self.waiting, (showTime, self.nextSeq, card))
+
+        # stale entries pile up as cards get rated; clean up now and then
+        if len(self.ready) + len(self.waiting) > 2*len(self.seqs) + 64:
+            self.ready = [entry for entry in self.ready if self.isLive(entry)]
+            self.waiting = [entry for entry in self.waiting if self.isLive(entry)]
+            heapq.heapify(self.ready)
+            heapq.heapify(self.waiting)
+
+    def isLive(self, entry):
+        return self.seqs.get(entry[-1].id) == entry[-2]
+
+    def append(self, card, now=None):
+        # (re)schedule card by its current state, e.g. after rating it or for
+        # a card just added to the deck
+        if now == None:
+            now = clock.now()
+        self.push(card, now)
+
+    def remove(self, card): # nothing happens if it isn't in the session
+        self.seqs.pop(card.id, None)
+
+    def fetchUpcoming(self, now):
+        # reviews of the deck coming within the learn-ahead window join.
+        # takes two windows' worth at a time, so it asks the deck again at
+        # most once per learnAheadSecs instead of on every card
+        if self.laterTime == None or self.laterTime > now + learnAheadSecs:
+            return
+        until = now + 2*learnAheadSecs
+        upcoming, self.laterTime = self.getUpcoming(self.fetchedTo, until, now)
+        self.fetchedTo = until
+        for card in upcoming:
+            if card.id not in self.seqs: # rated in this session already
+                self.push(card, now)
+
+    def advance(self, now):
+        # move cards whose time has come from waiting to ready
+        self.fetchUpcoming(now)
+        while self.waiting != [] and self.waiting[0][0] <= now:
+            showTime, seq, card = heapq.heappop(self.waiting)
+            if self.seqs.get(card.id) == seq:
+                group = learningGroup if card.isLearning else reviewGroup
+                heapq.heappush(self.ready, (group, showTime, seq, card))
+
+    def dropStale(self, heap):
+        while heap != [] and not self.isLive(heap[0]):
+            heapq.heappop(heap)
+
+    def first(self, now=None): # card to show now, None if nothing is up yet
+        if now == None:
+            now = clock.now()
+        self.advance(now)
+        self.dropStale(self.ready)
+        if self.ready != []:
+            return self.ready[0][-1]
+
+        # learn ahead
+        self.dropStale(self.waiting)
+        if self.waiting != [] and self.waiting[0][0] - now <= learnAheadSecs:
+            return self.waiting[0][-1]
+        return None
+
+    def getNextShowTime(self): # when the next card is up, None if none are
+        self.dropStale(self.waiting)
+        if self.waiting == []:
+            return self.laterTime
+        if self.laterTime == None:
+            return self.waiting[0][0]
+        return min(self.waiting[0][0], self.laterTime)
@@ -0,0 +1,78 @@
+# settings for the whole flashcards package; change them before loadData,
+# e.g. settings.storageMode = 'journal'
+import os
+
+# folder the data files live in (the project folder by default)
+dataDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+dataFile = "flashcard_data.json"
+reviewLogFile = "flashcard_reviews.bin" # every rating ever made, see ReviewLog
+databaseFile = "flashcard_data.db" # storageMode = 'sqlite'
+metaFile = "flashcard_meta.json" # storageMode = 'split'
+textFile = "flashcard_text.bin"
+textIndexFile = "flashcard_text.idx"
+binaryFile = "flashcard_data.bin" # storageMode = 'binary'
+searchIndexFile = "flashcard_search.idx" # saved search index, see search.py
+
+# how changes get saved:
+#   'json'    -> rewrite the whole data file on every save
+#   'journal' -> append each change to a small journal file, and fold the
+#                journal back into the data file in the background once it
+#                gets bigger than journalMaxBytes
+#   'sqlite'  -> keep everything in flashcard_data.db and update one row per
+#                change (an existing flashcard_data.json is migrated once)
+#   'split'   -> scheduling info in flashcard_meta.json, card text in
+#                flashcard_text.bin which is memory-mapped and only read when
+#                a card is actually shown (see TextStore)
+#   'binary'  -> like 'json', but the whole collection goes in
+#                flashcard_data.bin: fixed-width records for the scheduling
+#                fields and one block of text, read with mmap (see binstore.py;
+#                an existing flashcard_data.json is read once and converted)
+storageMode = 'json'
+journalMaxBytes = 1024 * 1024
+# 'split' mode: loading compacts flashcard_text.bin once it holds more old
+# (edited or deleted) card text than text cards still use, and at least this
+# many old entries
+textCompactMin = 10000
+
+# saves are batched: write once things have been quiet for saveDelay secs,
+# but never hold a requested save back longer than saveMaxDelay secs
+saveDelay = 0.5
+saveMaxDelay = 3
+
+# how decks keep their cards in memory:
+#   'objects' -> one Flashcard object per card (Deck)
+#   'numpy'   -> scheduling state in numpy arrays (CardTable), for very big
+#                collections; needs numpy installed
+deckBackend = 'objects'
+
+# double check every Deck.getStats against a full recount of the cards
+debugMode = False
+
+def getDataPath():
+    return os.path.join(dataDir, dataFile)
+
+def getSiblingPath(fileName): # file next to the data file
+    return os.path.join(os.path.dirname(getDataPath()), fileName)
+
+def getDatabasePath():
+    return os.path.join(os.path.dirname(getDataPath()), databaseFile)
+
+def getReviewLogPath():
+    return os.path.join(os.path.dirname(getDataPath()), reviewLogFile)
+
+def getJournalPath(segment):
+    base = os.path.splitext(getDataPath())[0]
+    return f'{base}.{segment}.journal'
+
+def listJournalSegments():
+    # journal files look like flashcard_data.<segment>.journal
+    base = os.path.splitext(getDataPath())[0]
+    folder, prefix = os.path.split(base)
+    segments = []
+    for fileName in os.listdir(folder):
+        if fileName.startswith(prefix + '.') and fileName.endswith('.journal'):
+            segment = fileName[len(prefix)+1:-len('.journal')]
+            if segment.isdigit():
+                segments.append(int(segment))
+    return sorted(segments)
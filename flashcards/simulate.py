@@ -0,0 +1,221 @@
+# Monte Carlo study simulator for trying other SM-2 constants.
+#
+#   python3 -m flashcards.simulate [--learners 200] [--cards 1000] [--days 180]
+#                                  [--workers N] [--out results.json]
+#
+# Many virtual learners study a deck once a day for months. Each parameter
+# set in sweepGrid (merged over cards.schedulerParams) is scheduled with the
+# vectorized updateCard from replay.py; whether a card is remembered comes
+# from recallModel, not from the scheduler. Every card of every learner is
+# one row of a few numpy arrays, so a day of reviews is a handful of array
+# operations, and batches of learners run on a ProcessPoolExecutor.
+#
+# reported per parameter set: reviews per day (average and busiest day),
+# how often reviews are passed, and retention: the chance of recalling a
+# studied card on the day after the last one, averaged over all of them
+import argparse, itertools, json, math, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from .cards import schedulerParams
+from .replay import updateCards
+
+minutesPerDay = 24 * 60
+
+# how the virtual learners remember. stability is the number of days after
+# which a card is recalled 90% of the time; recall decays exponentially
+recallModel = {
+    "initialStability": 1.5,  # days, once a card leaves learning
+    "stabilityGrowth": 2.5,   # stability gain for a pass at 90% recall
+    "maxGrowthBoost": 3.0,    # passes at lower recall grow it up to this much more
+    "lapseFactor": 0.3,       # stability kept after forgetting
+    "minStability": 0.5,
+    "learningRecall": 0.85,   # chance to pass a 1m/10m learning step
+    "hardShare": 0.15,        # of passed reviews, rated hard
+    "easyShare": 0.10,        # of passed reviews, rated easy
+    "learnerSpread": 0.25,    # learners' memory differs (lognormal sigma)
+    "cardSpread": 0.35,       # so does how hard each card is
+}
+
+newCardsPerDay = 20
+maxRoundsPerDay = 12 # learning steps repeated in one sitting, then it's tomorrow
+
+# parameter sets tried by default: every combination of these
+sweepGrid = {
+    "startEase": [2.1, 2.5, 2.9],
+    "hardMultiplier": [1.0, 1.2],
+    "easyBonus": [1.15, 1.3, 1.5],
+    "againPenalty": [0.2, 0.3],
+}
+
+def makeParamSets(grid=None):
+    if grid == None:
+        grid = sweepGrid
+    names = list(grid)
+    paramSets = []
+    for values in itertools.product(*[grid[name] for name in names]):
+        params = dict(schedulerParams)
+        params.update(zip(names, values))
+        paramSets.append(params)
+    return paramSets
+
+### one batch of learners ###
+
+def simulateBatch(params, numLearners, numCards, numDays, seed, model=None):
+    # returns totals (not averages) so batches can just be added up
+    if model == None:
+        model = recallModel
+    rng = np.random.default_rng(seed)
+    n = numLearners * numCards
+    cardOrder = np.tile(np.arange(numCards), numLearners) # when each card gets introduced
+
+    isLearning = np.ones(n, dtype=bool)
+    learningStep = np.zeros(n, dtype=np.int64)
+    easeFactor = np.full(n, float(params["startEase"]))
+    interval = np.zeros(n) # minutes, like Flashcard.interval
+    lastReview = np.full(n, np.nan) # minutes since the start, nan = new
+    graduated = np.zeros(n, dtype=bool) # left learning at least once
+
+    # how fast memories grow: per learner times per card
+    learnerSkill = np.repeat(rng.lognormal(0, model["learnerSpread"], numLearners), numCards)
+    cardEase = rng.lognormal(0, model["cardSpread"], n)
+    growth = 1 + (model["stabilityGrowth"] - 1) * learnerSkill / cardEase
+    stability = model["initialStability"] * learnerSkill / cardEase
+
+    dailyReviews = np.zeros(numDays)
+    reviewRatings = 0
+    reviewPasses = 0
+    for day in range(numDays):
+        now = day * minutesPerDay
+        introduced = cardOrder < (day + 1) * newCardsPerDay
+        with np.errstate(invalid='ignore'): # nan lastReview = new
+            due = introduced & (np.isnan(lastReview) | (lastReview + interval <= now))
+        rows = np.flatnonzero(due)
+
+        for sitting in range(maxRoundsPerDay):
+            if len(rows) == 0:
+                break
+            dailyReviews[day] += len(rows)
+            learning = isLearning[rows]
+
+            # chance to remember: fixed during learning steps, otherwise
+            # decays with the days since the last review
+            elapsed = (now - lastReview[rows]) / minutesPerDay
+            recall = np.where(learning, model["learningRecall"],
+                              np.exp(math.log(0.9) * np.nan_to_num(elapsed) / stability[rows]))
+            passed = rng.random(len(rows)) < recall
+            share = rng.random(len(rows))
+            rating = np.where(~passed, 1,
+                              np.where(share < model["hardShare"], 2,
+                                       np.where(share > 1 - model["easyShare"], 4, 3)))
+
+            # memory: passing at lower recall helps more (spacing effect),
+            # forgetting a review card knocks stability back
+            review = ~learning
+            boost = np.minimum((1 - recall) / 0.1, model["maxGrowthBoost"])
+            stable = stability[rows]
+            stable = np.where(review & passed, stable * (1 + (growth[rows] - 1) * boost), stable)
+            stable = np.where(review & ~passed,
+                              np.maximum(model["minStability"], stable * model["lapseFactor"]), stable)
+            stability[rows] = stable
+            reviewRatings += int(np.count_nonzero(review))
+            reviewPasses += int(np.count_nonzero(review & passed))
+
+            (isLearning[rows], learningStep[rows], easeFactor[rows],
+             interval[rows]) = updateCards(isLearning[rows], learningStep[rows],
+                                           easeFactor[rows], interval[rows], rating, params)
+            lastReview[rows] = now
+            graduated[rows] |= ~isLearning[rows]
+
+            # 1m/10m steps come back in the same sitting
+            rows = rows[interval[rows] < minutesPerDay]
+
+    # retention the day after the last session, over every card studied
+    studied = graduated
+    elapsed = (numDays * minutesPerDay - lastReview[studied]) / minutesPerDay
+    recallNow = np.exp(math.log(0.9) * elapsed / stability[studied])
+    return {"learners": numLearners, "dailyReviews": dailyReviews,
+            "reviewRatings": reviewRatings, "reviewPasses": reviewPasses,
+            "retentionSum": float(recallNow.sum()), "studiedCards": int(np.count_nonzero(studied))}
+
+def addTotals(totals, batch):
+    if totals == None:
+        return dict(batch)
+    for key in ["learners", "dailyReviews", "reviewRatings", "reviewPasses",
+                "retentionSum", "studiedCards"]:
+        totals[key] = totals[key] + batch[key]
+    return totals
+
+def summarize(params, totals):
+    perLearner = totals["dailyReviews"] / totals["learners"]
+    retention = totals["retentionSum"] / max(totals["studiedCards"], 1)
+    reviewsPerDay = float(perLearner.mean())
+    return {"params": params,
+            "reviewsPerDay": reviewsPerDay,
+            "busiestDay": float(perLearner.max()),
+            "passRate": totals["reviewPasses"] / max(totals["reviewRatings"], 1),
+            "retention": retention,
+            # cards you'd still know tomorrow per review a day, higher is better
+            "retainedPerReview": retention * totals["studiedCards"] / totals["learners"] / max(reviewsPerDay, 1e-9)}
+
+### running a sweep ###
+
+def runSweep(paramSets, numLearners=200, numCards=1000, numDays=180, workers=None,
+             batchSize=50, seed=112, progress=None):
+    # every parameter set sees the same learners: batch b always gets seed+b
+    batches = [(b, min(batchSize, numLearners - start))
+               for b, start in enumerate(range(0, numLearners, batchSize))]
+    totals = [None] * len(paramSets)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for i, params in enumerate(paramSets):
+            for b, learners in batches:
+                future = pool.submit(simulateBatch, params, learners, numCards, numDays, seed + b)
+                futures[future] = i
+        done = 0
+        for future in as_completed(futures):
+            i = futures[future]
+            totals[i] = addTotals(totals[i], future.result())
+            done += 1
+            if progress != None:
+                progress(done, len(futures))
+    return [summarize(params, total) for params, total in zip(paramSets, totals)]
+
+def printResults(results, grid=None):
+    if grid == None:
+        grid = sweepGrid
+    names = list(grid)
+    header = ''.join(f'{name:>15}' for name in names)
+    print(f"{header} {'reviews/day':>12} {'busiest':>8} {'pass':>6} {'retention':>10} {'kept/review':>12}")
+    for result in sorted(results, key=lambda result: -result["retainedPerReview"]):
+        values = ''.join(f'{result["params"][name]:>15g}' for name in names)
+        print(f'{values} {result["reviewsPerDay"]:>12.1f} {result["busiestDay"]:>8.0f} '
+              f'{result["passRate"]:>6.1%} {result["retention"]:>10.1%} {result["retainedPerReview"]:>12.1f}')
+
+def main(args):
+    parser = argparse.ArgumentParser(description='simulate learners studying with different SM-2 constants')
+    parser.add_argument('--learners', type=int, default=200)
+    parser.add_argument('--cards', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: one per CPU)')
+    parser.add_argument('--out', help='also write the results to this json file')
+    options = parser.parse_args(args)
+
+    paramSets = makeParamSets()
+    print(f'{len(paramSets)} parameter sets x {options.learners} learners x '
+          f'{options.cards} cards x {options.days} days')
+    start = time.perf_counter()
+    def printProgress(done, total):
+        print(f'\r{done}/{total} batches', end='', flush=True)
+    results = runSweep(paramSets, options.learners, options.cards, options.days,
+                       options.workers, progress=printProgress)
+    print(f'\rdone in {time.perf_counter() - start:.0f}s{" " * 20}\n')
+    printResults(results)
+
+    if options.out != None:
+        with open(options.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nwrote {options.out}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
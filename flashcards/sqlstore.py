@@ -0,0 +1,239 @@
+# settings.storageMode = 'sqlite': decks and cards in flashcard_data.db
+import os, sqlite3, threading
+from . import settings, cards, profiling, clock
+from .cards import useCardId
+from .reviewlog import ReviewLog
+from .storage import Journal, cardToDict, cardFromDict, makeDeck, readAllData
+
+databaseSchema = '''
+CREATE TABLE IF NOT EXISTS decks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    color TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY,
+    deckId INTEGER NOT NULL REFERENCES decks(id),
+    front TEXT NOT NULL,
+    back TEXT NOT NULL,
+    isLearning INTEGER NOT NULL,
+    learningStep INTEGER NOT NULL,
+    easeFactor REAL NOT NULL,
+    interval REAL NOT NULL,
+    lastReviewTime REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+CREATE INDEX IF NOT EXISTS cardsByDeck ON cards (deckId, id);
+CREATE INDEX IF NOT EXISTS cardsByDue ON cards (deckId, isLearning, (lastReviewTime + interval*60));
+'''
+
+cardColumns = ('id, front, back, isLearning, learningStep, easeFactor, '
+               'interval, lastReviewTime')
+
+def cardRow(deckId, cardData):
+    return (cardData["id"], deckId, cardData["front"], cardData["back"],
+            cardData["isLearning"], cardData["learningStep"],
+            cardData["easeFactor"], cardData["interval"],
+            cardData["lastReviewTime"])
+
+def openDatabase(path):
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(databaseSchema)
+    return connection
+
+def migrateToSqlite(dbPath=None):
+    # one-shot copy of flashcard_data.json (plus journal) into a new database
+    if dbPath == None:
+        dbPath = settings.getDatabasePath()
+    data = readAllData()
+    connection = openDatabase(dbPath)
+    with connection:
+        lastId = data.get("cards.lastCardId", 0)
+        for deckData in data.get("decks", []):
+            deckId = connection.execute('INSERT INTO decks (name, color) VALUES (?, ?)',
+                                        (deckData["name"], deckData.get("color", "lightBlue"))).lastrowid
+            rows = []
+            for cardData in deckData.get("cards", []):
+                # fill in anything older files don't have, ids included
+                cardData = cardToDict(cardFromDict(cardData))
+                lastId = max(lastId, cardData["id"])
+                rows.append(cardRow(deckId, cardData))
+            connection.executemany('INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        connection.execute("INSERT OR REPLACE INTO meta VALUES ('cards.lastCardId', ?)", (lastId,))
+    connection.close()
+
+def loadFromSqlite(app):
+    dbPath = settings.getDatabasePath()
+    if not os.path.exists(dbPath) and os.path.exists(settings.getDataPath()):
+        migrateToSqlite(dbPath)
+    
+    app.journal = Journal() # unused, saveData/loadData never touch the json file here
+    app.reviewLog = ReviewLog(settings.getReviewLogPath())
+    app.store = SqliteStore(openDatabase(dbPath))
+    app.store.load(app)
+
+class SqliteStore:
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.Lock() # connection is shared with the SaveWorker
+        self.pending = [] # (sql, params) not executed yet
+        self.deckIds = {} # deck -> row id
+        self.cardsById = {} # card id -> card, to turn query results into cards
+        self.lastDeckId = 0
+    
+    def load(self, app):
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'cards.lastCardId'").fetchone()
+            useCardId(row[0] if row != None else 0)
+            
+            decks = {}
+            for deckId, name, color in self.connection.execute('SELECT id, name, color FROM decks ORDER BY id'):
+                deck = makeDeck(name, color)
+                decks[deckId] = deck
+                self.deckIds[deck] = deckId
+                self.lastDeckId = max(self.lastDeckId, deckId)
+                app.decks.append(deck)
+            
+            query = f'SELECT deckId, {cardColumns} FROM cards ORDER BY deckId, id'
+            for (deckId, cardId, front, back, isLearning, learningStep,
+                 easeFactor, interval, lastReviewTime) in self.connection.execute(query):
+                card = decks[deckId].addCard(cardFromDict({
+                    "id": cardId, "front": front, "back": back,
+                    "isLearning": isLearning, "learningStep": learningStep,
+                    "easeFactor": easeFactor, "interval": interval,
+                    "lastReviewTime": lastReviewTime}))
+                self.cardsById[card.id] = card
+    
+    def record(self, op, deck=None, card=None, **fields):
+        with self.lock:
+            self.recordStatements(op, deck, card, **fields)
+    
+    def recordStatements(self, op, deck=None, card=None, **fields):
+        # same changes the journal records, as single row statements
+        if op == 'addDeck':
+            self.lastDeckId += 1
+            deckId = self.lastDeckId
+            self.deckIds[deck] = deckId
+            self.pending.append(('INSERT INTO decks (id, name, color) VALUES (?, ?, ?)',
+                                 (deckId, fields["name"], fields["color"])))
+            for cardData in fields.get("cards", []):
+                self.addCardRow(deckId, cardData)
+            for deckCard in deck.cards:
+                self.cardsById[deckCard.id] = deckCard
+        elif op == 'delDeck':
+            deckId = self.deckIds.pop(deck)
+            self.pending.append(('DELETE FROM cards WHERE deckId = ?', (deckId,)))
+            self.pending.append(('DELETE FROM decks WHERE id = ?', (deckId,)))
+            for deckCard in deck.cards:
+                self.cardsById.pop(deckCard.id, None)
+        elif op == 'addCard':
+            self.addCardRow(self.deckIds[deck], fields["cardData"])
+            self.cardsById[card.id] = card
+        elif op == 'addCards': # a batch from bulk.importCards
+            deckId = self.deckIds[deck]
+            for cardData in fields["cards"]:
+                self.pending.append(('INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                     cardRow(deckId, cardData)))
+                self.cardsById[cardData["id"]] = deck.getCard(cardData["id"])
+            self.pending.append(("INSERT OR REPLACE INTO meta VALUES ('cards.lastCardId', ?)",
+                                 (cards.lastCardId,)))
+        elif op == 'editCard':
+            self.pending.append(('UPDATE cards SET front = ?, back = ? WHERE id = ?',
+                                 (fields["front"], fields["back"], card.id)))
+        elif op == 'delCard':
+            self.pending.append(('DELETE FROM cards WHERE id = ?', (card.id,)))
+            self.cardsById.pop(card.id, None)
+        elif op == 'rateCard':
+            self.pending.append(('UPDATE cards SET isLearning = ?, learningStep = ?, easeFactor = ?, '
+                                 'interval = ?, lastReviewTime = ? WHERE id = ?',
+                                 (card.isLearning, card.learningStep, card.easeFactor,
+                                  card.interval, card.lastReviewTime, card.id)))
+    
+    def addCardRow(self, deckId, cardData):
+        self.pending.append(('INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             cardRow(deckId, cardData)))
+        self.pending.append(("INSERT OR REPLACE INTO meta VALUES ('cards.lastCardId', ?)",
+                             (cards.lastCardId,)))
+    
+    def flush(self):
+        with self.lock:
+            statements = self.pending
+            self.pending = []
+            if statements == []:
+                return
+            with self.connection: # one transaction
+                # runs of the same statement (e.g. a bulk import's inserts)
+                # go through executemany
+                start = 0
+                while start < len(statements):
+                    end = start + 1
+                    while end < len(statements) and statements[end][0] == statements[start][0]:
+                        end += 1
+                    self.connection.executemany(statements[start][0],
+                                                [params for sql, params in statements[start:end]])
+                    start = end
+    
+    def getStudyQueue(self, deck, now):
+        # due reviews (by due time), learning cards, then new cards, all
+        # answered from the cardsByDue/cardsByDeck indexes
+        self.flush()
+        deckId = self.deckIds[deck]
+        # the index has due times before skips are added (clock.getOffsetAt),
+        # so after a skip this gets every card that could be due and each
+        # one's own getDueTime decides
+        offsets = clock.getAllOffsets()
+        with self.lock:
+            due = self.connection.execute(
+                'SELECT id FROM cards WHERE deckId = ? AND isLearning = 0 '
+                'AND lastReviewTime + interval*60 <= ? '
+                'ORDER BY lastReviewTime + interval*60', (deckId, now - min(offsets))).fetchall()
+            learning = self.connection.execute(
+                'SELECT id FROM cards WHERE deckId = ? AND isLearning = 1 '
+                'AND lastReviewTime IS NOT NULL ORDER BY id', (deckId,)).fetchall()
+            new = self.connection.execute(
+                'SELECT id FROM cards WHERE deckId = ? AND lastReviewTime IS NULL '
+                'ORDER BY id', (deckId,)).fetchall()
+        if profiling.enabled: # rows the indexes handed back
+            profiling.countScan('SqliteStore.getStudyQueue', len(due) + len(learning) + len(new))
+        dueCards = [self.cardsById[row[0]] for row in due]
+        if len(offsets) > 1:
+            dueCards = [card for card in dueCards if card.getDueTime() <= now]
+            dueCards.sort(key=lambda card: card.getDueTime())
+        return dueCards + [self.cardsById[row[0]] for row in learning + new]
+    
+    def getUpcomingCards(self, deck, after, until, now=None):
+        # see Deck.getUpcomingCards (now isn't needed); walks the cardsByDue
+        # index from `after` and stops one card past until. the index has due times before
+        # skips, so with skips it starts that much earlier and goes on until
+        # no card further along could be due before the earliest one found
+        self.flush()
+        deckId = self.deckIds[deck]
+        offsets = clock.getAllOffsets()
+        upcoming = []
+        laterTime = None
+        looked = 0
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT id, lastReviewTime + interval*60 FROM cards WHERE deckId = ? '
+                'AND isLearning = 0 AND lastReviewTime + interval*60 > ? '
+                'ORDER BY lastReviewTime + interval*60', (deckId, after - max(offsets)))
+            for cardId, dueTime in rows:
+                if laterTime != None and dueTime + min(offsets) >= laterTime:
+                    break
+                looked += 1
+                card = self.cardsById[cardId]
+                dueTime = card.getDueTime()
+                if after < dueTime <= until:
+                    upcoming.append(card)
+                elif dueTime > until and (laterTime == None or dueTime < laterTime):
+                    laterTime = dueTime
+        if profiling.enabled:
+            profiling.countScan('SqliteStore.getUpcomingCards', looked)
+        if len(offsets) > 1:
+            upcoming.sort(key=lambda card: card.getDueTime())
+        return upcoming, laterTime
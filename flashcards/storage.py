@@ -0,0 +1,472 @@
+# loading and saving collections: the json file, the journal and 'split'
+# mode live here; the sqlite backend is in sqlstore.py
+import json, os, sys, threading
+from contextlib import nullcontext
+from . import settings, cards, textstore, profiling
+from .cards import Flashcard, Deck, useCardId
+from .reviewlog import ReviewLog
+from .session import StudySession
+from .jsonstream import iterSnapshot
+
+class Collection:
+    # holds what loadData/saveData and the helpers in collection.py and
+    # study.py use, for scripts and tools that run without the app
+    def __init__(self):
+        self.decks = []
+        self.currDeck = None
+        self.currCard = None
+        self.cardsDue = StudySession()
+        self.showAnswer = False
+        self.dataLock = threading.RLock() # see getDataLock
+
+def getDataLock(app):
+    # held while decks and cards change (the helpers in collection.py and
+    # study.py) and while a save copies them, since saves can run on another
+    # thread (SaveWorker, the server's writer). reentrant, so a helper can
+    # save right away while holding it
+    lock = getattr(app, 'dataLock', None)
+    return noLock if lock == None else lock
+
+noLock = nullcontext()
+
+def openCollection():
+    collection = Collection()
+    loadData(collection)
+    return collection
+
+def cardToDict(card):
+    return {
+        "id": card.id,
+        "front": card.front,
+        "back": card.back,
+        "isLearning": card.isLearning,
+        "learningStep": card.learningStep,
+        "easeFactor": card.easeFactor,
+        "interval": card.interval,
+        "lastReviewTime": card.lastReviewTime
+    }
+
+def makeDeck(name, color='lightBlue'):
+    if settings.deckBackend == 'numpy':
+        from .cardtable import CardTable # only import numpy when asked to
+        return CardTable(name, color)
+    return Deck(name, color)
+
+# ease factors and intervals repeat a lot (2.5, 1440.0, ...), so cards
+# loaded from disk share one float object per value instead of one each
+sharedNumbers = {}
+
+def shareNumber(value):
+    return sharedNumbers.setdefault(value, value)
+
+def cardFromDict(cardData):
+    if "text" in cardData: # 'split' files: text stays in the TextStore
+        card = Flashcard(None, None, cardData.get("id"))
+        card.textIndex = cardData["text"]
+    else:
+        # backs repeat a lot too ("Yes", "def"), intern them
+        card = Flashcard(cardData["front"], sys.intern(cardData["back"]),
+                         cardData.get("id"))
+    card.isLearning = bool(cardData.get("isLearning", True))
+    card.learningStep = int(cardData.get("learningStep", 0))
+    card.easeFactor = shareNumber(float(cardData.get("easeFactor", 2.5)))
+    card.interval = shareNumber(float(cardData.get("interval", 0)))
+    card.lastReviewTime = cardData.get("lastReviewTime", None)
+    return card
+
+def readSnapshot():
+    dataPath = settings.getDataPath()
+    if not os.path.exists(dataPath):
+        return {"decks": []}
+    
+    with open(dataPath, 'r') as f:
+        return json.load(f)
+
+def writeSnapshot(data, dataPath=None, indent=None):
+    # write next to the real file and swap it in, so a crash mid-write
+    # leaves the old data file untouched instead of half truncated.
+    # json.dumps without indent uses the C encoder; json.dump and indent
+    # both fall back to the pure Python one, which is ~4x slower
+    if dataPath == None:
+        dataPath = settings.getDataPath()
+    tempPath = dataPath + '.tmp'
+    with open(tempPath, 'w') as f:
+        f.write(json.dumps(data, indent=indent))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tempPath, dataPath)
+
+@profiling.timed('saveData')
+def saveData(app):
+    app.reviewLog.flush()
+    if settings.storageMode == 'journal':
+        app.journal.flush()
+    elif settings.storageMode == 'sqlite':
+        app.store.flush()
+    elif settings.storageMode == 'split':
+        writeSplitData(app)
+    elif settings.storageMode == 'binary':
+        from .binstore import writeBinaryData
+        writeBinaryData(app)
+    else:
+        writeFullSnapshot(app)
+
+def writeFullSnapshot(app, dataPath=None):
+    # this can run on the SaveWorker thread while the app keeps changing
+    # decks: the copy is made under the data lock, the writing without it.
+    # decks go last so streamDecks has the other keys before the first card
+    with getDataLock(app):
+        data = {"journalSegment": app.journal.segment,
+                "cards.lastCardId": cards.lastCardId, "decks": []}
+        for deck in app.decks:
+            deckData = {"name": deck.name, "color": deck.color, "cards": []}
+            for card in deck.listCards():
+                deckData["cards"].append(cardToDict(card))
+            data["decks"].append(deckData)
+    
+    writeSnapshot(data, dataPath)
+
+@profiling.timed('loadData')
+def loadData(app):
+    if settings.storageMode == 'sqlite':
+        from .sqlstore import loadFromSqlite # sqlite3 only when it's used
+        loadFromSqlite(app)
+        return
+    if settings.storageMode == 'split':
+        finishTextCompaction()
+        textstore.openTextStore()
+        if os.path.exists(settings.getSiblingPath(settings.metaFile)):
+            loadSplitData(app)
+            return
+        # otherwise start from flashcard_data.json; the first save splits it
+    if settings.storageMode == 'binary':
+        if os.path.exists(settings.getSiblingPath(settings.binaryFile)):
+            from .binstore import loadBinaryData
+            loadBinaryData(app)
+            return
+        # no binary file yet: the first save converts flashcard_data.json
+    
+    app.reviewLog = ReviewLog(settings.getReviewLogPath())
+    dataPath = settings.getDataPath()
+    if settings.listJournalSegments() == [] and os.path.exists(dataPath):
+        # nothing to replay: build decks straight from the file
+        app.journal = Journal()
+        missingIds = streamDecks(app, dataPath)
+    else:
+        missingIds = loadWithJournal(app)
+    
+    # file from before cards had ids: write the new ids down right away so
+    # they stay the same next time (journal mode never rewrites the file)
+    if missingIds:
+        writeFullSnapshot(app)
+
+def loadWithJournal(app):
+    # replaying works on the decoded dicts, so this reads the whole file
+    data = readSnapshot()
+    
+    # replay any changes that haven't been folded into the snapshot yet
+    firstSegment = data.get("journalSegment", 0)
+    nextSegment = firstSegment
+    cardIndex = None
+    for segment in settings.listJournalSegments():
+        if segment < firstSegment: # already in the snapshot (leftover from a compaction)
+            os.remove(settings.getJournalPath(segment))
+        else:
+            if cardIndex == None:
+                cardIndex = indexCards(data)
+            replayJournal(data, segment, cardIndex)
+            nextSegment = segment + 1
+    app.journal = Journal(nextSegment)
+    return addDecksFromData(app, data)
+
+def addDecksFromData(app, data):
+    # decoded snapshot -> decks in app.decks; returns whether any card had no id
+    useCardId(data.get("cards.lastCardId", 0))
+    missingIds = False
+    for deckData in data.get("decks", []):
+        deck = makeDeck(deckData["name"], deckData.get("color", "lightBlue"))
+        for cardData in deckData.get("cards", []):
+            missingIds = missingIds or "id" not in cardData
+            deck.addCard(cardFromDict(cardData))
+        app.decks.append(deck)
+    return missingIds
+
+def streamDecks(app, path):
+    # reads the file a chunk at a time (see jsonstream.py) and adds each
+    # deck to app.decks as soon as its last card is in, so the menu can
+    # show it while later decks are still loading. only one card's dict is
+    # around at a time. returns whether any card had no id
+    missingIds = False
+    deck = None
+    with open(path, 'r') as f:
+        for event in iterSnapshot(f):
+            kind = event[0]
+            if kind == 'card':
+                cardData = event[1]
+                missingIds = missingIds or "id" not in cardData
+                deck.addCard(cardFromDict(cardData))
+            elif kind == 'deckStart':
+                deck = makeDeck(event[1].get("name", ""), event[1].get("color", "lightBlue"))
+            elif kind == 'deckEnd': # name/color can come after the cards in hand edited files
+                deck.name = event[1].get("name", deck.name)
+                deck.color = event[1].get("color", deck.color)
+                app.decks.append(deck)
+            elif event[1] == "cards.lastCardId":
+                useCardId(event[2])
+            elif event[1] == "journalSegment":
+                app.journal.segment = event[2]
+    return missingIds
+
+def readAllData():
+    # the json snapshot with any journal changes replayed on top
+    data = readSnapshot()
+    firstSegment = data.get("journalSegment", 0)
+    cardIndex = indexCards(data)
+    for segment in settings.listJournalSegments():
+        if segment >= firstSegment:
+            replayJournal(data, segment, cardIndex)
+    return data
+
+### Journal ###
+
+def recordChange(app, op, deck=None, card=None, **fields):
+    # only the journal and sqlite care about individual changes; 'json'
+    # mode just rewrites everything in saveData
+    if settings.storageMode == 'journal':
+        app.journal.record(app.decks, op, deck, card, **fields)
+    elif settings.storageMode == 'sqlite':
+        app.store.record(op, deck, card, **fields)
+
+def indexCards(data): # card id -> card dict, for replaying changes by id
+    cardIndex = {}
+    for deckData in data.get("decks", []):
+        for cardData in deckData.get("cards", []):
+            if "id" in cardData:
+                cardIndex[cardData["id"]] = cardData
+    return cardIndex
+
+def replayJournal(data, segment, cardIndex):
+    with open(settings.getJournalPath(segment), 'r') as f:
+        for line in f:
+            try:
+                change = json.loads(line)
+            except ValueError:
+                break # half written line from a crash; nothing valid after it
+            applyChange(data, change, cardIndex)
+
+def findCardData(deckData, change, cardIndex):
+    # changes name their card by id; journals from before that use its position
+    if "card" in change:
+        return cardIndex[change["card"]]
+    return deckData["cards"][change["index"]]
+
+def applyChange(data, change, cardIndex):
+    # same changes as recordChange, but on the plain dicts from the snapshot
+    op = change["op"]
+    decks = data["decks"]
+    
+    if op == 'addDeck':
+        decks.append({"name": change["name"], "color": change["color"],
+                      "cards": change.get("cards", [])})
+        for cardData in change.get("cards", []):
+            data["cards.lastCardId"] = max(data.get("cards.lastCardId", 0), cardData["id"])
+            cardIndex[cardData["id"]] = cardData
+    elif op == 'delDeck':
+        decks.pop(change["deck"])
+    elif op == 'addCard':
+        cardData = change["cardData"]
+        decks[change["deck"]]["cards"].append(cardData)
+        data["cards.lastCardId"] = max(data.get("cards.lastCardId", 0), cardData["id"])
+        cardIndex[cardData["id"]] = cardData
+    elif op == 'addCards': # a batch from bulk.importCards
+        decks[change["deck"]]["cards"].extend(change["cards"])
+        for cardData in change["cards"]:
+            data["cards.lastCardId"] = max(data.get("cards.lastCardId", 0), cardData["id"])
+            cardIndex[cardData["id"]] = cardData
+    elif op == 'editCard':
+        cardData = findCardData(decks[change["deck"]], change, cardIndex)
+        cardData["front"] = change["front"]
+        cardData["back"] = change["back"]
+    elif op == 'delCard':
+        deckCards = decks[change["deck"]]["cards"]
+        cardData = findCardData(decks[change["deck"]], change, cardIndex)
+        cardIndex.pop(cardData.get("id"), None)
+        for i in range(len(deckCards)):
+            if deckCards[i] is cardData:
+                deckCards.pop(i)
+                break
+    elif op == 'rateCard':
+        findCardData(decks[change["deck"]], change, cardIndex).update(change["cardData"])
+    elif op == 'skipTime': # written by older versions, skipTime only moves the clock now
+        for deckData in decks:
+            for cardData in deckData["cards"]:
+                if cardData.get("lastReviewTime") != None:
+                    cardData["lastReviewTime"] -= change["hrs"]*60*60
+
+def compactJournal(lastSegment):
+    # fold journal segments up to lastSegment into the snapshot
+    data = readSnapshot()
+    firstSegment = data.get("journalSegment", 0)
+    cardIndex = indexCards(data)
+    for segment in range(firstSegment, lastSegment+1):
+        if os.path.exists(settings.getJournalPath(segment)):
+            replayJournal(data, segment, cardIndex)
+    data["journalSegment"] = lastSegment + 1
+    writeSnapshot(data)
+    
+    # snapshot has everything now, old segments can go
+    for segment in range(firstSegment, lastSegment+1):
+        if os.path.exists(settings.getJournalPath(segment)):
+            os.remove(settings.getJournalPath(segment))
+
+class Journal:
+    def __init__(self, segment=0):
+        self.segment = segment # journal file we are currently appending to
+        self.pending = [] # encoded changes not written to disk yet
+        self.lock = threading.Lock() # pending is shared with the SaveWorker
+        self.compactor = None # background compaction thread
+        self.holdCompaction = False # e.g. during a bulk import, see flush
+    
+    def record(self, decks, op, deck=None, card=None, **fields):
+        # the deck's position is taken now, so replaying changes in order
+        # always points at the same deck; cards are found by their id
+        change = {"op": op}
+        if deck != None and op != 'addDeck': # new decks/cards go at the end
+            change["deck"] = decks.index(deck)
+            if card != None and op != 'addCard':
+                change["card"] = card.id
+        change.update(fields)
+        with self.lock:
+            self.pending.append(json.dumps(change))
+    
+    def flush(self):
+        with self.lock:
+            lines = self.pending
+            self.pending = []
+        if lines == []:
+            return
+        
+        with open(settings.getJournalPath(self.segment), 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+        self.compactIfDue()
+    
+    def compactIfDue(self):
+        # compacting rewrites the whole snapshot, so while holdCompaction is
+        # set the journal just grows and gets compacted once afterwards
+        path = settings.getJournalPath(self.segment)
+        if (not self.holdCompaction and not self.isCompacting() and
+            os.path.exists(path) and os.path.getsize(path) >= settings.journalMaxBytes):
+            self.startCompaction()
+    
+    def isCompacting(self):
+        return self.compactor != None and self.compactor.is_alive()
+    
+    def startCompaction(self):
+        # new changes go to a fresh segment while the old ones are folded in
+        lastSegment = self.segment
+        self.segment += 1
+        self.compactor = threading.Thread(target=compactJournal,
+                                          args=(lastSegment,), daemon=True)
+        self.compactor.start()
+    
+    def wait(self):
+        if self.isCompacting():
+            self.compactor.join()
+
+### Split text storage ###
+
+def loadSplitData(app):
+    app.journal = Journal() # unused, nothing touches flashcard_data.json here
+    app.reviewLog = ReviewLog(settings.getReviewLogPath())
+    streamDecks(app, settings.getSiblingPath(settings.metaFile))
+    compactTextIfDue(app)
+
+def splitCardDict(card, textIndex):
+    return {"id": card.id,
+            "text": textIndex,
+            "isLearning": card.isLearning,
+            "learningStep": card.learningStep,
+            "easeFactor": card.easeFactor,
+            "interval": card.interval,
+            "lastReviewTime": card.lastReviewTime}
+
+def writeSplitData(app):
+    # this runs on the SaveWorker thread (see saveData): the cards are
+    # copied under the data lock, the text is appended and synced without it
+    written = [] # (card, its frontText, its backText, its dict) for text in memory
+    with getDataLock(app):
+        data = {"cards.lastCardId": cards.lastCardId, "decks": []}
+        for deck in app.decks:
+            deckData = {"name": deck.name, "color": deck.color, "cards": []}
+            for card in deck.listCards():
+                cardData = splitCardDict(card, card.textIndex)
+                if card.hasTextInMemory():
+                    written.append((card, card.frontText, card.backText, cardData,
+                                    card.front, card.back))
+                deckData["cards"].append(cardData)
+            data["decks"].append(deckData)
+    
+    # text typed in (or edited) since the last save goes to the end of the
+    # text file first, so the metadata never points at missing text
+    for card, frontText, backText, cardData, front, back in written:
+        cardData["text"] = textstore.textStore.append(front, back)
+    textstore.textStore.sync()
+    
+    # a card only drops its in-memory copy if it still holds the exact
+    # strings just written; one edited in the meantime keeps its new text
+    # for the save that edit asked for
+    with getDataLock(app):
+        for card, frontText, backText, cardData, front, back in written:
+            if card.frontText is frontText and card.backText is backText:
+                card.setTextIndex(cardData["text"])
+    writeSnapshot(data, settings.getSiblingPath(settings.metaFile))
+
+def getSplitPaths(): # text file, index file, metadata file
+    return [settings.getSiblingPath(fileName) for fileName in
+            (settings.textFile, settings.textIndexFile, settings.metaFile)]
+
+def compactTextIfDue(app):
+    # edits and deletes leave their old text behind in the append-only text
+    # file; once that's most of it, copy what's still used to new files
+    with getDataLock(app):
+        numCards = sum(len(deck.listCards()) for deck in app.decks)
+        unused = textstore.textStore.count - numCards
+        if unused > numCards and unused >= settings.textCompactMin:
+            compactText(app)
+
+def compactText(app):
+    # the used entries go to .new files, then metadata pointing at them to
+    # flashcard_meta.json.new; once that exists the compaction counts as
+    # done, and finishTextCompaction swaps all three in (again after a crash)
+    textPath, indexPath, metaPath = getSplitPaths()
+    usedCards = []
+    data = {"cards.lastCardId": cards.lastCardId, "decks": []}
+    for deck in app.decks:
+        deckData = {"name": deck.name, "color": deck.color, "cards": []}
+        for card in deck.listCards():
+            deckData["cards"].append(splitCardDict(card, len(usedCards)))
+            usedCards.append(card)
+        data["decks"].append(deckData)
+    textstore.textStore.copyEntries([card.textIndex for card in usedCards],
+                                    textPath + '.new', indexPath + '.new')
+    writeSnapshot(data, metaPath + '.new')
+    
+    textstore.closeTextStore()
+    finishTextCompaction()
+    textstore.openTextStore()
+    for newIndex in range(len(usedCards)):
+        usedCards[newIndex].setTextIndex(newIndex)
+
+def finishTextCompaction():
+    # before opening the TextStore: a compaction cut short after writing the
+    # new metadata is finished (metadata last, so it only ever points at
+    # the text file it was written for); one cut short before is dropped
+    textPath, indexPath, metaPath = getSplitPaths()
+    if os.path.exists(metaPath + '.new'):
+        for path in (textPath, indexPath, metaPath):
+            if os.path.exists(path + '.new'):
+                os.replace(path + '.new', path)
+    else:
+        for path in (textPath, indexPath):
+            if os.path.exists(path + '.new'):
+                os.remove(path + '.new')
@@ -0,0 +1,80 @@
+# study sessions: building the queue, rating cards, interval previews
+from . import settings, profiling, clock
+from .session import StudySession
+from .cards import schedulerParams
+from .reviewlog import getReviewState
+from .storage import cardToDict, recordChange, getDataLock
+from .saveworker import requestSave
+
+def getUpcomingCards(app, deck, after, until, now):
+    # reviews falling due between after and until, from the cardsByDue index
+    # in sqlite mode and the deck's own due index otherwise
+    if settings.storageMode == 'sqlite':
+        return app.store.getUpcomingCards(deck, after, until, now)
+    return deck.getUpcomingCards(after, until, now)
+
+def buildStudyQueue(app, deck):
+    # StudySession sorts out the order: learning cards as their steps run
+    # out, due reviews, then new cards. reviews that aren't due yet join
+    # from getUpcomingCards as they come within the learn-ahead window
+    now = clock.now() # one read for the whole queue
+    if settings.storageMode == 'sqlite':
+        cards = app.store.getStudyQueue(deck, now)
+    else:
+        cards = deck.getDueCards(now) + deck.getLearningCards() + deck.getNewCards()
+    return StudySession(cards, now=now,
+                        getUpcoming=lambda after, until, now: getUpcomingCards(app, deck, after, until, now))
+
+@profiling.timed('rateCard')
+def rateCard(app, rating):
+    with getDataLock(app):
+        before = getReviewState(app.currCard)
+        app.currCard.updateCard(rating)
+        app.reviewLog.record(app.currCard, rating, before)
+        recordChange(app, 'rateCard', app.currDeck, app.currCard,
+                     rating=rating, cardData=cardToDict(app.currCard))
+    
+    # back into the session for when it's due again (1-10 mins for learning
+    # steps, days for reviews)
+    app.cardsDue.append(app.currCard)
+
+    # refresh queue (move onto next card); None if nothing is up right now
+    app.currCard = app.cardsDue.first()
+    app.showAnswer = False
+    
+    requestSave(app)
+
+def previewIntervalsIfRated(card):
+    intervals = {'again': '<1m'}
+    
+    if card.isLearning == True:
+        intervals['hard'] = '<6m' if card.learningStep == 0 else '<10m'
+        intervals['good'] = '<10m' if card.learningStep == 0 else '1d'
+        intervals['easy'] = '4d'
+    else:
+        # same constants as updateCard, so the buttons match what rating does
+        params = schedulerParams
+        currInterval = card.interval
+        
+        hardInterval = currInterval * params["hardMultiplier"]
+        intervals['hard'] = makeNiceLooking(hardInterval)
+        
+        goodInterval = currInterval * card.easeFactor
+        intervals['good'] = makeNiceLooking(goodInterval)
+        
+        # easy raises the ease first, then grows the interval by it
+        easyEase = min(card.easeFactor + params["easyEaseBonus"], params["maxEase"])
+        easyInterval = currInterval * (easyEase * params["easyBonus"])
+        intervals['easy'] = makeNiceLooking(easyInterval)
+        
+    return intervals
+
+def makeNiceLooking(mins):
+    if mins < 60:
+        return f'{int(mins)}m'
+    elif mins < 60*24:
+        hrs = mins//60
+        return f'{hrs}h'
+    else:
+        days = mins // (24*60)
+        return f'{days}d'
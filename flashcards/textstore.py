@@ -0,0 +1,109 @@
+# card text for settings.storageMode = 'split', see TextStore
+import os, sys, struct, mmap
+from array import array
+from . import settings
+
+textStore = None # TextStore for 'split' mode, shared by every card
+
+def openTextStore():
+    global textStore
+    textPath = settings.getSiblingPath(settings.textFile)
+    indexPath = settings.getSiblingPath(settings.textIndexFile)
+    if textStore != None and (textStore.textPath, textStore.indexPath) != (textPath, indexPath):
+        closeTextStore() # the data folder changed, so these are other files
+    if textStore == None:
+        textStore = TextStore(textPath, indexPath)
+    return textStore
+
+def closeTextStore(): # the next openTextStore opens the files again
+    global textStore
+    if textStore != None:
+        textStore.close()
+        textStore = None
+
+class TextStore:
+    # card text in two append-only files:
+    #   text file:  utf-8 fronts and backs back to back
+    #   index file: little-endian uint64 offsets into the text file; card
+    #               text i is front = text[off[2i]:off[2i+1]] and
+    #               back = text[off[2i+1]:off[2i+2]]
+    # both are memory-mapped, so a card's text is only decoded when asked for.
+    # edited cards get a new entry; the old one stays behind unused until
+    # storage.compactText copies the used ones to new files
+    offsetFormat = struct.Struct('<Q')
+    
+    def __init__(self, textPath, indexPath):
+        self.textPath, self.indexPath = textPath, indexPath
+        self.textFile = open(textPath, 'a+b')
+        self.indexFile = open(indexPath, 'a+b')
+        
+        # a crash mid-append can leave half an entry; offsets always come
+        # in 2 per card plus the leading 0
+        offsets = self.indexFile.seek(0, os.SEEK_END) // 8
+        if offsets == 0:
+            self.indexFile.write(self.offsetFormat.pack(0))
+            offsets = 1
+        elif offsets % 2 == 0:
+            offsets -= 1
+        self.indexFile.truncate(offsets * 8)
+        self.count = (offsets - 1) // 2
+        self.maps = None # (index map, text map), replaced as a pair in remap
+        self.remap()
+    
+    def remap(self):
+        self.textFile.flush()
+        self.indexFile.flush()
+        if self.textFile.seek(0, os.SEEK_END) == 0:
+            return # nothing to map yet (mmap can't map empty files)
+        indexMap = mmap.mmap(self.indexFile.fileno(), 0, access=mmap.ACCESS_READ)
+        textMap = mmap.mmap(self.textFile.fileno(), 0, access=mmap.ACCESS_READ)
+        self.maps = (indexMap, textMap)
+    
+    def getText(self, index, side): # side 0 = front, 1 = back
+        indexMap, textMap = self.maps
+        start, end = struct.unpack_from('<QQ', indexMap, (2*index + side) * 8)
+        return str(textMap[start:end], 'utf-8')
+    
+    def append(self, front, back): # returns the new entry's index
+        self.textFile.seek(0, os.SEEK_END)
+        self.textFile.write(front.encode('utf-8'))
+        frontEnd = self.textFile.tell()
+        self.textFile.write(back.encode('utf-8'))
+        backEnd = self.textFile.tell()
+        self.indexFile.seek(0, os.SEEK_END)
+        self.indexFile.write(self.offsetFormat.pack(frontEnd) + self.offsetFormat.pack(backEnd))
+        self.count += 1
+        return self.count - 1
+    
+    def sync(self): # make appended text durable and readable
+        self.textFile.flush()
+        self.indexFile.flush()
+        os.fsync(self.textFile.fileno())
+        os.fsync(self.indexFile.fileno())
+        self.remap()
+    
+    def copyEntries(self, indexes, textPath, indexPath):
+        # writes entry indexes[i] as entry i of new text/index files, bytes
+        # copied as they are (nothing decoded); see storage.compactText
+        offsets = array('Q', [0])
+        with open(textPath, 'wb') as f:
+            if self.maps != None:
+                indexMap, textMap = self.maps
+                for index in indexes:
+                    start, middle, end = struct.unpack_from('<QQQ', indexMap, 2*index * 8)
+                    f.write(textMap[start:end])
+                    offsets.append(offsets[-1] + middle - start)
+                    offsets.append(offsets[-1] + end - middle)
+            f.flush()
+            os.fsync(f.fileno())
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        with open(indexPath, 'wb') as f:
+            f.write(offsets.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def close(self):
+        self.maps = None # the maps close once nothing reads them any more
+        self.textFile.close()
+        self.indexFile.close()
@@ -1,214 +1,19 @@
 from cmu_graphics import *
-import math, copy, time, json, os
-
-##### Backend #####
-dataFile = "flashcard_data.json"
-
-def getDataPath():
-    scriptDir = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(scriptDir, dataFile)
-
-def saveData(app):
-    data = {"decks": []}
-    for deck in app.decks:
-        deckData = {"name": deck.name, "color": deck.color, "cards": []}
-        for card in deck.cards:
-            cardData = {
-                "front": card.front,
-                "back": card.back,
-                "isLearning": card.isLearning,
-                "learningStep": card.learningStep,
-                "easeFactor": card.easeFactor,
-                "interval": card.interval,
-                "lastReviewTime": card.lastReviewTime
-            }
-            deckData["cards"].append(cardData)
-        data["decks"].append(deckData)
-    
-    with open(getDataPath(), 'w') as f:
-        json.dump(data, f, indent=2)
-
-def loadData(app):
-    dataPath = getDataPath()
-    if not os.path.exists(dataPath):
-        return
-    
-    with open(dataPath, 'r') as f:
-        data = json.load(f)
-    
-    for deckData in data.get("decks", []):
-        deck = Deck(deckData["name"], deckData.get("color", "lightBlue"))
-        for cardData in deckData.get("cards", []):
-            card = Flashcard(cardData["front"], cardData["back"])
-            card.isLearning = cardData.get("isLearning", True)
-            card.learningStep = cardData.get("learningStep", 0)
-            card.easeFactor = cardData.get("easeFactor", 2.5)
-            card.interval = cardData.get("interval", 0)
-            card.lastReviewTime = cardData.get("lastReviewTime", None)
-            deck.addCard(card)
-        app.decks.append(deck)
-
+import atexit, importlib.util, threading
+
+# scheduler and storage live in the flashcards package (no GUI in there),
+# this file is just the app
+from flashcards import (loadData, SaveWorker, requestSave, flushSaves,
+                        addDeck, deleteDeck, addNewCard, editCardText,
+                        deleteCard, skipTime, createSampleDeck,
+                        StudySession, buildStudyQueue, rateCard, previewIntervalsIfRated,
+                        makeNiceLooking,
+                        profiling, clock)
+from flashcards.search import openIndex, saveIndex
+from flashcards.duplicates import isNewDuplicate
 
 ##### Classes #####
 
-class Flashcard:
-    def __init__(self, front, back):
-        self.front = front
-        self.back = back
-        
-        # Learning phase variables
-        self.isLearning = True
-        self.learningStep = 0
-            # step 0 = 1min
-            # step 1 = 10min
-            # step 2 = 1day
-        
-        # Review phase variables
-        self.easeFactor = 2.5 # new interval = old interval * factor
-        self.interval = 0
-        self.lastReviewTime = None
-    
-    ### SPACED REPITITION ALGORITHM HERE ###
-    def updateCard(self, rating):
-        # new card logic
-        if self.isLearning:
-            
-            # again
-            if rating == 1:
-                self.learningStep = 0 # reset learning step
-                self.interval = 1
-                
-            # hard
-            elif rating == 2:
-                if self.learningStep == 0: 
-                    # do not increment step on hard card unless its at step 0
-                    self.interval = 6
-                    self.learningStep = 1
-                else:
-                    self.interval = 10
-                    # do not increment step
-            
-            # good
-            elif rating == 3:
-                self.learningStep += 1 # increment step if good
-                
-                if self.learningStep < 2:
-                    self.interval = 10 # always 10mins on step1
-                else: # step 2 or higher; done learning -> review
-                    self.isLearning = False
-                    self.interval = 1 * 24 * 60
-            
-            # easy
-            elif rating == 4:
-                # move to review immediately
-                self.isLearning = False
-                self.interval = 4 * 24 * 60
-            
-        
-        # review card logic 
-        else:
-            # do not decrease ease below 130% (Anki faq)
-            
-            # again
-            if rating == 1:
-                self.easeFactor = max(1.3, self.easeFactor - 0.2) # drop easeFactor
-                
-                # relearn
-                self.isLearning = True
-                self.learningStep = 0
-                self.interval = 1
-            
-            # hard (remembered but difficult)
-            elif rating == 2:
-                self.easeFactor = max(1.3, self.easeFactor - 0.15) # drop easeFactor
-                self.interval *= 1.2 # increase interval but barely
-            
-            # good
-            elif rating == 3:
-                # easefactor unchanged
-                self.interval *= self.easeFactor
-                # normal exponential growth if remembered well
-            
-            # easy
-            elif rating == 4:
-                self.easeFactor = min(self.easeFactor + 0.15, 4) # capped at 4x
-                self.interval *= self.easeFactor * 1.3 # +30% easy bonus v.s. Good
-        
-        # time
-        self.lastReviewTime = time.time()
-        self.interval = round(self.interval, 1)
-    
-    def isDue(self): # checks if you need to review this card
-        if self.lastReviewTime == None:
-            return True
-        else:
-            mins = (time.time() - self.lastReviewTime) / 60
-            if mins >= self.interval: return True
-            else: return False
-
-class Deck:
-    def __init__(self, name, color='lightBlue'):
-        self.cards = []
-        self.name = name
-        self.color = color
-    
-    def emptyDeck(self):
-        self.cards = []
-    
-    def addCard(self, card):
-        self.cards.append(card)
-    
-    def delCard(self, card):
-        if card in self.cards:
-            self.cards.remove(card)
-    
-    def editCard(self, card, newFront=None, newBack=None):
-        if card in self.cards:
-            card.front = newFront
-            card.back = newBack
-    
-    def getDueCards(self):
-        result = []
-        for card in self.cards:
-            if card.isDue() and card.lastReviewTime != None and not card.isLearning:
-                result.append(card)
-        return result
-    
-    def getNewCards(self):
-        result = []
-        for card in self.cards:
-            if card.lastReviewTime == None:
-                result.append(card)
-        return result
-        
-    def getLearningCards(self):
-        result = []
-        for card in self.cards:
-            if card.isLearning and card.lastReviewTime != None:
-                result.append(card)
-        return result
-    
-    def getReviewCards(self):
-        result = []
-        for card in self.cards:
-            if not card.isLearning:
-                result.append(card)
-        return result
-    
-    def getStats(self):
-        total = len(self.cards)
-        
-        due = len(self.getDueCards())
-        review = len(self.getReviewCards())
-        learning = len(self.getLearningCards())
-        new = len(self.getNewCards())
-        
-        return { 'Total': total,
-                 'Due': due,
-                 'Learn': learning,
-                 'New': new, 
-                 'Review': review }
- 
 class Button:
     def __init__(self, x, y, w, h, text, color='gray', textColor='white'):
         self.x = x
@@ -234,6 +39,89 @@ class Button:
     def updateHoveringState(self, mouseX, mouseY): # update hovering/highlighted button when we move mouse
         self.isHoveringButton = self.isMouseOnButton(mouseX, mouseY)
 
+class DeckListLayout:
+    # where the menu's deck rows go; drawing and clicking both use this.
+    # only the rows that fit in the box are drawn, and scroll (in rows)
+    # says which deck is at the top, so any number of decks is reachable
+    def __init__(self, width, height):
+        self.boxTop = 60
+        self.boxLeft = 20
+        self.boxWidth = width - 2*self.boxLeft
+        self.boxHeight = height-100
+        self.headerHeight = 50
+        self.startTop = self.boxTop + self.headerHeight + 35
+        self.rowHeight = 30
+        self.visibleRows = (self.boxTop+self.boxHeight - self.startTop) // self.rowHeight
+        self.scroll = 0
+    
+    def getScroll(self, numDecks): # scroll can be too far after deleting decks
+        return max(0, min(self.scroll, numDecks - self.visibleRows))
+    
+    def scrollBy(self, rows, numDecks):
+        self.scroll = self.getScroll(numDecks) + rows
+        self.scroll = self.getScroll(numDecks)
+    
+    def scrollTo(self, index, numDecks): # just enough to make row index visible
+        scroll = self.getScroll(numDecks)
+        if index < scroll:
+            self.scroll = index
+        elif index >= scroll + self.visibleRows:
+            self.scroll = index - self.visibleRows + 1
+    
+    def getVisibleRange(self, numDecks):
+        scroll = self.getScroll(numDecks)
+        return range(scroll, min(numDecks, scroll + self.visibleRows))
+    
+    def getRowTop(self, index, numDecks):
+        return self.startTop + (index - self.getScroll(numDecks))*self.rowHeight
+    
+    def getRowAt(self, mouseX, mouseY, numDecks): # deck index under the mouse or None
+        if not (self.boxLeft <= mouseX <= self.boxLeft+self.boxWidth):
+            return None
+        if not (self.startTop <= mouseY < self.startTop + self.visibleRows*self.rowHeight):
+            return None
+        index = self.getScroll(numDecks) + int((mouseY - self.startTop) // self.rowHeight)
+        return index if index < numDecks else None
+
+class RenderCache:
+    # things the screens draw that take work to figure out (deck stats and
+    # their labels/colors, interval previews). redrawAll runs after every
+    # event, mouse moves included, but these only change when a deck does
+    # (Deck.version) or when a card becomes due, so keep them until then
+    def __init__(self):
+        self.deckRows = {} # deck -> (deck.version, valid until, row)
+        self.intervals = (None, None) # ((card, its schedule), previews)
+    
+    def getDeckRow(self, deck):
+        now = clock.now()
+        entry = self.deckRows.get(deck)
+        if (entry != None and entry[0] == deck.version and
+            (entry[1] == None or now < entry[1])):
+            return entry[2]
+        
+        stats = deck.getStats(now)
+        grey = rgb(100, 100, 100)
+        row = {'stats': stats,
+               'new': str(stats['New']),
+               'learn': str(stats['Learn']),
+               'due': str(stats['Due']),
+               'newColor': rgb(0, 183, 235) if stats['New'] > 0 else grey, #blue
+               'learnColor': rgb(255, 0, 0) if stats['Learn'] > 0 else grey, #red
+               'dueColor': rgb(102, 255, 0) if stats['Due'] > 0 else grey} #green
+        self.deckRows[deck] = (deck.version, deck.getNextDueTime(now), row)
+        return row
+    
+    def forgetDeletedDecks(self, decks):
+        if len(self.deckRows) > len(decks):
+            self.deckRows = {deck: self.deckRows[deck] for deck in decks
+                             if deck in self.deckRows}
+    
+    def getIntervals(self, card):
+        key = (card, card.isLearning, card.learningStep, card.interval, card.easeFactor)
+        if self.intervals[0] != key:
+            self.intervals = (key, previewIntervalsIfRated(card))
+        return self.intervals[1]
+
 
 #### app ####
     
@@ -249,21 +137,42 @@ def onAppStart(app):
     # study View
     app.currCard = None
     app.showAnswer = False
-    app.cardsDue = []
+    app.cardsDue = StudySession()
     
     # editCard View
     app.editingCard = None
     app.selectedInput = 'front'
     app.frontInput = ''
     app.backInput = ''
+    app.duplicateIndex = None # every card's front, made on the first Add (see isNewDuplicate)
+    app.duplicateWarning = None # front the last Add was stopped for
+    app.duplicateMatches = [] # cards that already have it
     
     # createDeck View
     app.deckNameInput = ''
+    
+    # search View (every card in every deck, '/' on the menu)
+    app.searchIndex = None # made the first time search is opened (onStep)
+    app.searchInput = ''
+    app.searchResults = [] # (deck, card) pairs
+    app.searchComplete = True
+    app.editingFromSearch = False # editCard goes back to search when done
+    
+    app.renderCache = RenderCache()
+    app.deckList = DeckListLayout(app.width, app.height)
+    
+    # last frame's timings in the corner (FLASHCARDS_PROFILE=1, toggle with p)
+    app.showProfile = profiling.enabled
+    
+    # reviews coming up in the next 30 days (toggle with f, needs numpy)
+    app.showForecast = False
+    app.forecastCache = None # made the first time it's shown
 
     # menu buttons
     app.menuButtons = {
                        'decks': Button(app.width/2-80, 0, 80, 30, 'Decks', rgb(55,55,55)),
                        'add': Button(app.width/2, 0, 80, 30, 'Add', rgb(55,55,55)),
+                       'search': Button(app.width/2+80, 0, 80, 30, 'Search', rgb(55,55,55)),
                        'createDeck': Button(app.width/2-55, app.height-30, 110, 30, 'Create Deck', rgb(55,55,55))
                         }
     
@@ -298,11 +207,44 @@ def onAppStart(app):
                            'add': Button(app.width/2+10, buttonY, buttonW, buttonH, 'Add', rgb(120,120,120))
                             }
 
-    # load user's config of decks/cards
-    loadData(app)
+    # saves happen on a background thread; it copies the decks under
+    # dataLock, which the helpers hold while they change them
+    app.dataLock = threading.RLock()
+    app.saver = SaveWorker(app)
+    
+    # load user's config of decks/cards in the background; decks show up in
+    # the menu as they finish loading
+    startLoading(app)
+
+def startLoading(app):
+    # nothing can be changed (or saved) until the whole file is in, a save
+    # before that would write a collection with decks missing
+    app.loading = True
+    app.loadError = None
+    thread = threading.Thread(target=loadInBackground, args=(app,), daemon=True)
+    thread.start()
+
+def loadInBackground(app):
+    # only the decks: the search and duplicate indexes and the forecast go
+    # through every card (and in 'split' mode decode all their text), so
+    # they're made the first time they're needed instead
+    try:
+        loadData(app)
+    except Exception as e:
+        app.loadError = e # raised again in onStep, on the app's thread
+        return
+    atexit.register(saveOnExit, app)
+    app.loading = False
+
+def saveOnExit(app):
+    flushSaves(app) # make sure the last save lands
+    # after it, so the index is stamped with the files as they end up
+    if app.searchIndex != None:
+        saveIndex(app.searchIndex)
 
 ### draw App ###
 
+@profiling.timed('redrawAll', frame=True)
 def redrawAll(app):
     drawRect(0, 0, app.width, app.height, fill=rgb(86, 86, 86)) # background
     
@@ -314,9 +256,53 @@ def redrawAll(app):
         drawEditCardScreen(app)
     elif app.currScreen == 'createDeck':
         drawNewDeckScreen(app)
+    elif app.currScreen == 'search':
+        drawSearchScreen(app)
+    
+    if app.showForecast and app.currScreen == 'menu':
+        drawForecastOverlay(app)
+    if app.showProfile:
+        drawProfileOverlay(app)
+
+def drawProfileOverlay(app):
+    # what the previous frame spent its time on (events + redraw), in ms
+    breakdown = profiling.getFrameBreakdown()
+    x, y = app.width-170, 40
+    drawRect(x, y, 160, 20 + 16*len(breakdown), fill='black', opacity=60)
+    drawLabel('last frame', x+8, y+10, size=12, fill='white', bold=True, align='left')
+    for i in range(len(breakdown)):
+        name, ms = breakdown[i]
+        drawLabel(f'{name} {ms:.2f}', x+8, y+26 + 16*i, size=12, fill='white', align='left')
+
+def drawForecastOverlay(app):
+    # bar per day over the deck list: reviews due across all decks
+    x, y, w, h = 40, 60, app.width-80, 200
+    drawRect(x, y, w, h, fill=rgb(40, 40, 40), border=rgb(100, 100, 100), borderWidth=2)
+    if app.forecastCache == None:
+        drawLabel('The forecast needs numpy (pip install numpy)', x+w/2, y+h/2, size=14, fill='white')
+        return
+    
+    forecast = app.forecastCache.getForecast(app.decks)
+    total = forecast["total"]
+    days = len(total)
+    drawLabel(f'Reviews in the next {days} days: {int(total.sum())}', x+15, y+18, size=14,
+              fill='white', bold=True, align='left')
+    drawLabel(f'today {int(total[0])}   busiest {int(total.max())}', x+w-15, y+18, size=12,
+              fill='lightGray', align='right')
+    
+    chartTop, chartBottom = y+40, y+h-25
+    barWidth = (w-30) / days
+    tallest = max(int(total.max()), 1)
+    for day in range(days):
+        if total[day] > 0:
+            barHeight = max(1, (chartBottom-chartTop) * total[day] / tallest)
+            drawRect(x+15 + day*barWidth, chartBottom-barHeight, max(1, barWidth-2), barHeight,
+                     fill=rgb(102, 255, 0) if day == 0 else rgb(0, 183, 235))
+    drawLabel('today', x+15, chartBottom+12, size=11, fill='lightGray', align='left')
+    drawLabel(f'+{days-1}d', x+w-15, chartBottom+12, size=11, fill='lightGray', align='right')
 
 def drawNavButtons(app):
-    topNavButtons = ['decks', 'add']
+    topNavButtons = ['decks', 'add', 'search']
     for button in topNavButtons:
         app.menuButtons[button].drawButton()
 
@@ -325,10 +311,11 @@ def drawMenuScreen(app):
     app.menuButtons['createDeck'].drawButton()
     
     # decks
-    boxTop = 60
-    boxLeft = 20
-    boxWidth = app.width - 2*boxLeft
-    boxHeight = app.height-100
+    layout = app.deckList
+    boxTop = layout.boxTop
+    boxLeft = layout.boxLeft
+    boxWidth = layout.boxWidth
+    boxHeight = layout.boxHeight
     
     # header
     drawRect(boxLeft, boxTop, boxWidth, boxHeight, fill=rgb(60, 60, 60))
@@ -338,48 +325,39 @@ def drawMenuScreen(app):
     drawLabel('New', boxLeft+boxWidth-180, boxTop+30, size=16, fill='white', bold=True)
     drawLine(boxLeft+20, boxTop+50, boxLeft+boxWidth-20, boxTop+50, lineWidth=1)
     
-    # decks list
-    headerHeight = 50
-    startTop = boxTop + headerHeight + 35
-    rowHeight = 30
-    
-    # draw deck rows
-    for i in range(len(app.decks)):
-        deck = app.decks[i]
-        rowTop = startTop + i*rowHeight
-        
-        # add only if the screen is not full
-        if (rowTop+rowHeight >= boxTop+headerHeight and 
-            rowTop+rowHeight <= boxTop+boxHeight):
-            drawMenuScreenDeckRow(app, deck, rowTop, i, boxLeft, boxWidth)
-    
+    if app.loading:
+        drawLabel('Loading decks...', app.width/2, app.height-50, size=14, fill='lightGray')
+    elif clock.getOffset() != 0: # 't' was pressed; gone on the next start
+        days = clock.getOffset() / (24*60*60)
+        drawLabel(f'Clock skipped ahead {days:g}d', app.width/2, app.height-50, size=14, fill='lightGray')
+    
+    # draw only the deck rows that fit in the box
+    numDecks = len(app.decks)
+    app.renderCache.forgetDeletedDecks(app.decks)
+    for i in layout.getVisibleRange(numDecks):
+        rowTop = layout.getRowTop(i, numDecks)
+        drawMenuScreenDeckRow(app, app.decks[i], rowTop, i, boxLeft, boxWidth)
+    
+    # scrollbar when there are more decks than rows (up/down keys scroll)
+    if numDecks > layout.visibleRows:
+        trackTop = layout.startTop
+        trackHeight = layout.visibleRows * layout.rowHeight
+        thumbHeight = max(10, trackHeight * layout.visibleRows / numDecks)
+        thumbTop = trackTop + (trackHeight-thumbHeight) * layout.getScroll(numDecks) / (numDecks - layout.visibleRows)
+        drawRect(boxLeft+boxWidth-8, trackTop, 4, trackHeight, fill=rgb(80, 80, 80))
+        drawRect(boxLeft+boxWidth-8, thumbTop, 4, thumbHeight, fill=rgb(140, 140, 140))
+
 def drawMenuScreenDeckRow(app, deck, y, index, boxLeft, boxWidth):
-    stats = deck.getStats()
+    row = app.renderCache.getDeckRow(deck)
     
     drawCircle(boxLeft+25, y+15, 6, fill=deck.color)
     drawRect(boxLeft, y, boxWidth, 30, fill=None, border=None)
     drawLabel(deck.name, boxLeft+40, y+15, size=14, fill='white', align='left')
     
-    # new cards
-    if stats['New'] > 0:
-        newColor = rgb(0, 183, 235) #blue
-    else:
-        newColor = rgb(100, 100, 100)
-    drawLabel(str(stats['New']), boxLeft+boxWidth-180, y+15, size=14, fill=newColor, bold=True)
-    
-    # learning cards
-    if stats['Learn'] > 0:
-        learnColor = rgb(255, 0, 0) #red
-    else:
-        learnColor = rgb(100, 100, 100)
-    drawLabel(str(stats['Learn']), boxLeft+boxWidth-110, y+15, size=14, fill=learnColor, bold=True)
-    
-    # due cards
-    if stats['Due'] > 0:
-        dueColor = rgb(102, 255, 0) #green
-    else:
-        dueColor = rgb(100,100,100)
-    drawLabel(str(stats['Due']), boxLeft+boxWidth-40, y+15, size=14, fill=dueColor, bold=True)
+    # new / learning / due cards
+    drawLabel(row['new'], boxLeft+boxWidth-180, y+15, size=14, fill=row['newColor'], bold=True)
+    drawLabel(row['learn'], boxLeft+boxWidth-110, y+15, size=14, fill=row['learnColor'], bold=True)
+    drawLabel(row['due'], boxLeft+boxWidth-40, y+15, size=14, fill=row['dueColor'], bold=True)
 
 def drawNewDeckScreen(app):
     drawMenuScreen(app)
@@ -407,29 +385,34 @@ def drawNewDeckScreen(app):
     
     for button in app.createDeckButtons.values():
         button.drawButton()
-    
+
 def drawStudyScreen(app):
     drawNavButtons(app)
     
-    # done with deck
-    if len(app.cardsDue) == 0 or app.currCard == None:
+    # done with deck (for now)
+    if app.currCard == None:
         drawLabel("Yay! You're all done with this deck for now.", 
                   app.width/2, app.height/2, size=24, fill='pink', bold=True)
+        nextShowTime = app.cardsDue.getNextShowTime()
+        if nextShowTime != None:
+            mins = (nextShowTime - clock.now()) / 60
+            drawLabel(f'Next card in {makeNiceLooking(mins)}', app.width/2,
+                      app.height/2+35, size=16, fill='white')
         return
     
     card = app.currCard
     drawLabel(card.front, app.width/2, 150, size=24, fill='white')
     
     if not app.showAnswer:
-        stats = app.currDeck.getStats()
+        row = app.renderCache.getDeckRow(app.currDeck)
         statsY = app.height-70
         
         # draw stats & answer button & delete deck button
-        drawLabel(str(stats['New']), app.width/2-30, statsY,
+        drawLabel(row['new'], app.width/2-30, statsY,
                   fill=rgb(0, 183, 235), size=16, bold=True)
-        drawLabel(str(stats['Learn']), app.width/2, statsY,
+        drawLabel(row['learn'], app.width/2, statsY,
                   fill=rgb(255, 0, 0), size=16, bold=True)
-        drawLabel(str(stats['Due']), app.width/2+30, statsY,
+        drawLabel(row['due'], app.width/2+30, statsY,
                   fill=rgb(102, 255, 0), size=16, bold=True)
         app.studyButtons['showAnswer'].drawButton()
         app.studyButtons['deleteDeck'].drawButton()
@@ -443,7 +426,7 @@ def drawStudyScreen(app):
         drawLabel(card.back, app.width/2, 280, size=24, fill='white')
         
         #show the next interval when selecting rating
-        intervals = previewIntervalsIfRated(card)
+        intervals = app.renderCache.getIntervals(card)
         buttonY = app.height-80
         buttonW = 75
         drawLabel(intervals['again'], app.width/2-180+buttonW/2,  buttonY-15, size=14, fill='red')
@@ -480,10 +463,57 @@ def drawEditCardScreen(app):
     backFill = 'lightGray' if app.selectedInput == 'back' else 'gray'
     drawRect(50, 180, 450, 30, fill=backFill)
     drawLabel(app.backInput, 60, 195, size=16, fill='white', align='left')
+    
+    # the last Add was held back, some card already has this front
+    if app.duplicateWarning != None and app.duplicateWarning == app.frontInput.strip():
+        deckName = app.duplicateMatches[0].deck.name
+        others = len(app.duplicateMatches) - 1
+        where = f"'{deckName}'" + (f' (and {others} more)' if others > 0 else '')
+        drawLabel(f'A card in {where} has this front already', 50, 240,
+                  size=14, fill=rgb(255, 120, 120), align='left')
+        drawLabel('press Add again to keep both', 50, 260, size=14,
+                  fill=rgb(255, 120, 120), align='left')
+
+def shorten(text, length): # fits a row
+    return text if len(text) <= length else text[:length-3] + '...'
+
+def drawSearchScreen(app):
+    drawNavButtons(app)
+    
+    # query box, results update on every key
+    drawLabel('> Search every deck', 50, 50, size=16, fill='white', align='left')
+    drawRect(50, 60, 450, 30, fill='lightGray')
+    drawLabel(app.searchInput, 60, 75, size=16, fill='white', align='left')
+    
+    if app.searchIndex == None:
+        status = 'indexing every card, this only happens once...'
+    elif app.searchInput.strip() == '':
+        status = 'type part of any word on a card, esc to go back'
+    elif len(app.searchResults) == 0:
+        status = 'no cards match' if app.searchComplete else 'no matches yet, keep typing'
+    elif app.searchComplete:
+        status = f'{len(app.searchResults)} cards'
+    else:
+        status = f'first {len(app.searchResults)} matches, keep typing to narrow it down'
+    drawLabel(status, 50, 105, size=12, fill='lightGray', align='left')
+    
+    # results, click one to edit it
+    for i in range(len(app.searchResults)):
+        deck, card = app.searchResults[i]
+        top = searchListTop + i*searchRowHeight
+        drawRect(20, top, app.width-40, searchRowHeight-4, fill=rgb(70, 70, 70))
+        drawLabel(shorten(card.front, 42), 30, top+11, size=14, fill='white',
+                  bold=True, align='left')
+        drawLabel(shorten(card.back, 50), 30, top+27, size=12, fill='lightGray', align='left')
+        drawLabel(shorten(deck.name, 20), app.width-30, top+11, size=12,
+                  fill=deck.color, align='right')
 
 ### Mouse events ###
 
+@profiling.timed('onMousePress')
 def onMousePress(app, mouseX, mouseY):
+    if app.loading:
+        return
     handleNavClick(app, mouseX, mouseY)
     
     if app.currScreen == 'menu':
@@ -494,9 +524,12 @@ def onMousePress(app, mouseX, mouseY):
         handleEditCardClick(app, mouseX, mouseY)
     elif app.currScreen == 'createDeck':
         handleCreateDeckClick(app, mouseX, mouseY)
+    elif app.currScreen == 'search':
+        handleSearchClick(app, mouseX, mouseY)
 
+@profiling.timed('onMouseMove')
 def onMouseMove(app, mouseX, mouseY):
-    topMenuButtons = ['decks', 'add']
+    topMenuButtons = ['decks', 'add', 'search']
     for button in topMenuButtons:
         app.menuButtons[button].updateHoveringState(mouseX, mouseY) # always update nav bar
     
@@ -524,42 +557,28 @@ def handleNavClick(app, mouseX, mouseY):
         app.frontInput = ''
         app.backInput = ''
         app.selectedInput = 'front'
+        app.editingFromSearch = False
+        app.duplicateWarning = None
+    elif app.menuButtons['search'].isMouseOnButton(mouseX, mouseY):
+        openSearch(app)
 
 def handleMenuClick(app, mouseX, mouseY):
-    # need to update these values in TWO locations; maybe add class later
-    boxTop = 60
-    boxLeft = 20
-    boxWidth = app.width - 2*boxLeft
-    boxHeight = app.height-100
-    headerHeight = 50
-    startTop = boxTop + headerHeight + 35
-    rowHeight = 30
-    
-    for i in range(len(app.decks)):
-        deck = app.decks[i]
-        rowTop = startTop + i*rowHeight
+    # row under the mouse comes straight from the layout, no loop over decks
+    index = app.deckList.getRowAt(mouseX, mouseY, len(app.decks))
+    if index != None:
+        deck = app.decks[index]
+        app.currScreen = 'study'
+        app.currDeck = deck
         
-        # check if clicking this deckRow
-        if (boxLeft <= mouseX <= boxLeft+boxWidth and
-            boxTop+headerHeight <= rowTop <= boxTop+boxHeight and
-            rowTop <= mouseY <= rowTop+rowHeight):
-                
-            app.currScreen = 'study'
-            app.currDeck = deck
-            
-            # set all due cards to keep track of
-            allCards = []
-            allCards.extend(deck.getDueCards())
-            allCards.extend(deck.getLearningCards())
-            allCards.extend(deck.getNewCards())
-            app.cardsDue = allCards
-            
-            if len(app.cardsDue) > 0:
-                app.currCard = app.cardsDue[0]
-                app.showAnswer = False
-            else: # empty deck
-                app.currCard = None
-                print(f"No cards due for {deck.name}")
+        # set all due cards to keep track of
+        app.cardsDue = buildStudyQueue(app, deck)
+        
+        if len(app.cardsDue) > 0:
+            app.currCard = app.cardsDue.first()
+            app.showAnswer = False
+        else: # empty deck
+            app.currCard = None
+            print(f"No cards due for {deck.name}")
     
     if app.menuButtons['createDeck'].isMouseOnButton(mouseX, mouseY):
         app.currScreen = 'createDeck'
@@ -585,27 +604,34 @@ def handleCreateDeckClick(app, mouseX, mouseY):
     # ok
     elif app.createDeckButtons['ok'].isMouseOnButton(mouseX, mouseY):
         if app.deckNameInput.strip() != '': # check not empty name
-            newDeck = Deck(app.deckNameInput.strip())
-            app.decks.append(newDeck)
+            addDeck(app, app.deckNameInput.strip())
+            app.deckList.scrollTo(len(app.decks)-1, len(app.decks)) # show the new deck
             app.currScreen = 'menu'
+            requestSave(app)
     
     # cancel
     elif app.createDeckButtons['cancel'].isMouseOnButton(mouseX, mouseY):
         app.currScreen = 'menu'
-    
-    saveData(app)
+
+def handleSearchClick(app, mouseX, mouseY):
+    if not (20 <= mouseX <= app.width-20) or mouseY < searchListTop:
+        return
+    index = int((mouseY - searchListTop) // searchRowHeight)
+    if index < len(app.searchResults):
+        openSearchResult(app, index)
 
 def handleStudyClick(app, mouseX, mouseY):
-    if app.cardsDue == []:
+    if app.currCard == None:
         return
     
     # delete this deck
     if app.studyButtons['deleteDeck'].isMouseOnButton(mouseX, mouseY):
-        app.decks.remove(app.currDeck)
+        deleteDeck(app, app.currDeck)
         app.currDeck=None
         app.currCard=None
-        app.cardsDue = []
+        app.cardsDue = StudySession()
         app.currScreen = 'menu'
+        requestSave(app)
     
     # answer button
     elif not app.showAnswer:
@@ -619,8 +645,10 @@ def handleStudyClick(app, mouseX, mouseY):
         app.frontInput = app.currCard.front
         app.backInput = app.currCard.back
         app.selectedInput = 'front'
+        app.editingFromSearch = False
+        app.duplicateWarning = None
     
-    # rating buttons
+    # rating buttons (rateCard asks for the save)
     elif app.studyButtons['again'].isMouseOnButton(mouseX, mouseY):
         rateCard(app, 1)
     elif app.studyButtons['hard'].isMouseOnButton(mouseX, mouseY):
@@ -629,8 +657,6 @@ def handleStudyClick(app, mouseX, mouseY):
         rateCard(app, 3)
     elif app.studyButtons['easy'].isMouseOnButton(mouseX, mouseY):
         rateCard(app, 4)
-    
-    saveData(app)
 
 def handleEditCardClick(app, mouseX, mouseY):
     # frontside
@@ -643,60 +669,127 @@ def handleEditCardClick(app, mouseX, mouseY):
     
     # close/cancel editing
     elif app.editCardButtons['close'].isMouseOnButton(mouseX, mouseY):
-        if app.cardsDue == []:
+        if app.editingFromSearch:
+            backToSearch(app)
+        elif len(app.cardsDue) == 0:
             app.currScreen = 'menu'
         else:
             app.currScreen = 'study'
             #also update the currCard if we just added a new card to empty deck
             if app.currCard==None and len(app.cardsDue)>0:
-                app.currCard = app.cardsDue[0]
+                app.currCard = app.cardsDue.first()
                 app.showAnswer=False
     
     # save new edits
     elif app.editCardButtons['add'].isMouseOnButton(mouseX, mouseY):
-        # make sure smth is entered
-        if app.frontInput.strip() != '' and app.backInput.strip() != '':
+        # make sure smth is entered (and it's not a card we have already)
+        if (app.frontInput.strip() != '' and app.backInput.strip() != '' and
+            not isNewDuplicate(app, app.frontInput, app.editingCard)):
             if app.editingCard != None:
                 # edit this card
-                app.editingCard.front = app.frontInput.strip()
-                app.editingCard.back = app.backInput.strip()
+                editCardText(app, app.currDeck, app.editingCard,
+                             app.frontInput.strip(), app.backInput.strip())
             elif app.editingCard == None:
                 # create new card
-                newCard = Flashcard(app.frontInput.strip(), app.backInput.strip())
-                app.currDeck.addCard(newCard)
+                newCard = addNewCard(app, app.currDeck,
+                                     app.frontInput.strip(), app.backInput.strip())
                 app.cardsDue.append(newCard)
+            requestSave(app)
             
             # reset everything
             app.frontInput = ''
             app.backInput = ''
             app.editingCard = None
             app.selectedInput = 'front'
+            if app.editingFromSearch:
+                backToSearch(app)
     
     # delete current card
     elif app.editCardButtons['delete'].isMouseOnButton(mouseX, mouseY):
         if app.editingCard != None: # only if editing a card ('None' = creating a new card)
-            app.currDeck.delCard(app.currCard)
+            deleteCard(app, app.currDeck, app.editingCard)
+            app.cardsDue.remove(app.editingCard)
+            requestSave(app)
             
-            try:
-                app.cardsDue.remove(app.currCard)
-            except ValueError:
-                pass
-            
-            if len(app.cardsDue) > 0:
+            if app.editingFromSearch:
+                app.currCard = None
+                backToSearch(app)
+            elif len(app.cardsDue) > 0:
                 app.currScreen = 'study'
-                app.currCard = app.cardsDue[0]
+                app.currCard = app.cardsDue.first()
                 app.showAnswer = False
             else:
                 app.currScreen = 'study'
                 app.currCard = None
         
         app.editingCard = None
-    
-    saveData(app)
+
+### Search ###
+
+searchListTop = 120
+searchRowHeight = 44
+
+def getSearchRows(app): # as many results as fit on the screen
+    return (app.height - 10 - searchListTop) // searchRowHeight
+
+@profiling.timed('search')
+def updateSearchResults(app):
+    if app.searchIndex == None:
+        app.searchResults, app.searchComplete = [], True
+        return
+    app.searchResults, app.searchComplete = app.searchIndex.search(app.searchInput,
+                                                                   getSearchRows(app))
+
+def openSearch(app):
+    # the first time, the screen says so and onStep makes the index
+    app.currScreen = 'search'
+    updateSearchResults(app)
+
+def openSearchIndex(app):
+    # the index saved on the last exit if the data files haven't changed
+    # since, otherwise it goes through every card's text once
+    app.searchIndex = openIndex(app.decks)
+    updateSearchResults(app)
+
+def backToSearch(app):
+    # the card may be edited or gone now, look again
+    app.editingFromSearch = False
+    app.currScreen = 'search'
+    updateSearchResults(app)
+
+def openSearchResult(app, index):
+    deck, card = app.searchResults[index]
+    app.currDeck = deck
+    app.cardsDue = buildStudyQueue(app, deck) # what 'Add' and 'Delete Card' update
+    app.currCard = None
+    app.showAnswer = False
+    app.currScreen = 'editCard'
+    app.editingCard = card
+    app.frontInput = card.front
+    app.backInput = card.back
+    app.selectedInput = 'front'
+    app.editingFromSearch = True
+    app.duplicateWarning = None
+
+### Timer ###
+
+def onStep(app):
+    if app.loadError != None:
+        raise app.loadError
+    if app.currScreen == 'search' and app.searchIndex == None:
+        openSearchIndex(app) # after a frame showing that it's indexing
+    # cards come back during a session (learning steps, reviews falling due,
+    # which only join once they're close); pick the next one up once it's time
+    if app.currScreen == 'study' and app.currCard == None:
+        app.currCard = app.cardsDue.first()
+        app.showAnswer = False
 
 ### Key-press events ###
 
+@profiling.timed('onKeyPress')
 def onKeyPress(app, key):
+    if app.loading and key not in ('up', 'down', 'p'): # just looking while loading
+        return
     if app.currScreen == 'menu':
         handleMenuKeyPress(app, key)
     elif app.currScreen == 'study':
@@ -705,12 +798,29 @@ def onKeyPress(app, key):
         handleEditCardKeyPress(app, key)
     elif app.currScreen == 'createDeck':
         handleCreateDeckKeyPress(app, key)
+    elif app.currScreen == 'search':
+        handleSearchKeyPress(app, key)
 
 def handleMenuKeyPress(app, key):
     if key == 's':
         createSampleDeck(app)
     elif key == 't':
         skipTime(app, 24)
+    elif key == 'p' and profiling.enabled:
+        app.showProfile = not app.showProfile
+    elif key == 'f':
+        app.showForecast = not app.showForecast
+        if (app.showForecast and app.forecastCache == None and
+            importlib.util.find_spec('numpy') != None):
+            # later presses only redo the decks that changed
+            from flashcards.forecast import ForecastCache
+            app.forecastCache = ForecastCache()
+    elif key == '/':
+        openSearch(app)
+    elif key == 'up':
+        app.deckList.scrollBy(-1, len(app.decks))
+    elif key == 'down':
+        app.deckList.scrollBy(1, len(app.decks))
 
 def handleCreateDeckKeyPress(app, key):
     if app.selectedInput == 'deckName':
@@ -718,18 +828,17 @@ def handleCreateDeckKeyPress(app, key):
             app.deckNameInput = app.deckNameInput[:-1]
         elif key == 'enter': # create new deck
             if app.deckNameInput.strip() != '': # not empty name
-                newDeck = Deck(app.deckNameInput.strip())
-                app.decks.append(newDeck)
+                addDeck(app, app.deckNameInput.strip())
+                app.deckList.scrollTo(len(app.decks)-1, len(app.decks))
                 app.currScreen = 'menu'
+                requestSave(app)
         elif key == 'space':
             app.deckNameInput += ' '
         elif len(key) == 1:
             app.deckNameInput += key
-    
-    saveData(app)
 
 def handleStudyKeyPress(app, key):
-    if app.cardsDue == []:
+    if app.currCard == None:
         return
     
     if key == 'space' and not app.showAnswer:
@@ -766,98 +875,45 @@ def handleEditCardKeyPress(app, key):
             app.backInput += key
         elif key == 'enter':
             # reused code from mouse click
-            if app.frontInput.strip() != '' and app.backInput.strip() != '':
+            if (app.frontInput.strip() != '' and app.backInput.strip() != '' and
+                not isNewDuplicate(app, app.frontInput, app.editingCard)):
                 if app.editingCard != None:
-                    app.editingCard.front = app.frontInput.strip()
-                    app.editingCard.back = app.backInput.strip()
+                    editCardText(app, app.currDeck, app.editingCard,
+                                 app.frontInput.strip(), app.backInput.strip())
                 elif app.editingCard == None:
-                    newCard = Flashcard(app.frontInput.strip(), app.backInput.strip())
-                    app.currDeck.addCard(newCard)
+                    newCard = addNewCard(app, app.currDeck,
+                                         app.frontInput.strip(), app.backInput.strip())
                     app.cardsDue.append(newCard)
+                requestSave(app)
                     
                 app.frontInput = ''
                 app.backInput = ''
                 app.editingCard = None
                 app.selectedInput = 'front'
-    
-    saveData(app)
-
-### Refiling helpers ###
-
-def rateCard(app, rating):
-    app.currCard.updateCard(rating)
-    app.cardsDue.remove(app.currCard) #rated
-    
-    # check if short interval and re-add to end if its short instead of leaving removed
-    if app.currCard.isLearning and app.currCard.interval <= 10:
-        app.cardsDue.append(app.currCard)
+                if app.editingFromSearch:
+                    backToSearch(app)
 
-    # refresh queue (move onto next card)    
-    if len(app.cardsDue) > 0:
-        app.currCard = app.cardsDue[0]
-        app.showAnswer = False
-    else: # we are DONE!
-        app.currCard = None
-    
-    saveData(app)
-
-def previewIntervalsIfRated(card):
-    intervals = {'again': '<1m'}
-    
-    if card.isLearning == True:
-        intervals['hard'] = '<6m' if card.learningStep == 0 else '<10m'
-        intervals['good'] = '<10m' if card.learningStep == 0 else '1d'
-        intervals['easy'] = '4d'
-    else:
-        currInterval = card.interval
-        
-        hardInterval = currInterval * 1.2
-        intervals['hard'] = makeNiceLooking(hardInterval)
-        
-        goodInterval = currInterval * card.easeFactor
-        intervals['good'] = makeNiceLooking(goodInterval)
-        
-        easyInterval = currInterval * (card.easeFactor * 1.3)
-        intervals['easy'] = makeNiceLooking(easyInterval)
-        
-    return intervals
-
-def makeNiceLooking(mins):
-    if mins < 60:
-        return f'{int(mins)}m'
-    elif mins < 60*24:
-        hrs = mins//60
-        return f'{hrs}h'
+def handleSearchKeyPress(app, key):
+    if key == 'escape':
+        app.currScreen = 'menu'
+        return
+    elif key == 'enter': # open the top result
+        if len(app.searchResults) > 0:
+            openSearchResult(app, 0)
+        return
+    elif key == 'backspace':
+        app.searchInput = app.searchInput[:-1]
+    elif key == 'space':
+        app.searchInput += ' '
+    elif len(key) == 1:
+        app.searchInput += key
     else:
-        days = mins // (24*60)
-        return f'{days}d'
-
-### Grading Helpers ###
-
-def skipTime(app, hrs):
-    for deck in app.decks:
-        for card in deck.cards:
-            if card.lastReviewTime != None:
-                card.lastReviewTime -= hrs*60*60 # conv to seconds
-    
-    saveData(app)
-
-def createSampleDeck(app):
-    sample = Deck('Example: Python Basics', 'purple')
-    sample.addCard(Flashcard('What word defines a function?', 'def'))
-    sample.addCard(Flashcard('What does len(L) return?', 'length of L'))
-    sample.addCard(Flashcard('Types of loops', 'for and while'))
-    sample.addCard(Flashcard('Can all recursive functions be rewritten iteratively?', 'Yes'))
-    sample.addCard(Flashcard('What is the big-O runtime for len()?', 'O(1)'))
-    sample.addCard(Flashcard('Immutable types', 'int, float, str, tuple'))
-    sample.addCard(Flashcard('Mutable types', 'list, dict, set'))
-    sample.addCard(Flashcard('+ vs += for lists', 'nonmutating vs mutating'))
-    sample.addCard(Flashcard('How do sets search in O(1)?', 'using hashtables'))
-    sample.addCard(Flashcard('What does __init__ do in a class?', 'sets base attributes'))
-    app.decks.append(sample)
-    saveData(app)
+        return
+    updateSearchResults(app)
 
 def main():
     runApp()
 
-main()
+# only start the app when run directly
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+# the tests import flashcards from the project folder, like the benchmarks
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+# binary snapshots (storageMode = 'binary') have to load back exactly what
+# the JSON file does, with either deck backend, and refuse broken files
+import importlib.util, os, random
+import pytest
+from flashcards import settings, Flashcard, Collection, loadData, saveData, cardToDict, binstore
+from flashcards.storage import writeSnapshot
+
+backends = ['objects', 'numpy'] if importlib.util.find_spec('numpy') != None else ['objects']
+
+def collectionData(numCards, numDecks):
+    rng = random.Random(112)
+    data = {"journalSegment": 0, "cards.lastCardId": 0,
+            "decks": [{"name": f"Deck {d}", "color": "lightBlue", "cards": []}
+                      for d in range(numDecks)]}
+    for i in range(numCards):
+        card = Flashcard(f"Question {i}?", rng.choice(["Yes", "No", f"Answer {i}"]))
+        for r in range(0 if rng.random() < 0.3 else rng.randint(1, 8)):
+            card.updateCard(rng.choice([1, 2, 3, 3, 3, 4]))
+        if card.lastReviewTime != None:
+            card.lastReviewTime = 1.7e9 - rng.random() * card.interval * 60 * 2
+        data["decks"][i % numDecks]["cards"].append(cardToDict(card))
+    data["cards.lastCardId"] = card.id
+    # odd text, a stamp with more digits than a float keeps, an empty deck
+    data["decks"][0]["cards"][0]["front"] = 'tricky "quotes" \\ é中 \U0001f600 \n new line'
+    data["decks"][0]["cards"][1]["back"] = ''
+    data["decks"][0]["cards"][2]["lastReviewTime"] = 1712345678.123456789
+    data["decks"].append({"name": "empty ✓", "color": "pink", "cards": []})
+    return data
+
+def decksOf(collection):
+    return [(deck.name, deck.color, [cardToDict(card) for card in deck.cards])
+            for deck in collection.decks]
+
+def load():
+    collection = Collection()
+    loadData(collection)
+    return collection
+
+@pytest.fixture
+def dataDir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'dataDir', str(tmp_path))
+    monkeypatch.setattr(settings, 'storageMode', 'json')
+    monkeypatch.setattr(settings, 'deckBackend', 'objects')
+    return tmp_path
+
+@pytest.mark.parametrize('writeBackend', backends)
+@pytest.mark.parametrize('readBackend', backends)
+def test_round_trip(dataDir, writeBackend, readBackend):
+    settings.deckBackend = writeBackend
+    writeSnapshot(collectionData(500, 2), settings.getDataPath())
+    fromJson = load()
+    expected = decksOf(fromJson)
+    assert len(expected[0][2]) == 250 and expected[-1][2] == []
+
+    # the first binary save converts the JSON file, later loads use it
+    settings.storageMode = 'binary'
+    saveData(fromJson)
+    os.remove(settings.getDataPath())
+    settings.deckBackend = readBackend
+    fromBinary = load()
+    assert decksOf(fromBinary) == expected
+
+    # and back: binary -> JSON -> same again
+    settings.storageMode = 'json'
+    saveData(fromBinary)
+    assert decksOf(load()) == expected
+
+def breakHeader(original):
+    return original[:8] + (binstore.formatVersion + 1).to_bytes(4, 'little') + original[12:]
+
+@pytest.mark.parametrize('breakFile', [lambda original: original[:-3], # truncated
+                                       breakHeader, # newer version
+                                       lambda original: b'{"decks": []}' + original[13:]], # wrong magic
+                         ids=['truncated', 'newer version', 'not a snapshot'])
+def test_broken_file_refused(dataDir, breakFile):
+    writeSnapshot(collectionData(50, 2), settings.getDataPath())
+    settings.storageMode = 'binary'
+    saveData(load())
+    path = settings.getSiblingPath(settings.binaryFile)
+    with open(path, 'rb') as f:
+        original = f.read()
+    with open(path, 'wb') as f:
+        f.write(breakFile(original))
+    with pytest.raises(ValueError):
+        load()
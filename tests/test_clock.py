@@ -0,0 +1,197 @@
+# the scheduler clock (flashcards/clock.py): skipping it has to act like
+# moving every card back, and must not follow the cards into the next start
+import random, time
+import pytest
+from flashcards import settings, clock, Flashcard, makeDeck, skipTime, buildStudyQueue
+from flashcards import cardToDict, cardFromDict
+
+numDecks = 5
+
+@pytest.fixture(params=['objects', 'numpy'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    monkeypatch.setattr(settings, 'deckBackend', request.param)
+    yield request.param
+    clock.useClock(clock.Clock())
+
+@pytest.fixture
+def realTime(monkeypatch):
+    # a running clock whose real time the test moves by hand
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(clock.time, 'time', lambda: now[0])
+    clock.useClock(clock.Clock())
+    yield now
+    clock.useClock(clock.Clock())
+
+def makeDecks(numCards, now, seed=112):
+    rng = random.Random(seed)
+    decks = [makeDeck(f'Deck {d}') for d in range(numDecks)]
+    for i in range(numCards):
+        card = Flashcard(f'front {i}', 'back', i + 1)
+        kind = rng.random()
+        if kind < 0.6:
+            card.isLearning = kind < 0.1
+            card.learningStep = 1 if card.isLearning else 0
+            card.interval = 10 if card.isLearning else rng.choice([1440, 3600, 8640])
+            card.lastReviewTime = now - rng.uniform(0, 5) * 24*60*60
+        decks[i % numDecks].addCard(card)
+    return decks
+
+def skipByMutating(decks, hrs): # what skipTime used to do
+    for deck in decks:
+        for card in deck.cards:
+            if card.lastReviewTime != None:
+                card.lastReviewTime -= hrs*60*60
+        deck.rebuildIndex()
+
+def queueIds(decks):
+    ids = []
+    for deck in decks:
+        session = buildStudyQueue(None, deck) # app is only read in 'sqlite' mode
+        order = []
+        card = session.first()
+        while card != None:
+            order.append(card.id)
+            session.remove(card)
+            card = session.first()
+        ids.append(order)
+    return ids
+
+def test_skip_matches_moving_every_card(backend, monkeypatch):
+    monkeypatch.setattr(settings, 'debugMode', True) # recount every getStats
+    now = time.time()
+    skipped = makeDecks(2000, now)
+    mutated = makeDecks(2000, now)
+    skippedClock = clock.Clock(frozenTime=now)
+    unskippedClock = clock.Clock(frozenTime=now)
+    clock.useClock(skippedClock)
+    before = [deck.getStats() for deck in skipped]
+    for hrs in [1, 24, 24, 72]:
+        clock.useClock(skippedClock)
+        skipTime(None, hrs)
+        stats, queues = [deck.getStats() for deck in skipped], queueIds(skipped)
+        clock.useClock(unskippedClock)
+        skipByMutating(mutated, hrs)
+        assert [deck.getStats() for deck in mutated] == stats
+        assert queueIds(mutated) == queues
+    clock.useClock(clock.Clock(frozenTime=now)) # setting it back undoes it
+    assert [deck.getStats() for deck in skipped] == before
+
+def test_running_skip_matches_moving_every_card(backend, realTime):
+    # cards rated between skips (real time stamps) still line up with the
+    # old way, where they were stamped on the moved clock
+    skipped = makeDecks(500, realTime[0])
+    mutated = makeDecks(500, realTime[0])
+    skippedClock = clock.Clock()
+    unskippedClock = clock.Clock()
+    rng = random.Random(3)
+    for hrs in [24, 1, 72]:
+        clock.useClock(skippedClock)
+        skipTime(None, hrs)
+        for deck in skipped:
+            # skipByMutating's rebuildIndex puts the learning cards back in
+            # deck order; same here so cards due at once come out the same
+            deck.rebuildIndex()
+        clock.useClock(unskippedClock)
+        skipByMutating(mutated, hrs)
+        realTime[0] += 600
+        for d in range(numDecks):
+            for i in rng.sample(range(len(skipped[d].cards)), 20):
+                rating = rng.randint(1, 4)
+                clock.useClock(skippedClock)
+                skipped[d].cards[i].updateCard(rating)
+                clock.useClock(unskippedClock)
+                mutated[d].cards[i].updateCard(rating)
+        clock.useClock(skippedClock)
+        stats, queues = [deck.getStats() for deck in skipped], queueIds(skipped)
+        clock.useClock(unskippedClock)
+        assert [deck.getStats() for deck in mutated] == stats
+        assert queueIds(mutated) == queues
+
+def test_skip_is_not_saved(backend, realTime):
+    deck = makeDeck('Deck')
+    learning = deck.addCard(Flashcard('front', 'back'))
+    review = deck.addCard(Flashcard('front', 'back'))
+    review.isLearning = False
+    review.interval = 24*60
+    skipTime(None, 24)
+    realTime[0] += 1
+    learning.updateCard(3) # next step in 10 minutes
+    review.updateCard(3) # back in 2.5 days
+    ratedAt = realTime[0]
+    assert not learning.isDue()
+    realTime[0] += 10*60
+    assert learning.isDue() and not review.isDue()
+
+    # the next start is back on the real clock, the cards come back the
+    # same real time after they were rated instead of a day later
+    clock.useClock(clock.Clock())
+    restored = makeDeck('Deck')
+    for card in [learning, review]:
+        restored.addCard(cardFromDict(cardToDict(card)))
+    restoredLearning, restoredReview = restored.cards
+    assert restoredLearning.lastReviewTime == ratedAt
+    assert restoredLearning.isDue()
+    assert restoredReview.getDueTime() == ratedAt + restoredReview.interval*60
+
+def test_frozen_skip_is_not_saved(backend, realTime):
+    # skipping a stopped clock goes through the offset too, so a card rated
+    # then is stamped with the real time it stopped at, not a day later
+    deck = makeDeck('Deck')
+    card = deck.addCard(Flashcard('front', 'back'))
+    clock.freeze()
+    frozenAt = clock.realNow()
+    skipTime(None, 24)
+    assert clock.now() - frozenAt == pytest.approx(24*60*60)
+    card.updateCard(3) # next step in 10 minutes
+    ratedAt = card.lastReviewTime
+    assert ratedAt - frozenAt < 1e-3
+    assert card.getDueTime() == ratedAt + 10*60 + 24*60*60
+    assert not card.isDue()
+    clock.unfreeze() # the skip stays
+    realTime[0] += 10*60 + 1
+    assert card.isDue()
+
+    # the next start is back on the real clock, and so is the card
+    clock.useClock(clock.Clock())
+    restored = makeDeck('Deck').addCard(cardFromDict(cardToDict(card)))
+    assert restored.lastReviewTime == ratedAt
+    assert restored.getDueTime() == ratedAt + 10*60
+
+def test_sqlite_queue_after_skip(realTime, tmp_path, monkeypatch):
+    from flashcards import Collection, loadData, addDeck, addNewCard, StudySession
+    from flashcards.study import rateCard
+    monkeypatch.setattr(settings, 'dataDir', str(tmp_path))
+    monkeypatch.setattr(settings, 'storageMode', 'sqlite')
+    monkeypatch.setattr(settings, 'deckBackend', 'objects')
+    app = Collection()
+    loadData(app)
+    deck = addDeck(app, 'Deck')
+    rng = random.Random(7)
+    for i in range(200):
+        addNewCard(app, deck, f'front {i}', 'back')
+    for hrs in [0, 24, 2, 48]:
+        skipTime(app, hrs)
+        realTime[0] += 60
+        for card in rng.sample(deck.cards, 40):
+            app.currDeck, app.currCard, app.cardsDue = deck, card, StudySession()
+            for i in range(rng.randint(1, 4)):
+                rateCard(app, rng.choice([3, 3, 4]))
+                app.currCard = card
+    for hrs in [24, 24, 72]:
+        skipTime(app, hrs)
+        now = clock.now()
+        queue = app.store.getStudyQueue(deck, now)
+        due = queue[:len(deck.getDueCards(now))]
+        assert set(due) == set(deck.getDueCards(now)) and due != []
+        assert [card.getDueTime() for card in due] == sorted(card.getDueTime() for card in due)
+        # reviews coming due later, from the cardsByDue index
+        for until in [now + 20*60, now + 3*24*60*60]:
+            upcoming, laterTime = app.store.getUpcomingCards(deck, now, until, now)
+            expected = [card for card in deck.getReviewCards() if now < card.getDueTime() <= until]
+            later = [card.getDueTime() for card in deck.getReviewCards() if card.getDueTime() > until]
+            assert set(upcoming) == set(expected) and len(upcoming) == len(expected)
+            assert [card.getDueTime() for card in upcoming] == sorted(card.getDueTime() for card in upcoming)
+            assert laterTime == (min(later) if later != [] else None)
+    app.store.connection.close()
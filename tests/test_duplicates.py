@@ -0,0 +1,164 @@
+# duplicate checks: the exact index (flashcards/duplicates.py) has to find
+# the cards with the same normalized front, stay right through the
+# collection helpers, and warn only once on Add; the minhash near-duplicate
+# search (flashcards/minhash.py) has to report only pairs that really are
+# that similar and find nearly all of them
+import random
+import pytest
+from flashcards import Collection, makeDeck, Flashcard
+from flashcards import addDeck, deleteDeck, addNewCard, editCardText, deleteCard
+from flashcards.duplicates import normalizeText, buildDuplicateIndex, isNewDuplicate
+
+numDecks = 4
+words = ('set list dict tuple loop while for def class return value key index slice '
+         'string integer float mutable immutable function method object hash table '
+         'recursion base case stack queue heap sort search binary linear time space '
+         'what does how why when which is are the a of in do').split()
+
+def makeText(rng, low, high):
+    return ' '.join(rng.choice(words) for i in range(rng.randint(low, high)))
+
+def makeVariant(text, rng):
+    # the same card typed again, a little differently
+    kind = rng.randrange(4)
+    if kind == 0:
+        return text.upper() + '?'
+    elif kind == 1:
+        return text.replace(' ', '  ') + '.'
+    parts = text.split(' ')
+    if kind == 2:
+        parts[rng.randrange(len(parts))] = rng.choice(words)
+    else:
+        parts.insert(rng.randrange(len(parts) + 1), rng.choice(words))
+    return ' '.join(parts)
+
+def makeCollection(numCards, duplicateShare=0.3, seed=112):
+    rng = random.Random(seed)
+    collection = Collection()
+    collection.decks = [makeDeck(f'Deck {d}') for d in range(numDecks)]
+    for i in range(numCards):
+        deck = collection.decks[i % numDecks]
+        if rng.random() < duplicateShare and len(deck.cards) > 0:
+            original = deck.cards[rng.randrange(len(deck.cards))]
+            front = makeVariant(original.front, rng)
+            back = original.back if rng.random() < 0.7 else makeVariant(original.back, rng)
+        else:
+            front = makeText(rng, 6, 12).capitalize() + '?'
+            back = makeText(rng, 2, 6)
+        deck.addCard(Flashcard(front, back))
+    return collection
+
+def indexContents(index): # hash -> set of card ids
+    return {key: {card.id for card in (entry if isinstance(entry, list) else [entry])}
+            for key, entry in index.byHash.items()}
+
+def checkExactQueries(collection, rng):
+    byFront = {}
+    for deck in collection.decks:
+        for card in deck.cards:
+            byFront.setdefault(normalizeText(card.front), set()).add(card.id)
+    allCards = [card for deck in collection.decks for card in deck.cards]
+    queries = [makeVariant(rng.choice(allCards).front, rng) for i in range(100)]
+    queries += [rng.choice(allCards).front for i in range(100)] + ['', '???', 'nothing like it']
+    for query in queries:
+        found = {card.id for card in collection.duplicateIndex.findDuplicates(query)}
+        assert found == byFront.get(normalizeText(query), set()), query
+    card = rng.choice(allCards) # the card being edited doesn't count
+    assert card not in collection.duplicateIndex.findDuplicates(card.front, card)
+
+def test_normalize_text():
+    assert normalizeText('What is a set?') == normalizeText('  what is a  SET ')
+    assert normalizeText('ｆｕｌｌ width') == 'full width' # NFKC
+    assert normalizeText('Straße') == normalizeText('STRASSE')
+    assert normalizeText('a - b') != normalizeText('a b') # only the ends lose punctuation
+
+def test_exact_matches_comparing_fronts():
+    rng = random.Random(5)
+    collection = makeCollection(1000)
+    collection.duplicateIndex = buildDuplicateIndex(collection.decks)
+    checkExactQueries(collection, rng)
+    for step in range(600):
+        deck = rng.choice(collection.decks)
+        kind = rng.random()
+        if kind < 0.35:
+            addNewCard(collection, deck, makeText(rng, 2, 5), 'back')
+        elif kind < 0.7 and len(deck.cards) > 0:
+            card = rng.choice(deck.cards)
+            front = rng.choice([makeText(rng, 2, 5), makeVariant(card.front, rng), card.front])
+            editCardText(collection, deck, card, front, card.back)
+        elif kind < 0.99 and len(deck.cards) > 0:
+            deleteCard(collection, deck, rng.choice(deck.cards))
+        elif kind < 0.995 and len(collection.decks) > 2:
+            deleteDeck(collection, deck)
+        else:
+            addNewCard(collection, addDeck(collection, f'New deck {step}'), 'front', 'back')
+    assert indexContents(collection.duplicateIndex) == indexContents(buildDuplicateIndex(collection.decks))
+    checkExactQueries(collection, rng)
+
+def test_is_new_duplicate():
+    # what the Add button does: warn once, go through when pressed again
+    collection = Collection()
+    deck = addDeck(collection, 'Deck')
+    card = addNewCard(collection, deck, 'What is a set?', 'unordered, no repeats')
+    assert not hasattr(collection, 'duplicateIndex') # made on the first check
+    assert isNewDuplicate(collection, '  what is a SET ')
+    assert collection.duplicateMatches == [card]
+    assert not isNewDuplicate(collection, 'what is a SET') # pressed again
+    assert collection.duplicateWarning == None
+    assert not isNewDuplicate(collection, 'What is a list?')
+
+    # the index follows the helpers once it exists
+    other = addNewCard(collection, deck, 'What is a list?', 'ordered')
+    assert isNewDuplicate(collection, 'what is a list')
+    assert collection.duplicateMatches == [other]
+    deleteCard(collection, deck, other)
+    assert not isNewDuplicate(collection, 'what is a list?!')
+
+    # editing: the card's own front doesn't count, another card's does
+    assert not isNewDuplicate(collection, 'What is a set?', card)
+    assert not isNewDuplicate(collection, 'what is a set', card)
+    third = addNewCard(collection, deck, 'What is a tuple?', 'immutable')
+    assert isNewDuplicate(collection, 'WHAT IS A SET', third)
+    assert collection.duplicateMatches == [card]
+
+def test_near_duplicates():
+    minhash = pytest.importorskip('flashcards.minhash') # needs numpy
+    findNearDuplicates, getShingles, getText, jaccard = (
+        minhash.findNearDuplicates, minhash.getShingles, minhash.getText, minhash.jaccard)
+    threshold = 0.8
+    collection = makeCollection(1200)
+    byDeck = findNearDuplicates(collection.decks, threshold, workers=1)
+    cluster = {} # card id -> cluster it's in
+    for deck, clusters in byDeck.items():
+        for cards in clusters:
+            assert len(cards) >= 2 and all(card.deck is deck for card in cards)
+            # every card is that similar to at least one other in its cluster
+            texts = [getShingles(getText(card.front, card.back)) for card in cards]
+            for i in range(len(cards)):
+                assert any(jaccard(texts[i], texts[j]) >= threshold
+                           for j in range(len(cards)) if j != i)
+                cluster[cards[i].id] = id(cards)
+
+    # against checking every pair in each deck
+    truePairs = []
+    for deck in collection.decks:
+        deckCards = deck.cards
+        shingles = [getShingles(getText(card.front, card.back)) for card in deckCards]
+        for i in range(len(deckCards)):
+            for j in range(i + 1, len(deckCards)):
+                if jaccard(shingles[i], shingles[j]) >= threshold:
+                    truePairs.append((deckCards[i].id, deckCards[j].id))
+    found = sum(cluster.get(a) != None and cluster.get(a) == cluster.get(b) for a, b in truePairs)
+    assert truePairs != [] and found / len(truePairs) > 0.95
+
+def test_near_duplicates_pool_agrees(monkeypatch):
+    minhash = pytest.importorskip('flashcards.minhash')
+    collection = makeCollection(1200)
+    alone = minhash.findNearDuplicates(collection.decks, workers=1)
+    # small jobs so a small collection goes through the pool
+    monkeypatch.setattr(minhash, 'chunkSize', 200)
+    monkeypatch.setattr(minhash, 'pairChunkSize', 100)
+    pooled = minhash.findNearDuplicates(collection.decks, workers=2)
+    asIds = lambda result: {deck.name: [[card.id for card in cards] for cards in clusters]
+                            for deck, clusters in result.items()}
+    assert asIds(alone) == asIds(pooled)
@@ -0,0 +1,102 @@
+# the review forecast (flashcards/forecast.py) has to count what going
+# through every card's due day by hand counts, per deck, with either deck
+# backend, and ForecastCache only redoes the decks that changed
+import random
+import pytest
+np = pytest.importorskip('numpy')
+from flashcards import settings, Flashcard, makeDeck
+from flashcards.forecast import forecastReviews, ForecastCache, getStartOfDay, secondsPerDay
+
+numDecks = 4
+now = 1.7e9
+
+def makeDecks(numCards, seed=112):
+    rng = random.Random(seed)
+    decks = [makeDeck(f'Deck {d}') for d in range(numDecks)]
+    for i in range(numCards):
+        card = Flashcard(f'front {i}', 'back', i + 1)
+        kind = rng.random()
+        if kind < 0.6: # the rest stay new
+            card.isLearning = kind < 0.1
+            card.learningStep = 1 if card.isLearning else 0
+            card.interval = 10 if card.isLearning else rng.choice([1440, 3600, 8640, 20000, 60000])
+            card.easeFactor = rng.choice([1.3, 2.1, 2.5, 2.8])
+            card.lastReviewTime = now - rng.uniform(0, 30) * secondsPerDay
+        decks[i % numDecks].addCard(card)
+    return decks
+
+def countByHand(decks, days):
+    start = getStartOfDay(now)
+    counts = [[0] * days for deck in decks]
+    for d in range(len(decks)):
+        for card in decks[d].cards:
+            if card.lastReviewTime != None:
+                day = max(int((card.getDueTime() - start) // secondsPerDay), 0)
+                if day < days:
+                    counts[d][day] += 1
+    return counts
+
+def projectByHand(decks, days):
+    # every card rated Good on its due day until it's past the window
+    start = getStartOfDay(now)
+    end = start + days * secondsPerDay
+    total = [0] * days
+    for deck in decks:
+        for deckCard in deck.cards:
+            if deckCard.lastReviewTime == None:
+                continue
+            card = Flashcard('', '') # a copy, so the deck itself isn't touched
+            card.isLearning, card.learningStep = deckCard.isLearning, deckCard.learningStep
+            card.easeFactor, card.interval = deckCard.easeFactor, deckCard.interval
+            dueTime = deckCard.getDueTime()
+            while dueTime < end:
+                total[max(int((dueTime - start) // secondsPerDay), 0)] += 1
+                card.updateCard(3)
+                dueTime = max(dueTime, now) + card.interval * 60
+    return total
+
+@pytest.fixture(params=['objects', 'numpy'])
+def backend(request, monkeypatch):
+    monkeypatch.setattr(settings, 'deckBackend', request.param)
+    return request.param
+
+def test_per_deck_matches_by_hand(backend):
+    decks = makeDecks(2000)
+    forecast = forecastReviews(decks, 60, now)
+    assert forecast["perDeck"].tolist() == countByHand(decks, 60)
+    assert forecast["total"].tolist() == np.sum(countByHand(decks, 60), axis=0).tolist()
+
+def test_projection_matches_by_hand(backend):
+    decks = makeDecks(2000)
+    projected = forecastReviews(decks, 120, now, ratingMix={3: 1.0})
+    assert projected["total"].tolist() == projectByHand(decks, 120)
+
+def test_backends_agree(monkeypatch):
+    monkeypatch.setattr(settings, 'deckBackend', 'objects')
+    objectDecks = makeDecks(2000)
+    monkeypatch.setattr(settings, 'deckBackend', 'numpy')
+    tableDecks = makeDecks(2000)
+    assert (forecastReviews(objectDecks, 60, now)["perDeck"].tolist() ==
+            forecastReviews(tableDecks, 60, now)["perDeck"].tolist())
+    # one rating each, so the draws can't land on cards in another order
+    for mix in [{2: 1.0}, {3: 1.0}, {4: 1.0}]:
+        assert (forecastReviews(objectDecks, 90, now, ratingMix=mix)["perDeck"].tolist() ==
+                forecastReviews(tableDecks, 90, now, ratingMix=mix)["perDeck"].tolist())
+
+def test_cache_redoes_only_changed_decks(backend):
+    decks = makeDecks(2000)
+    cache = ForecastCache()
+    forecast = cache.getForecast(decks, 30, now)
+    assert cache.getForecast(decks, 30, now) is forecast # nothing changed
+    schedules = {deck: cache.schedules[deck] for deck in decks}
+
+    card = decks[0].addCard(Flashcard('one more', 'card'))
+    card.updateCard(3)
+    card.lastReviewTime = now
+    decks[0].updateIndex(card)
+    changed = cache.getForecast(decks, 30, now)
+    assert changed is not forecast
+    assert cache.schedules[decks[0]] is not schedules[decks[0]]
+    assert all(cache.schedules[deck] is schedules[deck] for deck in decks[1:])
+    assert changed["perDeck"].tolist() == countByHand(decks, 30)
+    assert changed["perDeck"][0].sum() == forecast["perDeck"][0].sum() + 1
@@ -0,0 +1,32 @@
+# `import flashcards` has to stay cheap enough for scripts and services:
+# under the time budget, and without pulling in the GUI or optional backends
+import os, subprocess, sys
+
+projectDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+budgetMs = 100
+runs = 5 # best of, to smooth out a cold disk cache
+notAllowed = ['cmu_graphics', 'numpy', 'sqlite3']
+
+def measureImport():
+    # returns (cumulative microseconds for flashcards, names of imported modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import flashcards'],
+                            cwd=projectDir, capture_output=True, text=True, check=True)
+    total = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        selfTime, cumulative, name = line[len('import time:'):].split('|')
+        imported.add(name.strip())
+        if name.strip() == 'flashcards':
+            total = int(cumulative)
+    return total, imported
+
+def test_no_heavy_imports():
+    total, imported = measureImport()
+    for name in notAllowed:
+        assert not any(module == name or module.startswith(name + '.') for module in imported), name
+
+def test_under_budget():
+    best = min(measureImport()[0] for i in range(runs))
+    assert best <= budgetMs * 1000, f'import flashcards took {best/1000:.1f}ms'
@@ -0,0 +1,70 @@
+# replaying the review log (flashcards/replay.py) has to give exactly what
+# rating the cards one by one with Flashcard.updateCard gave
+import random
+import pytest
+np = pytest.importorskip('numpy')
+from flashcards import Flashcard, ReviewLog, getReviewState, cards as cardsModule
+from flashcards.replay import readReviewLog, replayReviews, updateCards
+
+def test_replay_matches_updateCard(tmp_path):
+    rng = random.Random(112)
+    logPath = str(tmp_path / 'reviews.bin')
+    log = ReviewLog(logPath)
+    cards = []
+    for i in range(1000):
+        card = Flashcard(f'front {i}', 'back')
+        if rng.random() < 0.2: # some cards already had history before logging
+            card.isLearning = False
+            card.easeFactor = rng.choice([1.3, 2.05, 2.5, 3.1])
+            card.interval = rng.uniform(1440, 100000)
+            card.lastReviewTime = 1.7e9
+        cards.append(card)
+
+    now = 1.7e9
+    for r in range(20):
+        for card in cards:
+            if rng.random() < 0.1: # not every card gets rated every round
+                continue
+            now += rng.random()
+            rating = rng.choice([1, 2, 3, 3, 3, 4])
+            before = getReviewState(card)
+            card.updateCard(rating)
+            card.lastReviewTime = now # updateCard uses the real clock
+            log.record(card, rating, before)
+    log.flush()
+
+    states = replayReviews(readReviewLog(logPath))
+    assert len(states) > 0
+    for card in cards:
+        if card.id in states:
+            assert states[card.id] == getReviewState(card), card.id
+
+def test_updateCards_with_other_params():
+    # the way simulate.py uses it
+    rng = random.Random(112)
+    defaults = dict(cardsModule.schedulerParams)
+    for trial in range(20):
+        params = {"startEase": rng.uniform(1.5, 3.5), "minEase": rng.uniform(1.1, 1.5),
+                  "maxEase": rng.uniform(3, 5), "againPenalty": rng.uniform(0, 0.4),
+                  "hardPenalty": rng.uniform(0, 0.3), "easyEaseBonus": rng.uniform(0, 0.3),
+                  "hardMultiplier": rng.uniform(1, 1.5), "easyBonus": rng.uniform(1, 1.6)}
+        cardsModule.schedulerParams.update(params)
+        try:
+            cards = [Flashcard('f', 'b') for i in range(500)]
+            for card in cards:
+                for r in range(rng.randint(0, 6)):
+                    card.updateCard(rng.choice([1, 2, 3, 4]))
+            ratings = np.array([rng.choice([1, 2, 3, 4]) for card in cards])
+            before = [getReviewState(card) for card in cards]
+            got = updateCards(np.array([card.isLearning for card in cards]),
+                              np.array([card.learningStep for card in cards]),
+                              np.array([card.easeFactor for card in cards]),
+                              np.array([float(card.interval) for card in cards]),
+                              ratings, params)
+            for i, card in enumerate(cards):
+                card.updateCard(int(ratings[i]))
+                expected = (card.isLearning, card.learningStep, card.easeFactor, card.interval)
+                actual = (bool(got[0][i]), int(got[1][i]), float(got[2][i]), float(got[3][i]))
+                assert actual == expected, (params, before[i], ratings[i])
+        finally:
+            cardsModule.schedulerParams.update(defaults)
@@ -0,0 +1,134 @@
+# the search index (flashcards/search.py) has to find what going through
+# every card by hand finds (every query word is a prefix of some word on the
+# card), stay that way through the collection helpers' adds, edits and
+# deletes, and only be read back from disk while the data files are unchanged
+import random
+import pytest
+from flashcards import settings, Collection, makeDeck, Flashcard
+from flashcards import addDeck, deleteDeck, addNewCard, editCardText, deleteCard
+from flashcards import search
+from flashcards.search import buildIndex, loadIndex, tokenize, openIndex, saveIndex
+
+numDecks = 5
+
+def makeWords(count, rng):
+    # made-up words from syllables, so prefixes are shared like in real text
+    syllables = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'po', 'de', 'fa', 'gu', 'he',
+                 'ja', 'vo', 'zi', 'bre', 'str', 'ion', 'al', 'en', 'or', 'ux']
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(syllables) for i in range(rng.randint(1, 4))))
+    return sorted(words)
+
+def makeText(words, rng, low, high):
+    return ' '.join(rng.choice(words) for i in range(rng.randint(low, high)))
+
+def makeCollection(numCards, words, rng):
+    collection = Collection()
+    collection.decks = [makeDeck(f'Deck {d}') for d in range(numDecks)]
+    for i in range(numCards):
+        card = Flashcard(makeText(words, rng, 3, 8).capitalize() + '?', makeText(words, rng, 1, 4))
+        collection.decks[i % numDecks].addCard(card)
+    return collection
+
+def searchByHand(decks, query):
+    terms = set(tokenize(query))
+    found = set()
+    for deck in decks:
+        for card in deck.cards:
+            tokens = set(tokenize(card.front + ' ' + card.back))
+            if len(terms) > 0 and all(any(token.startswith(term) for token in tokens)
+                                      for term in terms):
+                found.add(card.id)
+    return found
+
+def sameIndex(a, b):
+    return (a.vocab == b.vocab and a.postings == b.postings and
+            a.cardDecks.keys() == b.cardDecks.keys() and
+            all(a.cardDecks[cardId] is b.cardDecks[cardId] for cardId in a.cardDecks))
+
+def checkQueries(collection, words, rng):
+    queries = ['', '   ', '?!', 'zzzz'] + [rng.choice(words)[:rng.randint(1, 4)] for i in range(40)]
+    queries += [f'{rng.choice(words)[:2]} {rng.choice(words)[:3]}' for i in range(20)]
+    queries += [rng.choice(words).upper() for i in range(5)]
+    index = collection.searchIndex
+    for query in queries:
+        matches, complete = index.search(query, limit=len(index) + 1)
+        assert complete, query
+        assert {card.id for deck, card in matches} == searchByHand(collection.decks, query), query
+        assert len(matches) == len({card.id for deck, card in matches}), query # no card twice
+        assert all(deck.getCard(card.id) is card for deck, card in matches), query
+        # a small limit gives the first matches of the full list
+        few, fewComplete = index.search(query, limit=3)
+        assert [card.id for deck, card in few] == [card.id for deck, card in matches[:3]], query
+        assert fewComplete == (len(matches) <= 3), query
+
+def editRandomly(collection, words, rng, steps):
+    for step in range(steps):
+        deck = rng.choice(collection.decks)
+        kind = rng.random()
+        if kind < 0.35:
+            addNewCard(collection, deck, makeText(words, rng, 3, 8), makeText(words, rng, 1, 4))
+        elif kind < 0.7 and len(deck.cards) > 0:
+            card = rng.choice(deck.cards)
+            editCardText(collection, deck, card, makeText(words, rng, 1, 6), card.back)
+        elif kind < 0.99 and len(deck.cards) > 0:
+            deleteCard(collection, deck, rng.choice(deck.cards))
+        elif kind < 0.995 and len(collection.decks) > 2:
+            deleteDeck(collection, deck)
+        else:
+            newDeck = addDeck(collection, f'New deck {step}')
+            addNewCard(collection, newDeck, 'front ' + rng.choice(words), 'back')
+
+@pytest.fixture(params=['objects', 'numpy'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    monkeypatch.setattr(settings, 'deckBackend', request.param)
+    monkeypatch.setattr(search, 'maxChecks', 10**9) # compare whole result lists
+    return request.param
+
+# once checking the other words by card id, once on the cards' text
+@pytest.mark.parametrize('maxSetSize', [search.maxSetSize, 0])
+def test_matches_full_scan(backend, maxSetSize, monkeypatch):
+    monkeypatch.setattr(search, 'maxSetSize', maxSetSize)
+    rng = random.Random(5)
+    words = makeWords(400, rng)
+    collection = makeCollection(1000, words, rng)
+    collection.searchIndex = buildIndex(collection.decks)
+    checkQueries(collection, words, rng)
+    editRandomly(collection, words, rng, 600)
+    assert sameIndex(collection.searchIndex, buildIndex(collection.decks))
+    checkQueries(collection, words, rng)
+
+def test_saved_index_reads_back(backend, tmp_path):
+    rng = random.Random(5)
+    collection = makeCollection(500, makeWords(200, rng), rng)
+    index = buildIndex(collection.decks)
+    path = str(tmp_path / 'search.idx')
+    stamp = ['json', ['flashcard_data.json', 123, 456]]
+    index.save(path, stamp)
+    assert sameIndex(loadIndex(path, collection.decks, stamp), index)
+    assert loadIndex(path, collection.decks, ['json', ['flashcard_data.json', 124, 456]]) == None
+    assert loadIndex(path + '.missing', collection.decks, stamp) == None
+
+def test_stale_index_is_rebuilt(tmp_path, monkeypatch):
+    # openIndex compares the data stamp: saving the data has to change it,
+    # and then the saved index isn't used
+    monkeypatch.setattr(settings, 'dataDir', str(tmp_path))
+    monkeypatch.setattr(settings, 'storageMode', 'json')
+    rng = random.Random(5)
+    collection = makeCollection(100, makeWords(100, rng), rng)
+    with open(settings.getDataPath(), 'w') as f:
+        f.write('{"decks": []}')
+    saveIndex(buildIndex(collection.decks))
+    loaded = []
+    monkeypatch.setattr(search, 'buildIndex', lambda decks: loaded.append('rebuilt'))
+    assert openIndex(collection.decks) != None and loaded == [] # still good
+
+    before = search.getDataStamp()
+    with open(settings.getDataPath(), 'w') as f:
+        f.write('{"decks": [], "cards.lastCardId": 0}')
+    assert search.getDataStamp() != before
+    openIndex(collection.decks)
+    assert loaded == ['rebuilt']
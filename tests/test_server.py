@@ -0,0 +1,45 @@
+# the review server (flashcards/server.py), called the way a connection does
+# it, without the sockets: bad ids and ratings get 400, and only the card up
+# for study can be rated
+import asyncio, json
+import pytest
+from flashcards.server import ReviewServer
+
+def request(server, method, target, data=None):
+    body = b'' if data == None else json.dumps(data).encode('utf-8')
+    return asyncio.run(server.handleRequest(method, target, body))
+
+@pytest.fixture
+def server(tmp_path):
+    server = ReviewServer(str(tmp_path / 'users'))
+    assert request(server, 'POST', '/users/ana/decks', {"name": "Deck"}) == (200, {"deck": 0})
+    for front in ['What is a set?', 'What is a list?']:
+        status, result = request(server, 'POST', '/users/ana/decks/0/cards',
+                                 {"front": front, "back": "a collection"})
+        assert status == 200
+    return server
+
+@pytest.mark.parametrize('cardId', [True, False, None, '1', 1.0, [1]])
+def test_bad_card_id(server, cardId):
+    status, result = request(server, 'POST', '/users/ana/decks/0/rate',
+                             {"card": cardId, "rating": 3})
+    assert status == 400 and 'card' in result["error"]
+
+@pytest.mark.parametrize('rating', [0, 5, True, 3.0, '3', None])
+def test_bad_rating(server, rating):
+    status, first = request(server, 'GET', '/users/ana/decks/0/next')
+    status, result = request(server, 'POST', '/users/ana/decks/0/rate',
+                             {"card": first["card"]["id"], "rating": rating})
+    assert status == 400
+
+def test_rate_next_card(server):
+    status, first = request(server, 'GET', '/users/ana/decks/0/next')
+    assert status == 200 and first["left"] == 2
+    cardId = first["card"]["id"]
+    status, result = request(server, 'POST', '/users/ana/decks/0/rate', {"card": cardId + 1, "rating": 3})
+    assert status == 409 # not the one /next shows
+    status, result = request(server, 'POST', '/users/ana/decks/0/rate', {"card": 10**9, "rating": 3})
+    assert status == 404
+    status, result = request(server, 'POST', '/users/ana/decks/0/rate', {"card": cardId, "rating": 3})
+    assert status == 200 and result["card"]["id"] == cardId
+    assert result["next"]["id"] == cardId + 1
@@ -0,0 +1,183 @@
+# StudySession (flashcards/session.py) played on a fake clock, where every
+# answer takes a few seconds: after every rating it has to pick the same card
+# as a brute-force scan over every card would (learning cards as soon as
+# their step runs out, then due reviews by due time, then new cards in
+# order, and learning ahead when nothing is ready), honor the 1m/10m steps
+# exactly, and pick up reviews falling due mid-session
+import random
+import pytest
+from flashcards import settings, clock, Flashcard, StudySession, makeDeck
+from flashcards import session as sessionModule
+
+def rateAt(card, rating, now):
+    # updateCard stamps the real clock; put the fake one in instead
+    card.updateCard(rating)
+    card.lastReviewTime = now
+
+def bruteForcePick(queued, now):
+    # queued: card -> order it was (re)added in; same rules, no heaps
+    best = None
+    for card, order in queued.items():
+        showTime = card.getDueTime()
+        if showTime == None:
+            key = (0, sessionModule.newGroup, 0, order)
+        elif showTime <= now:
+            group = sessionModule.learningGroup if card.isLearning else sessionModule.reviewGroup
+            key = (0, group, showTime, order)
+        else:
+            key = (1, showTime, order)
+        if best == None or key < best[0]:
+            best = (key, card)
+    if best == None:
+        return None
+    key, card = best
+    if key[0] == 1 and key[1] - now > sessionModule.learnAheadSecs:
+        return None
+    return card
+
+def makeCards(numCards, rng, now):
+    cards = []
+    for i in range(numCards):
+        card = Flashcard(f'front {i}', 'back')
+        kind = rng.random()
+        if kind < 0.3: # reviews, some due, some due during the session
+            card.isLearning = False
+            card.interval = 1440
+            card.lastReviewTime = now - 1440*60 + rng.uniform(-3600, 3600)
+        elif kind < 0.5: # in the middle of learning
+            card.learningStep = 1
+            card.interval = 10
+            card.lastReviewTime = now - rng.uniform(0, 1200)
+        cards.append(card)
+    return cards
+
+def test_matches_brute_force():
+    numCards, numRatings = 300, 3000
+    rng = random.Random(112)
+    now = 1.7e9
+    cards = makeCards(numCards, rng, now)
+    due = [card for card in cards if card.getDueTime() != None and card.getDueTime() <= now]
+    new = [card for card in cards if card.getDueTime() == None]
+    upcoming = [card for card in cards if card.getDueTime() != None and card.getDueTime() > now]
+    session = StudySession(due + new, upcoming, now)
+
+    queued = {}
+    order = 0
+    for card in due + new:
+        order += 1
+        queued[card] = order
+    for card in upcoming:
+        order += 1
+        queued[card] = order
+
+    for i in range(numRatings):
+        expected = bruteForcePick(queued, now)
+        got = session.first(now)
+        assert got is expected, f'step {i}: session gave {got and got.front}, expected {expected and expected.front}'
+        if got == None:
+            now += 60 # nothing to do, wait a minute
+            continue
+        rateAt(got, rng.choice([1, 2, 3, 3, 4]), now)
+        session.append(got, now)
+        order += 1
+        queued[got] = order
+        if rng.random() < 0.02: # card deleted mid-session
+            session.remove(got)
+            del queued[got]
+        now += rng.uniform(2, 15)
+
+def test_learning_steps():
+    # a card failed at t=0 comes back at exactly t=60, not before, even with
+    # new cards waiting, and a review due at t=300 joins by itself
+    now = 1.7e9
+    failed = Flashcard('failed', 'x')
+    review = Flashcard('review', 'x')
+    review.isLearning = False
+    review.interval = 5
+    review.lastReviewTime = now
+    news = [Flashcard(f'new {i}', 'x') for i in range(100)]
+    session = StudySession([failed] + news, [review], now)
+
+    assert session.first(now) is failed
+    rateAt(failed, 1, now)
+    session.append(failed, now)
+    shown = []
+    t = now
+    while t < now + 400:
+        card = session.first(t)
+        shown.append((t - now, card.front))
+        if card is failed:
+            assert t - now >= 60, 'learning card shown before its 1m step ran out'
+            rateAt(card, 3, t)
+        elif card is review:
+            assert t - now >= 300, 'review shown before it was due'
+            rateAt(card, 3, t)
+        if card in news: # pretend it graduated, keeps the session small
+            session.remove(card)
+        else:
+            session.append(card, t)
+        t += 7
+    failedAt = [at for at, front in shown if front == 'failed']
+    reviewAt = [at for at, front in shown if front == 'review']
+    assert failedAt[0] < 67 and reviewAt[0] < 307, (failedAt, reviewAt)
+
+@pytest.fixture(params=['objects', 'numpy'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    monkeypatch.setattr(settings, 'deckBackend', request.param)
+    yield request.param
+    clock.useClock(clock.Clock())
+
+def test_upcoming_cards(backend):
+    # getUpcomingCards hands the session only the reviews inside its window,
+    # the same ones (in due order) a scan over every review card finds
+    rng = random.Random(112)
+    now = 1.7e9
+    deck = makeDeck('Deck')
+    for card in makeCards(2000, rng, now):
+        deck.addCard(card)
+    deck.rebuildIndex() # lastReviewTime was set by hand
+    reviews = deck.getReviewCards()
+    deck.getDueCards(now)
+    for after, until in [(now, now + 20*60), (now - 3600, now + 600),
+                         (now + 600, now + 1800), (now, now + 7200)]:
+        upcoming, laterTime = deck.getUpcomingCards(after, until, now)
+        expected = sorted((card for card in reviews if after < card.getDueTime() <= until),
+                          key=lambda card: card.getDueTime())
+        later = [card.getDueTime() for card in reviews if card.getDueTime() > until]
+        assert [card.id for card in upcoming] == [card.id for card in expected]
+        assert laterTime == (min(later) if later != [] else None)
+
+def test_reviews_join_from_deck(backend):
+    # built like buildStudyQueue: the session starts with only the reviews
+    # close to the learn-ahead window and takes the rest from the deck as
+    # they come close, still picking what a scan over the whole deck would
+    rng = random.Random(7)
+    now = 1.7e9
+    deck = makeDeck('Deck')
+    for card in makeCards(300, rng, now):
+        deck.addCard(card)
+    deck.rebuildIndex()
+    cards = deck.getDueCards(now) + deck.getLearningCards() + deck.getNewCards()
+    session = StudySession(cards, now=now, getUpcoming=deck.getUpcomingCards)
+    window = [card for card in deck.getReviewCards()
+              if now < card.getDueTime() <= now + 2*sessionModule.learnAheadSecs]
+    assert len(session) == len(cards) + len(window) < len(deck.cards)
+
+    queued = {card: order for order, card in enumerate(deck.cards)}
+    order = len(queued)
+    for i in range(3000):
+        expected = bruteForcePick(queued, now)
+        got = session.first(now)
+        assert got is expected, f'step {i}: session gave {got and got.front}, expected {expected and expected.front}'
+        if got == None:
+            assert session.getNextShowTime() > now
+            now += 60
+            continue
+        rateAt(got, rng.choice([1, 2, 3, 3, 4]), now)
+        deck.updateIndex(got) # lastReviewTime changed after updateCard
+        session.append(got, now)
+        order += 1
+        queued[got] = order
+        now += rng.uniform(2, 15)
@@ -0,0 +1,41 @@
+# the study simulator (flashcards/simulate.py) on a small seeded run: the
+# same seed has to give the same numbers, through the process pool too, and
+# the results have to be in a believable range
+import pytest
+np = pytest.importorskip('numpy')
+from flashcards.simulate import simulateBatch, runSweep, summarize, makeParamSets
+
+grid = {"startEase": [2.1, 2.9]}
+
+def test_same_seed_same_results():
+    params = makeParamSets(grid)[0]
+    first = simulateBatch(params, 5, 100, 40, seed=3)
+    second = simulateBatch(params, 5, 100, 40, seed=3)
+    assert first["dailyReviews"].tolist() == second["dailyReviews"].tolist()
+    assert {key: value for key, value in first.items() if key != "dailyReviews"} == \
+           {key: value for key, value in second.items() if key != "dailyReviews"}
+    other = simulateBatch(params, 5, 100, 40, seed=4)
+    assert other["dailyReviews"].tolist() != first["dailyReviews"].tolist()
+
+def test_sweep_matches_one_batch():
+    # the pool splits learners into batches seeded seed+b; one batch of all
+    # of them with the same seed is the same run
+    paramSets = makeParamSets(grid)
+    results = runSweep(paramSets, numLearners=6, numCards=80, numDays=30, workers=2,
+                       batchSize=6, seed=11)
+    for params, result in zip(paramSets, results):
+        alone = summarize(params, simulateBatch(params, 6, 80, 30, seed=11))
+        assert result["reviewsPerDay"] == alone["reviewsPerDay"]
+        assert result["retention"] == alone["retention"]
+
+def test_results_are_sane():
+    low, high = runSweep(makeParamSets(grid), numLearners=20, numCards=200, numDays=90,
+                         workers=2, batchSize=10)
+    for result in [low, high]:
+        assert 0.5 < result["retention"] < 1
+        assert 0.5 < result["passRate"] < 1
+        # 200 cards, introduced 20 a day: busy at first, far fewer after
+        assert 0 < result["reviewsPerDay"] < result["busiestDay"] < 200
+    # a higher starting ease spaces reviews out more, and less is remembered
+    assert high["reviewsPerDay"] < low["reviewsPerDay"]
+    assert high["retention"] < low["retention"]
@@ -0,0 +1,46 @@
+# the interval previews on the rating buttons (previewIntervalsIfRated) have
+# to show what rating the card with updateCard actually schedules, also
+# with other SM-2 constants
+import random
+import pytest
+from flashcards import Flashcard, previewIntervalsIfRated, makeNiceLooking
+from flashcards import cards as cardsModule
+
+ratings = {'again': 1, 'hard': 2, 'good': 3, 'easy': 4}
+
+def makeCards(rng):
+    cards = []
+    for step in [0, 1]: # learning steps
+        card = Flashcard('front', 'back')
+        card.learningStep = step
+        cards.append(card)
+    for i in range(200): # reviews
+        card = Flashcard('front', 'back')
+        card.isLearning = False
+        card.easeFactor = rng.choice([1.3, 1.7, 2.5, 3.0, 3.9, 4.0])
+        card.interval = rng.choice([1440, 4 * 1440, rng.uniform(1440, 200000)])
+        cards.append(card)
+    return cards
+
+def afterRating(card, rating):
+    copy = Flashcard('front', 'back', card.id) # the card itself isn't touched
+    copy.isLearning, copy.learningStep = card.isLearning, card.learningStep
+    copy.easeFactor, copy.interval = card.easeFactor, card.interval
+    copy.updateCard(rating)
+    return copy.interval
+
+def shownAs(card, mins):
+    # learning steps are shown as "less than", e.g. <10m
+    label = makeNiceLooking(mins)
+    return '<' + label if mins < 60 and (card.isLearning or mins == 1) else label
+
+@pytest.mark.parametrize('params', [{}, {"hardMultiplier": 1.0, "easyBonus": 1.5,
+                                         "easyEaseBonus": 0.3, "maxEase": 3.5}])
+def test_previews_match_updateCard(params, monkeypatch):
+    for name, value in params.items():
+        monkeypatch.setitem(cardsModule.schedulerParams, name, value)
+    rng = random.Random(112)
+    for card in makeCards(rng):
+        previews = previewIntervalsIfRated(card)
+        for name, rating in ratings.items():
+            assert previews[name] == shownAs(card, afterRating(card, rating)), (name, card.interval)
@@ -0,0 +1,40 @@
+# split storage (storageMode = 'split') keeps card text in files next to the
+# data file; loading from another data folder has to read that folder's text
+import pytest
+from flashcards import settings, textstore, Flashcard, Collection, loadData, saveData, cardToDict
+from flashcards.storage import writeSnapshot
+
+def writeCollection(fronts):
+    data = {"cards.lastCardId": 0, "decks": [{"name": "Deck", "color": "lightBlue", "cards": []}]}
+    for front in fronts:
+        card = Flashcard(front, 'back of ' + front)
+        data["decks"][0]["cards"].append(cardToDict(card))
+    data["cards.lastCardId"] = card.id
+    writeSnapshot(data, settings.getDataPath())
+
+def loadFronts():
+    collection = Collection()
+    loadData(collection)
+    return collection, [(card.front, card.back) for deck in collection.decks for card in deck.cards]
+
+@pytest.fixture
+def splitMode(monkeypatch):
+    monkeypatch.setattr(settings, 'storageMode', 'split')
+    monkeypatch.setattr(settings, 'deckBackend', 'objects')
+    yield
+    textstore.closeTextStore()
+
+def test_other_data_folder(tmp_path, monkeypatch, splitMode):
+    folders = {'first': ['What is a set?', 'What is a list?'],
+               'second': ['What is a tuple?', 'What is a dict?', 'What is a heap?']}
+    for name, fronts in folders.items():
+        monkeypatch.setattr(settings, 'dataDir', str(tmp_path / name))
+        (tmp_path / name).mkdir()
+        writeCollection(fronts)
+        collection, texts = loadFronts() # from the JSON file
+        saveData(collection) # split into the text files
+        textstore.closeTextStore() # as if each was made in another run
+    for name in ['first', 'second', 'first']:
+        monkeypatch.setattr(settings, 'dataDir', str(tmp_path / name))
+        collection, texts = loadFronts()
+        assert texts == [(front, 'back of ' + front) for front in folders[name]]